@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from google.genai import types
+
+import main
+from config import BATCH_MAX_CONCURRENT_SESSIONS
+from functions import function_caller
+from functions.import_graph import discard_import_graph
+from functions.python_pool import close_pool
+from functions.repo_map import discard_repo_map
+from functions.run_cache import discard_run_cache
+from functions.search_code import discard_index
+from functions.workspace import clone_workspace, diff_workspace
+from functions.workspace_snapshot import discard_workspace_snapshots
+from model_client import MODEL_CALL_MODES, create_model_client
+from model_scheduler import find_scheduler, format_metrics
+
+
+def load_prompts(path: str) -> list[dict]:
+    """
+    Reads the prompts for a batch.
+
+    Files ending in ".jsonl" hold one {"prompt": ..., "id": ...} object per
+    line, with "id" optional. Any other file holds one prompt per line, and
+    blank lines and lines starting with "#" are skipped.
+
+    Returns:
+        A list of {"id", "prompt"} dicts, with ids defaulting to the prompt's position.
+    """
+    prompts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or (line.startswith("#") and not path.endswith(".jsonl")):
+                continue
+            entry = json.loads(line) if path.endswith(".jsonl") else {"prompt": line}
+            prompts.append({"id": str(entry.get("id", len(prompts) + 1)), "prompt": entry["prompt"]})
+    return prompts
+
+
+def _final_response(messages: list[types.Content]):
+    """Returns the model's final text answer, or None if the session ended without one."""
+    last = messages[-1]
+    if last.role != "model" or any(part.function_call for part in last.parts or []):
+        return None
+    text = "".join(part.text for part in last.parts or [] if part.text)
+    return text or None
+
+
+def discard_workspace_state(workspace: str):
+    """
+    Drops everything the tools keep for a workspace that is being deleted.
+
+    The search index, import graph, repository map and snapshots are pickled
+    under CACHE_DIRECTORY keyed by the workspace's path, which a temporary
+    session copy never has again, so they would otherwise be left behind.
+    """
+    discard_index(workspace)
+    discard_import_graph(workspace)
+    discard_repo_map(workspace)
+    discard_workspace_snapshots(workspace)
+    discard_run_cache(workspace)
+    close_pool(workspace)
+
+
+async def run_session(entry: dict, source: str, workspace_root: str, model_client, keep_workspace: bool = False) -> dict:
+    """
+    Runs one prompt in a fresh copy of the source workspace.
+
+    Args:
+        entry: The {"id", "prompt"} dict for the session.
+        source: The workspace every session starts from.
+        workspace_root: The directory that session workspaces are created in.
+        model_client: The ModelClient shared by every session.
+        keep_workspace: If True, the workspace copy is left on disk.
+
+    Returns:
+        The session's result record.
+    """
+    workspace = os.path.join(workspace_root, f"session-{entry['id']}")
+    record = {"id": entry["id"], "prompt": entry["prompt"]}
+    start = time.perf_counter()
+    try:
+        record["copy_method"] = await asyncio.to_thread(clone_workspace, source, workspace)
+
+        messages = [types.Content(role="user", parts=[types.Part(text=entry["prompt"])])]
+        system_prompt = await asyncio.to_thread(main.build_system_prompt, workspace)
+        token_totals = await main.run_agent(
+            model_client,
+            messages,
+            system_prompt,
+            main.build_available_functions(),
+            working_directory=workspace,
+        )
+
+        response = _final_response(messages)
+        record["status"] = "completed" if response is not None else "incomplete"
+        record["response"] = response
+        record["model_calls"] = token_totals.pop("calls")
+        record["tokens"] = token_totals
+        record["changed_files"], record["diff"] = await asyncio.to_thread(diff_workspace, source, workspace)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        if keep_workspace:
+            record["workspace"] = workspace
+        else:
+            await asyncio.to_thread(discard_workspace_state, workspace)
+            await asyncio.to_thread(shutil.rmtree, workspace, True)
+    return record
+
+
+async def run_batch(prompts: list[dict], source: str, workspace_root: str, model_client, output, concurrency: int = BATCH_MAX_CONCURRENT_SESSIONS, keep_workspaces: bool = False) -> dict:
+    """
+    Runs every prompt concurrently, at most `concurrency` sessions at a time.
+
+    Each result is written to `output` as one JSON line as soon as its session
+    finishes, so results arrive in completion order rather than prompt order.
+
+    Returns:
+        A count of sessions per status.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {}
+
+    async def run_one(entry):
+        async with semaphore:
+            record = await run_session(entry, source, workspace_root, model_client, keep_workspaces)
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+
+    await asyncio.gather(*(run_one(entry) for entry in prompts))
+    return counts
+
+
+def main_batch():
+    parser = argparse.ArgumentParser(description="Run many agent prompts concurrently, each in its own copy of the workspace.")
+    parser.add_argument("prompts", help="A file with one prompt per line, or a .jsonl file of {\"id\", \"prompt\"} objects.")
+    parser.add_argument("--workspace", default=function_caller.WORKING_DIRECTORY, help="The workspace each session starts from.")
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENT_SESSIONS, help="How many sessions run at once.")
+    parser.add_argument("--output", help="Write the NDJSON results to this file instead of stdout.")
+    parser.add_argument("--workspace-root", help="Where session workspaces are created. Use a directory on the workspace's filesystem so files can be linked rather than copied.")
+    parser.add_argument("--keep-workspaces", action="store_true", help="Leave each session's workspace on disk.")
+    parser.add_argument("--model-calls", choices=MODEL_CALL_MODES, default="live")
+    args = parser.parse_args()
+
+    prompts = load_prompts(args.prompts)
+    ids = [entry["id"] for entry in prompts]
+    if len(set(ids)) != len(ids):
+        parser.error("prompt ids must be unique")
+
+    source = os.path.abspath(args.workspace)
+    workspace_root = tempfile.mkdtemp(prefix="agent-batch-", dir=args.workspace_root)
+    model_client = create_model_client(args.model_calls, api_key=main.load_api_key())
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        # The sessions' own progress output would interleave, so only results are written
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            counts = asyncio.run(run_batch(prompts, source, workspace_root, model_client, output, args.concurrency, args.keep_workspaces))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if not args.keep_workspaces:
+            shutil.rmtree(workspace_root, ignore_errors=True)
+
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{len(prompts)} sessions: {summary}", file=sys.stderr)
+    scheduler = find_scheduler(model_client)
+    if scheduler is not None:
+        print(format_metrics(scheduler.metrics()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main_batch()
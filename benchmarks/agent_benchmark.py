@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+WORKSPACE_SIZES = [10, 1000, 50000]
+FILES_PER_PACKAGE = 100
+STARTUP_RUNS = 5
+
+# A metric regresses when it is this much worse than the baseline, and timings
+# must also have grown by at least REGRESSION_MIN_SECONDS to rule out noise
+REGRESSION_THRESHOLD = 0.20
+REGRESSION_MIN_SECONDS = 0.005
+
+
+def generate_workspace(path: str, file_count: int):
+    """
+    Creates a synthetic Python project with `file_count` modules.
+
+    Modules are spread over packages of FILES_PER_PACKAGE, and main.py imports
+    the first one, so every tool in the scripted session has real work to do.
+    """
+    for i in range(file_count):
+        package = os.path.join(path, f"pkg{i // FILES_PER_PACKAGE}")
+        if i % FILES_PER_PACKAGE == 0:
+            os.makedirs(package, exist_ok=True)
+            with open(os.path.join(package, "__init__.py"), "w") as f:
+                f.write("")
+        with open(os.path.join(package, f"module_{i}.py"), "w") as f:
+            f.write(
+                f"def function_{i}(value):\n"
+                f"    return value * {i}\n"
+                f"\n\n"
+                f"class Model{i}:\n"
+                f"    def __init__(self, value):\n"
+                f"        self.value = function_{i}(value)\n"
+            )
+
+    with open(os.path.join(path, "main.py"), "w") as f:
+        f.write(
+            "from pkg0.module_0 import function_0\n"
+            "\n"
+            "print(function_0(21))\n"
+        )
+
+
+def scripted_turns():
+    """The canned session: explore, search, read, edit, write, run, re-read, answer."""
+    from google.genai import types
+
+    def call(name, **args):
+        return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+    return [
+        [call("get_files_info", recursive=True, max_depth=1)],
+        [
+            call("search_code", query="function_0", identifier=True),
+            call("get_file_content", file_path="pkg0/module_0.py"),
+        ],
+        [call("apply_patch", file_path="pkg0/module_0.py", patch=(
+            "<<<<<<< SEARCH\n    return value * 0\n=======\n    return value * 2\n>>>>>>> REPLACE\n"
+        ))],
+        [call("write_file", file_path="notes.txt", content="Changed function_0 to double its input.\n")],
+        [call("run_python_file", file_path="main.py")],
+        [
+            call("get_file_content", file_path="pkg0/module_0.py", if_changed=True),
+            call("get_file_content", file_path="main.py", start_line=1, end_line=3),
+        ],
+        [types.Part(text="function_0 now doubles its input, and main.py prints 42.")],
+    ]
+
+
+def _timed(function, timings: dict, name: str):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings.setdefault(name, []).append(time.perf_counter() - start)
+    return wrapper
+
+
+def run_scenario(file_count: int) -> dict:
+    """Runs the scripted session over a fresh workspace and returns its metrics."""
+    from google.genai import types
+    import main
+    from functions import function_caller
+    from functions.repo_map import build_repo_map
+    from config import CHARS_PER_TOKEN
+    from history import estimate_tokens
+    from model_client import ScriptedModelClient
+
+    workspace = tempfile.mkdtemp(prefix=f"agent-bench-{file_count}-")
+    try:
+        generate_start = time.perf_counter()
+        generate_workspace(workspace, file_count)
+        generate_seconds = time.perf_counter() - generate_start
+
+        # The repository map is built once from scratch, then again from its cache
+        map_timings = []
+        for _ in range(2):
+            map_start = time.perf_counter()
+            repo_map = build_repo_map(workspace)
+            map_timings.append(time.perf_counter() - map_start)
+
+        tool_timings = {}
+        for name, function in list(function_caller.FUNCTION_MAP.items()):
+            function_caller.FUNCTION_MAP[name] = _timed(function, tool_timings, name)
+        function_caller.WORKING_DIRECTORY = workspace
+
+        model_client = ScriptedModelClient(scripted_turns())
+        messages = [types.Content(role="user", parts=[types.Part(text="Make function_0 double its input.")])]
+        tool = types.Tool(function_declarations=[])
+
+        session_start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(main.run_agent(model_client, messages, "benchmark", tool))
+        session_end = time.perf_counter()
+
+        request_times = [start for start, _ in model_client.requests] + [session_end]
+        iterations = []
+        for i, (start, contents) in enumerate(model_client.requests):
+            iterations.append({
+                "wall_seconds": request_times[i + 1] - start,
+                "prompt_tokens_estimate": estimate_tokens(contents),
+            })
+
+        return {
+            "workspace_files": file_count,
+            "workspace_generation_seconds": generate_seconds,
+            "session_seconds": session_end - session_start,
+            "repo_map": {
+                "cold_seconds": map_timings[0],
+                "warm_seconds": map_timings[1],
+                "tokens_estimate": len(repo_map) // CHARS_PER_TOKEN,
+            },
+            "iterations": iterations,
+            "history_messages": len(messages),
+            "history_tokens_estimate": estimate_tokens(messages),
+            "tools": {
+                name: {"calls": len(times), "total_seconds": sum(times), "max_seconds": max(times)}
+                for name, times in sorted(tool_timings.items())
+            },
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def measure_startup() -> dict:
+    """Times `python main.py` with no arguments, which only imports and prints usage."""
+    durations = []
+    for _ in range(STARTUP_RUNS):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_ROOT, "main.py")],
+            cwd=REPO_ROOT,
+            capture_output=True,
+        )
+        durations.append(time.perf_counter() - start)
+    return {"runs": STARTUP_RUNS, "median_seconds": statistics.median(durations), "min_seconds": min(durations)}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run_all(sizes: list[int]) -> dict:
+    """Runs every scenario in its own process so peak memory is measured separately."""
+    scenarios = []
+    for file_count in sizes:
+        # A throwaway home directory keeps on-disk caches from leaking between runs
+        home = tempfile.mkdtemp(prefix="agent-bench-home-")
+        try:
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.agent_benchmark", "--scenario", str(file_count)],
+                cwd=REPO_ROOT,
+                env={**os.environ, "HOME": home},
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        finally:
+            shutil.rmtree(home, ignore_errors=True)
+        scenarios.append(json.loads(completed.stdout))
+
+    return {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "startup": measure_startup(),
+        "scenarios": scenarios,
+    }
+
+
+def _comparable_metrics(results: dict) -> dict:
+    metrics = {"startup.median_seconds": results["startup"]["median_seconds"]}
+    for scenario in results["scenarios"]:
+        prefix = f"files={scenario['workspace_files']}"
+        metrics[f"{prefix}.session_seconds"] = scenario["session_seconds"]
+        metrics[f"{prefix}.history_tokens_estimate"] = scenario["history_tokens_estimate"]
+        metrics[f"{prefix}.peak_rss_kb"] = scenario["peak_rss_kb"]
+        if "repo_map" in scenario:
+            metrics[f"{prefix}.repo_map.warm_seconds"] = scenario["repo_map"]["warm_seconds"]
+        for name, tool in scenario["tools"].items():
+            metrics[f"{prefix}.tools.{name}.total_seconds"] = tool["total_seconds"]
+    return metrics
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    """
+    Lists the metrics that got worse than the baseline by more than REGRESSION_THRESHOLD.
+    """
+    current = _comparable_metrics(results)
+    previous = _comparable_metrics(baseline)
+    regressions = []
+    for name, value in sorted(current.items()):
+        before = previous.get(name)
+        if name.endswith("seconds") and before is not None and value - before < REGRESSION_MIN_SECONDS:
+            continue
+        if before and value > before * (1 + REGRESSION_THRESHOLD):
+            regressions.append(f"{name}: {before:.6g} -> {value:.6g} (+{(value / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent loop against a scripted local model.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=WORKSPACE_SIZES, help="Workspace sizes, in files.")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    parser.add_argument("--baseline", help="A previous results file to compare against.")
+    parser.add_argument("--scenario", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario is not None:
+        print(json.dumps(run_scenario(args.scenario)))
+        return
+
+    results = run_all(args.sizes)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f))
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
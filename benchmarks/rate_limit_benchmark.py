@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# The fake server's quota: at most SERVER_REQUESTS_PER_WINDOW requests per window
+SERVER_REQUESTS_PER_WINDOW = 10
+SERVER_WINDOW_SECONDS = 1.0
+
+# Every SERVER_ERROR_EVERY-th request fails with a 503, as overloaded backends do
+SERVER_ERROR_EVERY = 7
+
+CONCURRENT_REQUESTS = 40
+
+
+class FakeGeminiServer(http.server.ThreadingHTTPServer):
+    """
+    A local stand-in for the Gemini streaming endpoint that throttles like the real one.
+
+    Requests over the per-window quota get a 429 with a Retry-After header,
+    and every `error_every`-th request gets a 503. The rest get a one-chunk
+    server-sent event stream. The server counts requests, responses by
+    status and the client connections it saw.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, requests_per_window: int = SERVER_REQUESTS_PER_WINDOW, window_seconds: float = SERVER_WINDOW_SECONDS, error_every: int = SERVER_ERROR_EVERY):
+        super().__init__(("127.0.0.1", 0), _FakeGeminiHandler)
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        self.error_every = error_every
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.requests = 0
+        self.statuses = {}
+        self.connections = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def decide(self, client_address) -> tuple[int, float]:
+        """Picks the status for the next request, and for a 429 the seconds until the quota resets."""
+        with self.lock:
+            self.requests += 1
+            self.connections.add(client_address)
+            now = time.monotonic()
+            if now - self.window_start >= self.window_seconds:
+                self.window_start = now
+                self.window_requests = 0
+            if self.window_requests >= self.requests_per_window:
+                status = 429
+            elif self.error_every and self.requests % self.error_every == 0:
+                status = 503
+            else:
+                self.window_requests += 1
+                status = 200
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            return status, self.window_start + self.window_seconds - now
+
+
+class _FakeGeminiHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, retry_after = self.server.decide(self.client_address)
+
+        if status == 200:
+            chunk = {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": "ok"}]}}],
+                "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 1, "totalTokenCount": 11},
+            }
+            body = f"data: {json.dumps(chunk)}\r\n\r\n".encode()
+            content_type = "text/event-stream"
+        else:
+            error_status = "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"
+            body = json.dumps({"error": {"code": status, "message": "fake server", "status": error_status}}).encode()
+            content_type = "application/json"
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", f"{max(retry_after, 0):.3f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def _send_requests(model_client, count: int) -> tuple[int, list[str]]:
+    from google.genai import types
+
+    async def request(i):
+        contents = [types.Content(role="user", parts=[types.Part(text=f"request {i}")])]
+        async for _ in model_client.generate_content_stream("gemini-2.0-flash", contents, types.GenerateContentConfig()):
+            pass
+
+    results = await asyncio.gather(*(request(i) for i in range(count)), return_exceptions=True)
+    errors = [f"{type(result).__name__}: {result}" for result in results if isinstance(result, BaseException)]
+    return count - len(errors), errors
+
+
+def run_scenario(scheduled: bool, count: int = CONCURRENT_REQUESTS) -> dict:
+    """Sends `count` concurrent requests to a fresh fake server, with or without the scheduler."""
+    from model_client import GeminiModelClient
+    from model_scheduler import ScheduledModelClient
+
+    server = FakeGeminiServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        model_client = GeminiModelClient(api_key="benchmark", base_url=server.base_url)
+        if scheduled:
+            quota_per_minute = server.requests_per_window * 60 / server.window_seconds
+            model_client = ScheduledModelClient(
+                model_client,
+                requests_per_minute=quota_per_minute,
+                burst_seconds=server.window_seconds,
+                retry_base_seconds=0.1,
+                retry_max_seconds=2.0,
+            )
+
+        start = time.perf_counter()
+        succeeded, errors = asyncio.run(_send_requests(model_client, count))
+        result = {
+            "scheduled": scheduled,
+            "requests": count,
+            "succeeded": succeeded,
+            "seconds": time.perf_counter() - start,
+            "server_requests": server.requests,
+            "server_statuses": {str(status): n for status, n in sorted(server.statuses.items())},
+            "server_connections": len(server.connections),
+            "errors": sorted(set(errors))[:5],
+        }
+        if scheduled:
+            result["scheduler"] = model_client.metrics()
+        return result
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send concurrent model requests to a local server that throttles like the Gemini API.")
+    parser.add_argument("--requests", type=int, default=CONCURRENT_REQUESTS, help="Concurrent requests to send.")
+    args = parser.parse_args()
+
+    results = [run_scenario(scheduled=False, count=args.requests), run_scenario(scheduled=True, count=args.requests)]
+    print(json.dumps(results, indent=2))
+
+    # Every request must get through once the scheduler is in front of the client
+    if results[1]["succeeded"] != args.requests:
+        print("Error: requests failed despite the scheduler", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
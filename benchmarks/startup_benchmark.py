@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.agent_benchmark import measure_startup
+
+# `python main.py` with no arguments must print its usage within this time
+STARTUP_BUDGET_SECONDS = 0.5
+
+# Modules that must not be imported just to print usage
+DEFERRED_MODULES = ["google.genai", "dotenv", "functions.function_caller", "model_client"]
+
+
+def imported_modules() -> set[str]:
+    """Returns every module imported by `python main.py` with no arguments, from -X importtime."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(REPO_ROOT, "main.py")],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    modules = set()
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that `python main.py` starts within its time budget.")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS, help="The startup budget, in seconds.")
+    args = parser.parse_args()
+
+    startup = measure_startup()
+    modules = imported_modules()
+    eager = [name for name in DEFERRED_MODULES if name in modules]
+    print(json.dumps({"budget_seconds": args.budget, **startup, "eager_imports": eager}, indent=2))
+
+    failures = []
+    if startup["median_seconds"] > args.budget:
+        failures.append(f"startup took {startup['median_seconds']:.3f}s, over the {args.budget:.3f}s budget")
+    for name in eager:
+        failures.append(f"{name} is imported before a prompt is run")
+    for failure in failures:
+        print(f"Regression: {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
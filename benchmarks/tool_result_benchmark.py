@@ -0,0 +1,146 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def recorded_sessions(store_directory: str) -> list[tuple[list, int]]:
+    """
+    Extracts the tool calls of every session recorded in a model call store.
+
+    The calls are taken from the recorded responses, since the requests'
+    histories may have been compacted. Responses are grouped into sessions
+    by the history's first message, the user's prompt, and put in the order
+    they were recorded.
+
+    Returns:
+        One (turns, model_turns) pair per session, where turns lists each model
+        turn's (name, args) calls and model_turns is the number of requests
+        after the first.
+    """
+    sessions = {}
+    for path in glob.glob(os.path.join(store_directory, "*", "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+            prompt = json.dumps(record["request"]["contents"][0], sort_keys=True)
+            calls = [
+                (part["function_call"]["name"], part["function_call"].get("args") or {})
+                for chunk in record["chunks"]
+                for candidate in chunk.get("candidates") or []
+                for part in (candidate.get("content") or {}).get("parts") or []
+                if "function_call" in part
+            ]
+            sessions.setdefault(prompt, []).append((os.path.getmtime(path), calls))
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            continue
+
+    result = []
+    for responses in sessions.values():
+        responses.sort(key=lambda response: response[0])
+        result.append(([calls for _, calls in responses], len(responses) - 1))
+    return result
+
+
+def scripted_session() -> tuple[list, int]:
+    """The agent benchmark's scripted session, as (turns, model_turns)."""
+    from benchmarks.agent_benchmark import scripted_turns
+
+    turns = [[(part.function_call.name, part.function_call.args) for part in turn if part.function_call] for turn in scripted_turns()]
+    return turns, len(turns) - 1
+
+
+def _tokens(response: dict) -> int:
+    from config import CHARS_PER_TOKEN
+
+    return len(json.dumps(response, default=str)) // CHARS_PER_TOKEN
+
+
+def measure(sessions: list[tuple[list, int]], workspace: str) -> dict:
+    """
+    Runs each session's tool calls against a fresh copy of `workspace` and compares both result forms.
+
+    Each call's result is counted once, and once per later request that
+    resends it with the history ("sent"): the result of model turn m is in
+    the requests for every turn after it.
+    """
+    from functions import function_caller
+    from functions.compact_results import compact_result
+    from functions.workspace import clone_workspace
+
+    tools = {}
+    for turns, model_turns in sessions:
+        clone_root = tempfile.mkdtemp(prefix="tool-result-bench-")
+        try:
+            copy = os.path.join(clone_root, "workspace")
+            clone_workspace(workspace, copy)
+            for m, calls in enumerate(turns):
+                for name, args in calls:
+                    function = function_caller.FUNCTION_MAP.get(name)
+                    if function is None:
+                        continue
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        result = function(working_directory=copy, **args)
+                    text_tokens = _tokens({"result": str(result)})
+                    compact_tokens = _tokens(compact_result(result))
+                    resends = model_turns - m
+                    stats = tools.setdefault(name, {
+                        "results": 0, "text_tokens": 0, "compact_tokens": 0,
+                        "sent": 0, "sent_text_tokens": 0, "sent_compact_tokens": 0,
+                    })
+                    stats["results"] += 1
+                    stats["text_tokens"] += text_tokens
+                    stats["compact_tokens"] += compact_tokens
+                    stats["sent"] += resends
+                    stats["sent_text_tokens"] += text_tokens * resends
+                    stats["sent_compact_tokens"] += compact_tokens * resends
+        finally:
+            shutil.rmtree(clone_root, ignore_errors=True)
+
+    for stats in tools.values():
+        stats["saved_percent"] = round(100 * (1 - stats["compact_tokens"] / stats["text_tokens"]), 1) if stats["text_tokens"] else 0.0
+    totals = {
+        key: sum(stats[key] for stats in tools.values())
+        for key in ("results", "text_tokens", "compact_tokens", "sent_text_tokens", "sent_compact_tokens")
+    }
+    if totals["sent_text_tokens"]:
+        totals["sent_saved_percent"] = round(100 * (1 - totals["sent_compact_tokens"] / totals["sent_text_tokens"]), 1)
+    return {"sessions": len(sessions), "tools": dict(sorted(tools.items())), "totals": totals}
+
+
+def main():
+    from config import MODEL_CALL_STORE_DIRECTORY
+    from functions.function_caller import WORKING_DIRECTORY
+
+    parser = argparse.ArgumentParser(description="Measure the tokens compact tool results save over recorded sessions.")
+    parser.add_argument("--store", default=MODEL_CALL_STORE_DIRECTORY, help="Model call store to read recorded sessions from.")
+    parser.add_argument("--workspace", default=WORKING_DIRECTORY, help="Workspace the recorded sessions ran in; each session's calls are rerun on a copy of it.")
+    parser.add_argument("--scripted", type=int, metavar="FILES", help="Instead, measure the scripted benchmark session over a generated workspace of FILES modules.")
+    args = parser.parse_args()
+
+    if args.scripted:
+        from benchmarks.agent_benchmark import generate_workspace
+
+        workspace = tempfile.mkdtemp(prefix="tool-result-workspace-")
+        try:
+            generate_workspace(workspace, args.scripted)
+            results = measure([scripted_session()], workspace)
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+    else:
+        results = measure(recorded_sessions(args.store), args.workspace)
+        results["store"] = args.store
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,41 @@
 # main.py
 
+import os
 import sys
 from pkg.calculator import Calculator
-from pkg.render import format_json_output
+from pkg.columns import read_csv_columns
+from pkg.render import format_json_output, format_ndjson_line
+
+# Streamed results are written in chunks of this many lines
+STREAM_CHUNK_LINES = 4096
+EMPTY_EXPRESSION_ERROR = "Expression is empty or contains only whitespace."
+
+
+def evaluate_stream(calculator, lines, output):
+    """
+    Evaluates one expression per input line, writing one compact JSON object per line.
+
+    Lines that fail produce {"expression", "error"} instead of stopping the stream.
+    Output is collected and written in chunks rather than line by line.
+    """
+    chunk = []
+    for line in lines:
+        expression = line.rstrip("\r\n")
+        try:
+            result = calculator.evaluate(expression)
+            if result is None:
+                chunk.append(format_ndjson_line(expression, error=EMPTY_EXPRESSION_ERROR))
+            else:
+                chunk.append(format_ndjson_line(expression, result))
+        except Exception as e:
+            chunk.append(format_ndjson_line(expression, error=str(e)))
+
+        if len(chunk) >= STREAM_CHUNK_LINES:
+            output.write("".join(chunk))
+            chunk.clear()
+
+    output.write("".join(chunk))
+    output.flush()
 
 
 def main():
@@ -10,9 +43,41 @@ def main():
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print('       python main.py --stream [FILE]   (one expression per line, NDJSON results)')
+        print('       python main.py --csv FILE "<expression>"   (variables are column names, one result per row)')
         print('Example: python main.py "3 + 5"')
         return
 
+    if sys.argv[1] == "--stream":
+        path = sys.argv[2] if len(sys.argv) > 2 else "-"
+        try:
+            if path == "-":
+                evaluate_stream(calculator, sys.stdin, sys.stdout)
+            else:
+                with open(path, encoding="utf-8") as f:
+                    evaluate_stream(calculator, f, sys.stdout)
+        except BrokenPipeError:
+            # The reader went away (e.g. `| head`); stop quietly without a flush error at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        except OSError as e:
+            print(f"Error: {e}")
+        return
+
+    if sys.argv[1] == "--csv":
+        if len(sys.argv) < 4:
+            print('Error: Usage: python main.py --csv FILE "<expression>"')
+            return
+        expression = " ".join(sys.argv[3:])
+        try:
+            results = calculator.evaluate_array(expression, read_csv_columns(sys.argv[2]))
+            if results is None:
+                print(f"Error: {EMPTY_EXPRESSION_ERROR}")
+            else:
+                sys.stdout.write("".join(f"{result!r}\n" for result in results.ravel().tolist()))
+        except Exception as e:
+            print(f"Error: {e}")
+        return
+
     expression = " ".join(sys.argv[1:])
     try:
         result = calculator.evaluate(expression)
@@ -20,7 +85,7 @@ def main():
             to_print = format_json_output(expression, result)
             print(to_print)
         else:
-            print("Error: Expression is empty or contains only whitespace.")
+            print(f"Error: {EMPTY_EXPRESSION_ERROR}")
     except Exception as e:
         print(f"Error: {e}")
 
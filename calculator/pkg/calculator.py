@@ -1,12 +1,27 @@
 # calculator.py
 
+import operator
+from functools import lru_cache
+
+# How many compiled expressions each Calculator keeps
+PROGRAM_CACHE_SIZE = 4096
+
+# NumPy ufuncs for the built-in operators, looked up by name so NumPy stays optional
+_UFUNC_NAMES = {
+    operator.add: "add",
+    operator.sub: "subtract",
+    operator.mul: "multiply",
+    operator.truediv: "divide",
+}
+
+
 class Calculator:
-    def __init__(self):
+    def __init__(self, cache_size=PROGRAM_CACHE_SIZE):
         self.operators = {
-            "+": lambda a, b: a + b,
-            "-": lambda a, b: a - b,
-            "*": lambda a, b: a * b,
-            "/": lambda a, b: a / b,
+            "+": operator.add,
+            "-": operator.sub,
+            "*": operator.mul,
+            "/": operator.truediv,
         }
         self.precedence = {
             "+": 3,
@@ -14,16 +29,100 @@ class Calculator:
             "*": 2,
             "/": 2,
         }
+        self._compile_cached = lru_cache(maxsize=cache_size)(self.compile)
 
-    def evaluate(self, expression):
+    def evaluate(self, expression, variables=None):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        return self.run(self._compile_cached(expression), variables)
+
+    def evaluate_array(self, expression, variables=None):
+        """
+        Evaluates an expression over NumPy arrays of variable values.
+
+        Each operator runs once as a whole-array operation, with the same
+        precedence as evaluate(). Division by zero anywhere in the arrays raises
+        ZeroDivisionError, as it does for floats. Intermediate results are
+        reused as output buffers, so each operator allocates at most once.
+
+        Args:
+            expression: The expression, e.g. "x * 2 + y".
+            variables: A mapping of variable names to arrays (or anything
+                np.asarray accepts), broadcast against each other.
+
+        Returns:
+            A float64 array with the broadcast shape of the variables, or None
+            for an empty expression.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("evaluate_array requires NumPy: pip install numpy") from None
+
+        if not expression or expression.isspace():
+            return None
+
+        rpn, error = self._compile_cached(expression)
+        arrays = {name: np.asarray(value, dtype=np.float64) for name, value in (variables or {}).items()}
 
-    def _evaluate_infix(self, tokens):
-        values = []
+        # Each stack entry is (value, whether it is a temporary this call may overwrite)
+        stack = []
+        with np.errstate(all="ignore"):
+            for item in rpn:
+                if item.__class__ is float:
+                    stack.append((item, False))
+                elif item.__class__ is str:
+                    if item not in arrays:
+                        raise ValueError(f"unknown variable: {item}")
+                    stack.append((arrays[item], False))
+                else:
+                    b, b_owned = stack.pop()
+                    a, a_owned = stack.pop()
+                    if item is operator.truediv and np.any(np.equal(b, 0)):
+                        raise ZeroDivisionError("float division by zero")
+
+                    ufunc_name = _UFUNC_NAMES.get(item)
+                    if ufunc_name is None:
+                        stack.append((item(a, b), False))
+                        continue
+
+                    shape = np.broadcast_shapes(np.shape(a), np.shape(b))
+                    out = a if a_owned and a.shape == shape else b if b_owned and b.shape == shape else None
+                    result = getattr(np, ufunc_name)(a, b, out=out)
+                    stack.append((result, isinstance(result, np.ndarray)))
+
+        if error:
+            raise ValueError(error)
+
+        result, owned = stack[0]
+        shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+        if not owned or np.shape(result) != shape:
+            result = np.array(np.broadcast_to(result, shape), dtype=np.float64)
+        return result
+
+    def compile(self, expression):
+        """
+        Compiles an expression into a program for run().
+
+        The program is a flat RPN tuple of float constants, variable names
+        and operator functions, plus the error the expression fails with, if
+        any. Errors are recorded rather than raised, at the point where
+        evaluating the tokens in order would hit them, so running the program
+        fails exactly as evaluating the expression directly would.
+        """
+        tokens = expression.strip().split()
+        rpn = []
         operators = []
+        depth = 0
+
+        def apply_operator():
+            nonlocal depth
+            operator_token = operators.pop()
+            if depth < 2:
+                return f"not enough operands for operator {operator_token}"
+            depth -= 1
+            rpn.append(self.operators[operator_token])
+            return None
 
         for token in tokens:
             if token in self.operators:
@@ -32,30 +131,49 @@ class Calculator:
                     and operators[-1] in self.operators
                     and self.precedence[operators[-1]] >= self.precedence[token]
                 ):
-                    self._apply_operator(operators, values)
+                    error = apply_operator()
+                    if error:
+                        return tuple(rpn), error
                 operators.append(token)
             else:
                 try:
-                    values.append(float(token))
+                    rpn.append(float(token))
                 except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                    if not token.isidentifier():
+                        return tuple(rpn), f"invalid token: {token}"
+                    # A variable, looked up when the program runs
+                    rpn.append(token)
+                depth += 1
 
         while operators:
-            self._apply_operator(operators, values)
+            error = apply_operator()
+            if error:
+                return tuple(rpn), error
 
-        if len(values) != 1:
-            raise ValueError("invalid expression")
+        if depth != 1:
+            return tuple(rpn), "invalid expression"
 
-        return values[0]
+        return tuple(rpn), None
 
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
+    def run(self, program, variables=None):
+        rpn, error = program
+        stack = []
+        push = stack.append
+        pop = stack.pop
+
+        for item in rpn:
+            if item.__class__ is float:
+                push(item)
+            elif item.__class__ is str:
+                try:
+                    push(variables[item])
+                except (KeyError, TypeError):
+                    raise ValueError(f"unknown variable: {item}") from None
+            else:
+                b = pop()
+                stack[-1] = item(stack[-1], b)
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
+        if error:
+            raise ValueError(error)
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
\ No newline at end of file
+        return stack[0]
@@ -0,0 +1,25 @@
+# columns.py
+
+import csv
+
+
+def read_csv_columns(path: str) -> dict:
+    """
+    Reads a CSV file with a header row into float64 NumPy arrays, one per column.
+
+    The header names become variable names for Calculator.evaluate_array.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("reading CSV columns requires NumPy: pip install numpy") from None
+
+    with open(path, newline="", encoding="utf-8") as f:
+        names = [name.strip() for name in next(csv.reader(f), [])]
+    if not names:
+        raise ValueError(f"{path} has no header row")
+
+    data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2, dtype=np.float64)
+    if data.size and data.shape[1] != len(names):
+        raise ValueError(f"{path} has {len(names)} header names but {data.shape[1]} columns")
+    return {name: np.ascontiguousarray(data[:, i]) if data.size else data.reshape(0) for i, name in enumerate(names)}
\ No newline at end of file
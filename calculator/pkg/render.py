@@ -2,15 +2,39 @@
 
 import json
 
+# The C string encoder behind json.dumps, bound once for streamed output
+_encode_string = json.encoder.encode_basestring_ascii
 
-def format_json_output(expression: str, result: float, indent: int = 2) -> str:
+
+def _result_to_dump(result):
     if isinstance(result, float) and result.is_integer():
-        result_to_dump = int(result)
-    else:
-        result_to_dump = result
+        return int(result)
+    return result
 
+
+def format_json_output(expression: str, result: float, indent: int = 2) -> str:
     output_data = {
         "expression": expression,
-        "result": result_to_dump,
+        "result": _result_to_dump(result),
     }
-    return json.dumps(output_data, indent=indent)
\ No newline at end of file
+    return json.dumps(output_data, indent=indent)
+
+
+def _encode_number(result) -> str:
+    # Matches json.dumps, including its NaN and Infinity extensions
+    result = _result_to_dump(result)
+    if result != result:
+        return "NaN"
+    if result in (float("inf"), float("-inf")):
+        return "Infinity" if result > 0 else "-Infinity"
+    return repr(result)
+
+
+def format_ndjson_line(expression: str, result: float = None, error: str = None) -> str:
+    """
+    Formats one result as a single line of compact JSON, the same as
+    json.dumps(..., separators=(",", ":")) but without its per-call setup.
+    """
+    if error is not None:
+        return f'{{"expression":{_encode_string(expression)},"error":{_encode_string(error)}}}\n'
+    return f'{{"expression":{_encode_string(expression)},"result":{_encode_number(result)}}}\n'
\ No newline at end of file
@@ -1,6 +1,10 @@
 # tests.py
 
+import importlib.util
+import io
+import json
 import unittest
+from main import evaluate_stream
 from pkg.calculator import Calculator
 
 
@@ -44,6 +48,40 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_repeated_expression_is_compiled_once(self):
+        self.calculator.evaluate("10 / 4")
+        self.calculator.evaluate("10 / 4")
+        self.assertEqual(self.calculator._compile_cached.cache_info().misses, 1)
+        self.assertEqual(self.calculator.evaluate("10 / 4"), 2.5)
+
+    def test_cached_invalid_expression_still_raises(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                self.calculator.evaluate("3 $ 5")
+
+    def test_stream_reports_errors_per_line(self):
+        output = io.StringIO()
+        evaluate_stream(self.calculator, io.StringIO("10 / 4\n1 / 0\n\n"), output)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(results[0], {"expression": "10 / 4", "result": 2.5})
+        self.assertEqual(results[1]["expression"], "1 / 0")
+        self.assertIn("error", results[1])
+        self.assertIn("error", results[2])
+
+    def test_variables(self):
+        result = self.calculator.evaluate("x / 4", {"x": 10})
+        self.assertEqual(result, 2.5)
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("y / 4")
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "NumPy is not installed")
+    def test_evaluate_array_matches_scalar(self):
+        xs = [1.0, 2.5, -3.0]
+        results = self.calculator.evaluate_array("10 - x / 4", {"x": xs})
+        self.assertEqual(list(results), [self.calculator.evaluate("10 - x / 4", {"x": x}) for x in xs])
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate_array("1 / x", {"x": [1.0, 0.0]})
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1 +1,91 @@
-MAX_FILE_CHARS = 10000
\ No newline at end of file
+import os
+
+MAX_FILE_CHARS = 10000
+
+# Conversation history compaction
+HISTORY_TOKEN_BUDGET = 30000
+HISTORY_KEEP_RECENT_MESSAGES = 4
+TOOL_OUTPUT_STUB_CHARS = 200
+
+# Rough average for English text and code, used to estimate token counts
+# without a count_tokens round trip
+CHARS_PER_TOKEN = 4
+
+# Backend for run_python_file: "subprocess" starts a new interpreter per run,
+# "warm_pool" forks each run from a server that has the project's imports loaded
+PYTHON_EXECUTION_BACKEND = "subprocess"
+
+# Shared file content cache used by the tool functions
+FILE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+FILE_CACHE_MAX_ENTRY_BYTES = 1024 * 1024
+LINE_INDEX_CACHE_FILES = 64
+
+# Names always skipped when walking the working directory
+IGNORED_NAMES = {"__pycache__", ".git", ".venv", "venv", "node_modules", ".pytest_cache", ".mypy_cache"}
+
+# Recursive get_files_info listings
+LISTING_MAX_DEPTH = 4
+LISTING_PAGE_SIZE = 300
+
+# On-disk caches (search index, repository map, ...), kept outside the working directory
+CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "cli-code-agent")
+
+# How --model-calls sends model requests: straight to the API, or through the recorded responses
+MODEL_CALL_MODES = ("live", "record", "replay", "cache")
+
+# Recorded model responses for --model-calls record/replay/cache
+MODEL_CALL_STORE_DIRECTORY = os.path.join(CACHE_DIRECTORY, "model_calls")
+
+# search_code
+SEARCH_MAX_FILE_BYTES = 1024 * 1024
+SEARCH_MAX_RESULTS = 50
+
+# apply_patch: how many context lines may be dropped from each end of a hunk
+PATCH_MAX_FUZZ = 2
+
+# Batch mode: agent sessions run at once, each in its own workspace copy
+BATCH_MAX_CONCURRENT_SESSIONS = 4
+
+# run_affected_tests: file names treated as test modules
+TEST_FILE_PATTERNS = ["test_*.py", "*_test.py", "tests.py"]
+
+# run_python_file output capture: bytes kept from the start and end of each stream,
+# and the total output after which the process is killed
+RUN_OUTPUT_HEAD_BYTES = 4000
+RUN_OUTPUT_TAIL_BYTES = 4000
+RUN_OUTPUT_MAX_BYTES = 4 * 1024 * 1024
+
+# run_python_file result cache: reruns with the same script, arguments and workspace
+# contents return the recorded result. Scripts matching these patterns always run.
+RUN_CACHE_MAX_ENTRIES = 256
+RUN_CACHE_EXCLUDE_PATTERNS = []
+# Leave gitignored files out of the workspace hash. Faster on trees with large
+# ignored outputs, but a script reading a gitignored input (data/, .env, build
+# artifacts) then gets a stale cached result after that input changes.
+RUN_CACHE_SKIP_GITIGNORED = False
+
+# Repository map added to the system prompt at session start (0 to disable)
+REPO_MAP_TOKEN_BUDGET = 1500
+
+# Model request scheduling: the quota shared by every session in the process
+# (0 for no limit), retries for throttled or failed requests, and the HTTP
+# connection pool they share
+MODEL_REQUESTS_PER_MINUTE = 15
+MODEL_TOKENS_PER_MINUTE = 1000000
+MODEL_RATE_BURST_SECONDS = 10
+MODEL_MAX_RETRIES = 5
+MODEL_RETRY_BASE_SECONDS = 1.0
+MODEL_RETRY_MAX_SECONDS = 32.0
+MODEL_HTTP_MAX_CONNECTIONS = 16
+
+# Workspace snapshots kept for get_workspace_changes, per working directory
+SNAPSHOT_HISTORY_SIZE = 32
+
+# Send tool results to the model as compact typed fields (column lists,
+# exit_code/stdout/stderr, ...) instead of the tools' text. Off until
+# benchmarks/tool_result_benchmark.py shows a gain on every tool. See
+# functions/compact_results.py.
+COMPACT_TOOL_RESULTS = False
+
+# Append-only session logs checkpointed after every iteration, for --resume
+SESSION_DIRECTORY = os.path.join(CACHE_DIRECTORY, "sessions")
\ No newline at end of file
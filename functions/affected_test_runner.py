@@ -0,0 +1,85 @@
+# Test runner used by functions/run_affected_tests.py.
+#
+# Runs selected cases from one test module and writes their outcomes as JSON to
+# a results file, so nothing the tests print can be mistaken for results.
+# Usage: affected_test_runner.py RESULTS_PATH MODULE_NAME CASE [CASE ...]
+# where each CASE is "Class", "Class.test_method" or "test_function".
+import importlib
+import json
+import os
+import sys
+import traceback
+import unittest
+
+
+def _summary(error) -> str:
+    """The last line of a formatted exception, e.g. "AssertionError: 20.0 != 17"."""
+    lines = [line for line in "".join(traceback.format_exception(*error)).splitlines() if line.strip()]
+    return lines[-1].strip() if lines else ""
+
+
+class _CollectingResult(unittest.TestResult):
+    def __init__(self):
+        super().__init__()
+        self.outcomes = []
+
+    def _record(self, test, outcome, message=""):
+        self.outcomes.append({"id": test.id().split(".", 1)[-1], "outcome": outcome, "message": message})
+
+    def addSuccess(self, test):
+        self._record(test, "passed")
+
+    def addFailure(self, test, err):
+        self._record(test, "failed", _summary(err))
+
+    def addError(self, test, err):
+        self._record(test, "error", _summary(err))
+
+    def addSkip(self, test, reason):
+        self._record(test, "skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        self._record(test, "passed", "expected failure")
+
+    def addUnexpectedSuccess(self, test):
+        self._record(test, "failed", "unexpected success")
+
+
+def main():
+    results_path, module_name, cases = sys.argv[1], sys.argv[2], sys.argv[3:]
+
+    # Import the tests as if their file had been run as a script from its directory
+    sys.path[0] = os.getcwd()
+    outcomes = []
+    try:
+        module = importlib.import_module(module_name)
+    except BaseException:
+        outcomes.append({"id": module_name, "outcome": "error", "message": _summary(sys.exc_info())})
+        module = None
+
+    if module is not None:
+        loader = unittest.TestLoader()
+        for case in cases:
+            target = getattr(module, case.split(".")[0], None)
+            if isinstance(target, type) and issubclass(target, unittest.TestCase):
+                result = _CollectingResult()
+                loader.loadTestsFromName(case, module).run(result)
+                outcomes.extend(result.outcomes)
+            elif callable(target):
+                # A plain test function, as pytest collects them
+                try:
+                    target()
+                    outcomes.append({"id": case, "outcome": "passed", "message": ""})
+                except AssertionError:
+                    outcomes.append({"id": case, "outcome": "failed", "message": _summary(sys.exc_info())})
+                except BaseException:
+                    outcomes.append({"id": case, "outcome": "error", "message": _summary(sys.exc_info())})
+            else:
+                outcomes.append({"id": case, "outcome": "error", "message": f"{case} not found in {module_name}"})
+
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(outcomes, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import os
+import re
+from config import FILE_CACHE_MAX_ENTRY_BYTES, PATCH_MAX_FUZZ
+from functions.compact_results import ToolResult
+from functions.file_cache import as_read, file_cache
+from functions.workspace import write_atomically
+from functions.schema import lazy_schema
+from tracing import tracer
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+EDIT_BLOCK = re.compile(
+    r"^<{5,} SEARCH\n(.*?)^={5,}\n(.*?)^>{5,} REPLACE\n?",
+    re.DOTALL | re.MULTILINE,
+)
+
+# Line comparisons tried in order, from strictest to loosest
+MATCHERS = [
+    ("exact", lambda line: line),
+    ("trailing whitespace", lambda line: line.rstrip()),
+    ("indentation", lambda line: line.strip()),
+]
+
+
+def _find_block(lines: list[str], block: list[str]):
+    """
+    Finds every place a block of lines occurs in a file, using the strictest matcher that finds any.
+
+    Returns:
+        A tuple of (start indexes, matcher name), or None if the block is not found.
+    """
+    for matcher_name, normalize in MATCHERS:
+        target = [normalize(line) for line in block]
+        normalized = [normalize(line) for line in lines]
+        positions = [
+            i for i in range(len(lines) - len(block) + 1)
+            if normalized[i] == target[0] and normalized[i:i + len(block)] == target
+        ]
+        if positions:
+            return positions, matcher_name
+    return None
+
+
+def _parse_unified_diff(patch: str) -> list[dict]:
+    """
+    Splits a unified diff into hunks of (old start, old lines, new lines, kinds).
+
+    Raises:
+        ValueError: If the diff has file headers for more than one file.
+    """
+    hunks = []
+    hunk = None
+    file_headers = 0
+    lines = patch.splitlines()
+    for i, line in enumerate(lines):
+        # A "--- " line followed by "+++ " starts a file, even right after a hunk
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            file_headers += 1
+            if file_headers > 1:
+                raise ValueError("Patch changes more than one file; send one apply_patch call per file")
+            hunk = None
+            continue
+        header = HUNK_HEADER.match(line)
+        if header:
+            hunk = {"old_start": int(header.group(1)), "lines": []}
+            hunks.append(hunk)
+            continue
+        if hunk is None or line.startswith("\\"):
+            continue
+        if line.startswith("+++ ") and not hunk["lines"]:
+            continue
+        if line == "":
+            # Context lines for blank lines often lose their leading space
+            hunk["lines"].append((" ", ""))
+        elif line[0] in " +-":
+            hunk["lines"].append((line[0], line[1:]))
+
+    for hunk in hunks:
+        # Trailing blank "context" is usually just the end of the patch text
+        while hunk["lines"] and hunk["lines"][-1] == (" ", ""):
+            hunk["lines"].pop()
+    return hunks
+
+
+def _apply_hunk(lines: list[str], hunk: dict, offset: int):
+    """
+    Applies one unified diff hunk, reducing its surrounding context if needed.
+
+    Returns:
+        A tuple of (new lines, line the hunk was applied at, description), or None if rejected.
+    """
+    hunk_lines = hunk["lines"]
+    for fuzz in range(PATCH_MAX_FUZZ + 1):
+        # Drop up to `fuzz` context lines from each end, as patch(1) does
+        start, end = 0, len(hunk_lines)
+        while start < fuzz and start < end and hunk_lines[start][0] == " ":
+            start += 1
+        while len(hunk_lines) - end < fuzz and end > start and hunk_lines[end - 1][0] == " ":
+            end -= 1
+        if fuzz and (start, end) == (0, len(hunk_lines)):
+            break
+
+        trimmed = hunk_lines[start:end]
+        old_block = [text for kind, text in trimmed if kind != "+"]
+        new_block = [text for kind, text in trimmed if kind != "-"]
+        hint = hunk["old_start"] - 1 + offset + start
+        if not old_block:
+            # Pure insertion: trust the line number
+            position, matcher_name = min(max(hint, 0), len(lines)), "exact"
+        else:
+            found = _find_block(lines, old_block)
+            if found is None:
+                continue
+            positions, matcher_name = found
+            position = min(positions, key=lambda i: abs(i - hint))
+
+        notes = []
+        if matcher_name != "exact":
+            notes.append(f"ignoring {matcher_name}")
+        if fuzz:
+            notes.append(f"fuzz {fuzz}")
+        description = f" ({', '.join(notes)})" if notes else ""
+        new_lines = lines[:position] + new_block + lines[position + len(old_block):]
+        return new_lines, position + 1, description
+    return None
+
+
+def _split_block(text: str) -> list[str]:
+    # An empty block has no lines, so an empty REPLACE deletes what it matched
+    if not text:
+        return []
+    lines = text.split("\n")
+    if text.endswith("\n"):
+        lines.pop()
+    return lines
+
+
+def _apply_edit_block(text: str, search: str, replace: str):
+    """
+    Applies one search/replace edit block, matching whole lines.
+
+    Returns:
+        A tuple of (new text, line the edit was applied at, description), or an error string.
+    """
+    if not search:
+        if text:
+            return "search text is empty but the file is not"
+        return replace, 1, ""
+
+    lines = text.split("\n")
+    found = _find_block(lines, _split_block(search))
+    if found is None:
+        return "search text not found"
+
+    positions, matcher_name = found
+    if len(positions) > 1:
+        return f"search text matches {len(positions)} places; include more surrounding lines"
+
+    position = positions[0]
+    new_lines = lines[:position] + _split_block(replace) + lines[position + len(_split_block(search)):]
+    description = f" (ignoring {matcher_name})" if matcher_name != "exact" else ""
+    return "\n".join(new_lines), position + 1, description
+
+
+def _preview(lines: list[str]) -> str:
+    first = next((line for line in lines if line.strip()), "")
+    return first.strip()[:80]
+
+
+def apply_patch(working_directory: str, file_path: str, patch: str) -> str:
+    """
+    Applies a unified diff or search/replace edit blocks to a file.
+
+    Hunks and edit blocks are matched as whole lines, with fuzzy context
+    matching: exact matches are preferred (for hunks, the one nearest the
+    hunk's line number), then matches ignoring trailing whitespace or
+    indentation, then hunks with reduced surrounding context.
+    Hunks that cannot be placed are rejected and the rest are still applied.
+    CRLF files keep their line endings, and a diff covering several files is
+    rejected. The file is written atomically.
+
+    Args:
+        working_directory: The base directory where file operations are permitted.
+        file_path: The relative path of the file to patch.
+        patch: A unified diff, or one or more SEARCH/REPLACE edit blocks.
+
+    Returns:
+        A compact summary of the applied and rejected hunks, or an error message.
+    """
+    try:
+        full_path = os.path.abspath(os.path.join(working_directory, file_path))
+        abs_working_dir = os.path.abspath(working_directory)
+
+        # Prevent writing outside the working directory
+        if not full_path.startswith(abs_working_dir):
+            return f'Error: Cannot patch "{file_path}" as it is outside the permitted working directory'
+
+        if os.path.exists(full_path) and not os.path.isfile(full_path):
+            return f'Error: "{file_path}" is not a regular file'
+
+        original = ""
+        if os.path.isfile(full_path):
+            with open(full_path, "r", encoding="utf-8", newline="") as f:
+                original = f.read()
+
+        # Patches use "\n"; edit CRLF files as LF and restore their endings on write
+        crlf = original.count("\r\n") > original.count("\n") // 2
+        source = original.replace("\r\n", "\n") if crlf else original
+
+        applied = []
+        rejected = []
+        edit_blocks = EDIT_BLOCK.findall(patch)
+
+        if edit_blocks:
+            text = source
+            for number, (search, replace) in enumerate(edit_blocks, start=1):
+                result = _apply_edit_block(text, search, replace)
+                if isinstance(result, str):
+                    rejected.append(f"edit {number} ({_preview(search.splitlines())!r}): {result}")
+                    continue
+                text, line, description = result
+                applied.append(f"edit {number} at line {line}{description}")
+        else:
+            hunks = _parse_unified_diff(patch)
+            if not hunks:
+                return "Error: Patch contains no unified diff hunks or SEARCH/REPLACE blocks"
+
+            had_trailing_newline = source.endswith("\n")
+            lines = _split_block(source) if source else []
+
+            offset = 0
+            for number, hunk in enumerate(hunks, start=1):
+                result = _apply_hunk(lines, hunk, offset)
+                if result is None:
+                    removed = [text for kind, text in hunk["lines"] if kind != "+"]
+                    rejected.append(f"hunk {number} (line {hunk['old_start']}, {_preview(removed)!r}): context not found")
+                    continue
+                new_lines, line, description = result
+                offset += len(new_lines) - len(lines)
+                lines = new_lines
+                applied.append(f"hunk {number} at line {line}{description}")
+
+            text = "\n".join(lines)
+            if lines and (had_trailing_newline or not source):
+                text += "\n"
+
+        if crlf:
+            text = text.replace("\n", "\r\n")
+
+        if applied and text != original:
+            with tracer.span("write_file", category="fs", path=file_path, chars=len(text)):
+                write_atomically(full_path, text)
+
+            # Keep the shared cache current so the next read skips the disk
+            stat_result = os.stat(full_path)
+            if stat_result.st_size <= FILE_CACHE_MAX_ENTRY_BYTES:
+                file_cache.put(full_path, stat_result, as_read(text))
+            else:
+                file_cache.invalidate(full_path)
+
+        total = len(applied) + len(rejected)
+        summary = [f'Applied {len(applied)} of {total} edits to "{file_path}"']
+        summary.extend(f"- applied {entry}" for entry in applied)
+        summary.extend(f"- rejected {entry}" for entry in rejected)
+        fields = {kind: entries for kind, entries in (("applied", applied), ("rejected", rejected)) if entries}
+        return ToolResult("\n".join(summary), fields)
+
+    except UnicodeDecodeError:
+        return f'Error: Cannot decode "{file_path}". It may be a binary file.'
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _build_schema():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="apply_patch",
+        description="Edits a file in the working directory by applying a unified diff or SEARCH/REPLACE blocks, instead of rewriting the whole file with write_file. Context is matched fuzzily, and the result lists which edits applied or were rejected.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The relative path to the file to be edited.",
+                ),
+                "patch": types.Schema(
+                    type=types.Type.STRING,
+                    description=(
+                        "Either a unified diff with '@@ -l,s +l,s @@' hunks, or one or more edit blocks of the form:\n"
+                        "<<<<<<< SEARCH\nexact lines to find\n=======\nreplacement lines\n>>>>>>> REPLACE"
+                    ),
+                ),
+            },
+            required=["file_path", "patch"],
+        ),
+    )
+
+
+__getattr__ = lazy_schema("schema_apply_patch", _build_schema)
@@ -0,0 +1,54 @@
+class BoundedOutput:
+    """
+    Captures a stream's output in bounded memory, keeping only its head and tail.
+
+    The first `head_bytes` are kept as they arrive, and after that only the
+    most recent `tail_bytes`. Everything in between is dropped, counting its
+    bytes and lines so the result can say what was cut.
+    """
+
+    def __init__(self, head_bytes: int, tail_bytes: int):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+        self.dropped_lines = 0
+
+    def write(self, data: bytes):
+        self.total_bytes += len(data)
+        if len(self.head) < self.head_bytes:
+            room = self.head_bytes - len(self.head)
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+
+        if len(data) > self.tail_bytes:
+            # Drop the part that could never survive in the tail without copying it
+            excess = len(data) - self.tail_bytes
+            self._drop(self.tail)
+            self.tail = bytearray()
+            self._drop(memoryview(data)[:excess])
+            data = data[excess:]
+
+        self.tail += data
+        excess = len(self.tail) - self.tail_bytes
+        if excess > 0:
+            self._drop(self.tail[:excess])
+            del self.tail[:excess]
+
+    def _drop(self, data):
+        self.dropped_bytes += len(data)
+        self.dropped_lines += bytes(data).count(b"\n")
+
+    def text(self) -> str:
+        """Returns the kept output, with a marker where the middle was dropped."""
+        head = self.head.decode("utf-8", errors="replace")
+        tail = self.tail.decode("utf-8", errors="replace")
+        if not self.dropped_bytes:
+            return head + tail
+        return (
+            f"{head}\n[... {self.dropped_lines} lines ({self.dropped_bytes} bytes) truncated ...]\n{tail}"
+        )
@@ -0,0 +1,38 @@
+# Compact tool results: instead of their text, tools can send the model the
+# typed fields the text was formatted from (column lists, exit_code/stdout/
+# stderr, matches grouped by path, ...). Tools return a ToolResult, which is
+# still their text result, so everything else keeps working on the text.
+
+
+class ToolResult(str):
+    """
+    A tool's text result, carrying the typed fields it was formatted from.
+
+    Tools return a ToolResult for every successful result and a plain
+    "Error: ..." string otherwise, so compact_result never has to tell a
+    result's kind from its text.
+    """
+
+    def __new__(cls, text: str, fields: dict):
+        result = super().__new__(cls, text)
+        result.fields = fields
+        return result
+
+
+def compact_result(result) -> dict:
+    """
+    Builds the compact function response for a tool's result.
+
+    Args:
+        result: The tool's return value.
+
+    Returns:
+        A dict for types.Part.from_function_response: the result's typed
+        fields for a ToolResult, {"error": ...} for an error message, or
+        {"result": result} otherwise.
+    """
+    if isinstance(result, ToolResult):
+        return result.fields
+    if isinstance(result, str) and result.startswith("Error"):
+        return {"error": result.removeprefix("Error: ")}
+    return {"result": result}
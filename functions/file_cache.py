@@ -0,0 +1,136 @@
+import os
+import threading
+from collections import OrderedDict
+from config import FILE_CACHE_MAX_BYTES
+
+
+def as_read(text: str) -> str:
+    """Returns written text as a text-mode read gives it back, with every line ending translated to "\\n"."""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+class FileContentCache:
+    """
+    An LRU cache of decoded file contents shared by the tool functions.
+
+    Entries are keyed by resolved path and validated against the file's
+    (st_mtime_ns, st_size, st_ino) on every lookup, so a file changed by
+    anything other than write_file is simply re-read. The cache also remembers
+    which version of each file was last returned to the model, including
+    files too large to cache, for which only the validator is kept.
+    """
+
+    def __init__(self, max_bytes: int = FILE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # Validators of files too large to cache, as last returned to the model
+        self._delivered = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validator(stat_result: os.stat_result) -> tuple:
+        return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+    def get(self, path: str, stat_result: os.stat_result):
+        """
+        Looks up a file's content.
+
+        Args:
+            path: The resolved path of the file.
+            stat_result: A fresh os.stat() of the file.
+
+        Returns:
+            A tuple of (content, delivered) where `delivered` is True if this
+            exact version was already returned to the model, or None on a miss.
+        """
+        key = os.path.realpath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["validator"] != self.validator(stat_result):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["content"], entry["delivered"]
+
+    def put(self, path: str, stat_result: os.stat_result, content: str):
+        """
+        Stores a file's content, evicting least recently used entries as needed.
+
+        Args:
+            path: The resolved path of the file.
+            stat_result: The os.stat() the content was read or written under.
+            content: The decoded file content.
+        """
+        key = os.path.realpath(path)
+        size = stat_result.st_size
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = {
+                "validator": self.validator(stat_result),
+                "content": content,
+                "size": size,
+                "delivered": False,
+            }
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def mark_delivered(self, path: str, stat_result: os.stat_result = None):
+        """
+        Records that a file's current version has been returned to the model.
+
+        Args:
+            path: The resolved path of the file.
+            stat_result: The os.stat() of the version returned, needed for
+                files that are not in the cache.
+        """
+        key = os.path.realpath(path)
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]["delivered"] = True
+            elif stat_result is not None:
+                self._delivered[key] = self.validator(stat_result)
+
+    def was_delivered(self, path: str, stat_result: os.stat_result) -> bool:
+        """Checks whether this exact version of an uncached file was already returned to the model."""
+        key = os.path.realpath(path)
+        with self._lock:
+            return self._delivered.get(key) == self.validator(stat_result)
+
+    def invalidate(self, path: str):
+        key = os.path.realpath(path)
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        self._delivered.pop(key, None)
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry["size"]
+
+    def stats(self) -> dict:
+        """Returns the cache's hit/miss counters and current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+
+# Shared by every tool function in this process
+file_cache = FileContentCache()
@@ -0,0 +1,131 @@
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from config import MAX_FILE_CHARS, LINE_INDEX_CACHE_FILES
+
+# UTF-8 never needs more than 4 bytes per character
+MAX_BYTES_PER_CHAR = 4
+
+
+class LineIndex:
+    """
+    Byte offsets of line starts in a file, extended lazily as lines are requested.
+
+    Jumping to line N scans only as far as line N the first time, and not at all
+    afterwards while the file is unchanged.
+    """
+
+    def __init__(self, validator: tuple):
+        self.validator = validator
+        self.offsets = array("Q", [0])
+        self.complete = False
+
+    def ensure(self, mapped: mmap.mmap, line_count: int):
+        """Extends the index until it holds `line_count` line starts or reaches EOF."""
+        size = len(mapped)
+        position = self.offsets[-1]
+        while not self.complete and len(self.offsets) < line_count:
+            newline = mapped.find(b"\n", position)
+            if newline == -1 or newline + 1 >= size:
+                self.complete = True
+                break
+            position = newline + 1
+            self.offsets.append(position)
+
+
+_line_indexes = OrderedDict()
+_line_indexes_lock = threading.Lock()
+
+
+def _get_line_index(path: str, stat_result: os.stat_result) -> LineIndex:
+    key = os.path.realpath(path)
+    validator = (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+    with _line_indexes_lock:
+        index = _line_indexes.get(key)
+        if index is None or index.validator != validator:
+            index = LineIndex(validator)
+            _line_indexes[key] = index
+        _line_indexes.move_to_end(key)
+        while len(_line_indexes) > LINE_INDEX_CACHE_FILES:
+            _line_indexes.popitem(last=False)
+        return index
+
+
+def read_lines(path: str, start_line: int, end_line: int = None, max_chars: int = MAX_FILE_CHARS) -> tuple[str, int, bool]:
+    """
+    Reads a 1-based, inclusive range of lines from a file through mmap.
+
+    Args:
+        path: The absolute path of the file.
+        start_line: The first line to return.
+        end_line: The last line to return, or None to read as far as `max_chars` allows.
+        max_chars: The most characters to return.
+
+    Returns:
+        A tuple of (text, last line number returned, whether the text was cut at `max_chars`).
+
+    Raises:
+        ValueError: If `start_line` is past the end of the file.
+    """
+    with open(path, "rb") as f:
+        stat_result = os.fstat(f.fileno())
+        if stat_result.st_size == 0:
+            if start_line > 1:
+                raise ValueError("start_line is past the end of the file (0 lines)")
+            return "", 1, False
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            index = _get_line_index(path, stat_result)
+            with _line_indexes_lock:
+                index.ensure(mapped, (end_line or start_line) + 1)
+                offsets = index.offsets
+
+            if start_line > len(offsets):
+                raise ValueError(f"start_line is past the end of the file ({len(offsets)} lines)")
+
+            start = offsets[start_line - 1]
+            if end_line is not None and end_line < len(offsets):
+                end = offsets[end_line]
+            else:
+                end = len(mapped)
+            # Anything past this many bytes is beyond `max_chars`, even a character split here
+            byte_limit = start + max_chars * MAX_BYTES_PER_CHAR + 1
+            errors = "strict"
+            if end > byte_limit:
+                end = byte_limit
+                errors = "replace"
+
+            text = mapped[start:end].decode("utf-8", errors=errors)
+
+    truncated = len(text) > max_chars
+    text = text[:max_chars]
+    last_line = start_line + text.count("\n", 0, len(text) - 1) if text else start_line
+    return text, last_line, truncated
+
+
+def read_bytes(path: str, offset: int, length: int) -> tuple[str, int, int]:
+    """
+    Reads a byte range from a file through mmap.
+
+    Characters split by the range boundaries are replaced rather than failing.
+
+    Args:
+        path: The absolute path of the file.
+        offset: The first byte to read.
+        length: The number of bytes to read.
+
+    Returns:
+        A tuple of (text, end offset, file size in bytes).
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or offset >= size:
+            return "", min(offset, size), size
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            end = min(size, offset + length)
+            data = mapped[offset:end]
+
+    return data.decode("utf-8", errors="replace"), end, size
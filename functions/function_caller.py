@@ -1,8 +1,17 @@
+import asyncio
 from google.genai import types
 from functions.get_files_info import get_files_info
 from functions.get_file_content import get_file_content
 from functions.write_file import write_file
 from functions.run_python_file import run_python_file
+from functions.search_code import search_code
+from functions.apply_patch import apply_patch
+from functions.run_affected_tests import run_affected_tests
+from functions.get_workspace_changes import get_workspace_changes
+from functions.workspace_snapshot import get_workspace_snapshots
+from functions.compact_results import compact_result
+from config import COMPACT_TOOL_RESULTS
+from tracing import tracer
 
 # Map functions
 FUNCTION_MAP = {
@@ -10,23 +19,37 @@ FUNCTION_MAP = {
     "get_file_content": get_file_content,
     "write_file": write_file,
     "run_python_file": run_python_file,
+    "search_code": search_code,
+    "apply_patch": apply_patch,
+    "run_affected_tests": run_affected_tests,
+    "get_workspace_changes": get_workspace_changes,
 }
 
+# Functions with no side effects, safe to run concurrently with each other
+READ_ONLY_FUNCTIONS = {"get_files_info", "get_file_content", "search_code", "get_workspace_changes"}
+
+# Functions that change only the file named by their file_path argument. Any
+# other function that is not read-only may change anything in the workspace.
+SINGLE_FILE_FUNCTIONS = {"write_file", "apply_patch"}
+
 WORKING_DIRECTORY = "./calculator"
 
-def call_function(function_call_part: types.FunctionCall, verbose=False):
+def _execute_function_call(function_call_part: types.FunctionCall, verbose=False, working_directory=None, compact=None) -> types.Part:
     """
-    Executes a function call requested by the LLM.
+    Executes a single function call and wraps its result in a function response part.
 
     Args:
         function_call_part: The FunctionCall object from the LLM's response.
-        verbose: If True, prints detailed call and response information.
+        verbose: If True, prints detailed call information.
+        working_directory: The directory the call may touch. Defaults to WORKING_DIRECTORY.
+        compact: If True, the result is sent as compact typed fields (see
+            functions/compact_results.py). Defaults to COMPACT_TOOL_RESULTS.
 
     Returns:
-        A types.Content object with the function's result or an error.
+        A types.Part holding the function's result or an error.
     """
     function_name = function_call_part.name
-    args = function_call_part.args
+    args = function_call_part.args or {}
 
     if verbose:
         print(f"Calling function: {function_name}({args})")
@@ -34,35 +57,124 @@ def call_function(function_call_part: types.FunctionCall, verbose=False):
         print(f" - Calling function: {function_name}")
 
     if function_name not in FUNCTION_MAP:
-        return types.Content(
-            role="tool",
-            parts=[
-                types.Part.from_function_response(
-                    name=function_name,
-                    response={"error": f"Unknown function: {function_name}"},
-                )
-            ],
+        return types.Part.from_function_response(
+            name=function_name,
+            response={"error": f"Unknown function: {function_name}"},
         )
 
     function_to_call = FUNCTION_MAP[function_name]
 
     # Prepare arguments
     function_args = dict(args)
-    function_args["working_directory"] = WORKING_DIRECTORY
+    function_args["working_directory"] = working_directory or WORKING_DIRECTORY
 
     # Call functions
-    try:
-        function_result = function_to_call(**function_args)
-        response_data = {"result": function_result}
-    except Exception as e:
-        response_data = {"error": f"Error executing function: {str(e)}"}
+    with tracer.span(function_name, category="tool", function=function_name) as span:
+        if tracer.enabled:
+            span["args_chars"] = len(str(args))
+        try:
+            function_result = function_to_call(**function_args)
+            if COMPACT_TOOL_RESULTS if compact is None else compact:
+                response_data = compact_result(function_result)
+            else:
+                # Tools may return a ToolResult; only its text is sent
+                response_data = {"result": str(function_result)}
+        except Exception as e:
+            response_data = {"error": f"Error executing function: {str(e)}"}
+        finally:
+            # Tell the workspace snapshots what may have changed
+            if function_name not in READ_ONLY_FUNCTIONS:
+                changed_path = args.get("file_path") if function_name in SINGLE_FILE_FUNCTIONS else None
+                get_workspace_snapshots(function_args["working_directory"]).mark_changed(changed_path)
+        if tracer.enabled:
+            span["result_chars"] = len(str(response_data))
 
+    return types.Part.from_function_response(
+        name=function_name,
+        response=response_data,
+    )
+
+
+def call_function(function_call_part: types.FunctionCall, verbose=False, compact=None):
+    """
+    Executes a function call requested by the LLM.
+
+    Args:
+        function_call_part: The FunctionCall object from the LLM's response.
+        verbose: If True, prints detailed call and response information.
+        compact: If True, the result is sent as compact typed fields. Defaults to COMPACT_TOOL_RESULTS.
+
+    Returns:
+        A types.Content object with the function's result or an error.
+    """
     return types.Content(
         role="tool",
-        parts=[
-            types.Part.from_function_response(
-                name=function_name,
-                response=response_data,
-            )
-        ],
-    )
\ No newline at end of file
+        parts=[_execute_function_call(function_call_part, verbose=verbose, compact=compact)],
+    )
+
+
+class FunctionCallScheduler:
+    """
+    Starts function calls as soon as they stream in from the model.
+
+    Read-only calls start immediately, waiting only for the last write or
+    execution requested before them. Writes and executions wait for every
+    earlier call, so results match a sequential run in request order.
+    """
+
+    def __init__(self, verbose=False, working_directory=None, compact=None):
+        self.verbose = verbose
+        self.working_directory = working_directory
+        self.compact = compact
+        self._tasks = []
+        self._running = []
+        self._last_barrier = None
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def submit(self, function_call_part: types.FunctionCall):
+        """
+        Schedules a function call on the running event loop.
+
+        Args:
+            function_call_part: The FunctionCall object from the LLM's response.
+        """
+        is_read_only = function_call_part.name in READ_ONLY_FUNCTIONS
+        if is_read_only:
+            dependencies = [self._last_barrier] if self._last_barrier else []
+        else:
+            dependencies = list(self._tasks)
+
+        task = asyncio.create_task(self._run_after(dependencies, function_call_part))
+        if not is_read_only:
+            self._last_barrier = task
+
+        self._tasks.append(task)
+
+    async def _run_after(self, dependencies, function_call_part):
+        if dependencies:
+            await asyncio.wait(dependencies)
+        # A call cannot be stopped once its thread starts, so cancel() waits for it instead
+        running = asyncio.ensure_future(
+            asyncio.to_thread(_execute_function_call, function_call_part, self.verbose, self.working_directory, self.compact)
+        )
+        self._running.append(running)
+        return await asyncio.shield(running)
+
+    async def gather(self) -> types.Content:
+        """
+        Waits for every submitted call to finish.
+
+        Returns:
+            A single types.Content object with one function response part per
+            call, in the order the calls were submitted.
+        """
+        result_parts = await asyncio.gather(*self._tasks)
+        return types.Content(role="tool", parts=list(result_parts))
+
+    async def cancel(self):
+        """Cancels the calls that have not started yet and waits for the ones already running."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._running, return_exceptions=True)
@@ -1,14 +1,32 @@
 import os
-from config import MAX_FILE_CHARS
-from google.genai import types
+from config import MAX_FILE_CHARS, FILE_CACHE_MAX_ENTRY_BYTES
+from functions.compact_results import ToolResult
+from functions.file_cache import file_cache
+from functions.file_reader import read_lines, read_bytes
+from functions.schema import lazy_schema
+from tracing import tracer
 
-def get_file_content(working_directory: str, file_path: str) -> str:
+def get_file_content(
+    working_directory: str,
+    file_path: str,
+    if_changed: bool = False,
+    start_line: int = None,
+    end_line: int = None,
+    offset: int = None,
+    length: int = None,
+) -> str:
     """
     Reads the content of a specified file within a working directory.
 
     Args:
         working_directory: The base directory where operations are permitted.
         file_path: The relative path of the file to read.
+        if_changed: If True and the file is unchanged since it was last returned,
+            a short note is returned instead of the content.
+        start_line: The first line to read (1-based). Reads a line range instead of the whole file.
+        end_line: The last line to read (inclusive). Defaults to as many lines as fit in MAX_FILE_CHARS.
+        offset: The first byte to read. Reads a byte range instead of the whole file.
+        length: The number of bytes to read from `offset`. Defaults to MAX_FILE_CHARS.
 
     Returns:
         The file's content (potentially truncated) or an error message.
@@ -23,35 +41,133 @@ def get_file_content(working_directory: str, file_path: str) -> str:
         if not os.path.isfile(full_path):
             return f'Error: File not found or is not a regular file: "{file_path}"'
 
-        with open(full_path, "r", encoding="utf-8") as f:
-            # Read one extra character to efficiently check if the file exceeds the limit
-            content = f.read(MAX_FILE_CHARS + 1)
+        if start_line is not None or end_line is not None:
+            return _read_line_range(full_path, file_path, start_line, end_line)
+
+        if offset is not None or length is not None:
+            return _read_byte_range(full_path, file_path, offset, length)
+
+        stat_result = os.stat(full_path)
+        cached = file_cache.get(full_path, stat_result)
+        if cached is not None:
+            content, delivered = cached
+            if if_changed and delivered:
+                return _unchanged(file_path)
+        elif stat_result.st_size <= FILE_CACHE_MAX_ENTRY_BYTES:
+            with tracer.span("read_file", category="fs", path=file_path) as span:
+                with open(full_path, "r", encoding="utf-8") as f:
+                    stat_result = os.fstat(f.fileno())
+                    content = f.read()
+                span["chars"] = len(content)
+            file_cache.put(full_path, stat_result, content)
+        else:
+            # Too large to cache: map in only the first MAX_FILE_CHARS characters
+            if if_changed and file_cache.was_delivered(full_path, stat_result):
+                return _unchanged(file_path)
+            result = _read_line_range(full_path, file_path, 1, None)
+            if isinstance(result, ToolResult):
+                file_cache.mark_delivered(full_path, stat_result)
+            return result
+
+        file_cache.mark_delivered(full_path)
 
         if len(content) > MAX_FILE_CHARS:
             truncated_content = content[:MAX_FILE_CHARS]
-            return (
+            next_line = truncated_content.count("\n") + 1
+            return ToolResult(
                 truncated_content
-                + f'[...File "{file_path}" truncated at {MAX_FILE_CHARS} characters]'
+                + f'[...File "{file_path}" truncated at {MAX_FILE_CHARS} characters. Use start_line={next_line} to read more]',
+                {"content": truncated_content, "next_start_line": next_line},
             )
         else:
-            return content
+            return ToolResult(content, {"content": content})
 
     except UnicodeDecodeError:
         return f'Error: Cannot decode "{file_path}". It may be a binary file.'
     except Exception as e:
         return f"Error: {e}"
-    
-schema_get_file_content = types.FunctionDeclaration(
-    name="get_file_content",
-    description="Reads the contents of a specified file from the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The relative path to the file to be read.",
-            ),
-        },
-        required=["file_path"],
-    ),
-)
\ No newline at end of file
+
+
+def _unchanged(file_path: str) -> ToolResult:
+    return ToolResult(f'File "{file_path}" is unchanged since your last read.', {"unchanged": True})
+
+
+def _read_line_range(full_path: str, file_path: str, start_line, end_line) -> str:
+    start_line = int(start_line) if start_line is not None else 1
+    end_line = int(end_line) if end_line is not None else None
+    if start_line < 1 or (end_line is not None and end_line < start_line):
+        return f'Error: Invalid line range {start_line}-{end_line} for "{file_path}"'
+
+    try:
+        with tracer.span("read_lines", category="fs", path=file_path) as span:
+            content, last_line, truncated = read_lines(full_path, start_line, end_line)
+            span["chars"] = len(content)
+    except ValueError as e:
+        return f'Error: Cannot read "{file_path}": {e}'
+
+    header = f'[Lines {start_line}-{last_line} of "{file_path}"]\n'
+    fields = {"lines": [start_line, last_line], "content": content}
+    if truncated:
+        fields["next_start_line"] = last_line
+        return ToolResult(
+            header
+            + content
+            + f'[...Truncated at {MAX_FILE_CHARS} characters. Use start_line={last_line} to read more]',
+            fields,
+        )
+    return ToolResult(header + content, fields)
+
+
+def _read_byte_range(full_path: str, file_path: str, offset, length) -> str:
+    offset = int(offset) if offset is not None else 0
+    length = min(int(length), MAX_FILE_CHARS) if length is not None else MAX_FILE_CHARS
+    if offset < 0 or length < 0:
+        return f'Error: Invalid byte range for "{file_path}"'
+
+    with tracer.span("read_bytes", category="fs", path=file_path) as span:
+        content, end, size = read_bytes(full_path, offset, length)
+        span["chars"] = len(content)
+    header = f'[Bytes {offset}-{end} of {size} in "{file_path}"]\n'
+    return ToolResult(header + content, {"bytes": [offset, end], "size": size, "content": content})
+
+
+def _build_schema():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="get_file_content",
+        description="Reads the contents of a specified file from the working directory, optionally only a range of lines or bytes.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The relative path to the file to be read.",
+                ),
+                "start_line": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional first line to read (1-based). Use with end_line to read only part of a large file.",
+                ),
+                "end_line": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional last line to read (inclusive). If omitted with start_line, reads as many lines as fit in the character limit.",
+                ),
+                "offset": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Optional byte offset to start reading from, for files without useful line structure.",
+                ),
+                "length": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"Optional number of bytes to read from offset (at most {MAX_FILE_CHARS}).",
+                ),
+                "if_changed": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Set to true if this file's content from an earlier read is still in your context. If the file has not changed since then, a short note is returned instead of the full content.",
+                ),
+            },
+            required=["file_path"],
+        ),
+    )
+
+
+__getattr__ = lazy_schema("schema_get_file_content", _build_schema)
@@ -1,19 +1,27 @@
 import os
-from google.genai import types
+from config import LISTING_MAX_DEPTH, LISTING_PAGE_SIZE
+from functions.compact_results import ToolResult
+from functions.workspace import IgnoreRules, iter_tree
+from functions.schema import lazy_schema
+from tracing import tracer
 
-def get_files_info(working_directory, directory="."):
+def get_files_info(working_directory, directory=".", recursive=False, max_depth=None, cursor=None):
     """
     Lists the contents of a specified directory within a working directory.
 
     Args:
         working_directory (str): The base directory where operations are permitted.
         directory (str): The relative path of the directory to list.
+        recursive (bool): If True, lists the whole tree below `directory` in a
+            compact indented format, skipping ignored files.
+        max_depth (int): How many levels below `directory` a recursive listing descends.
+        cursor (str): The path a previous recursive listing stopped at, to fetch the next page.
 
     Returns:
         str: A formatted string of the directory contents or an error message.
     """
     try:
-        
+
         full_path = os.path.join(working_directory, directory)
 
         # Prevent directory traversal
@@ -26,31 +34,108 @@ def get_files_info(working_directory, directory="."):
         if not os.path.isdir(full_path):
             return f'Error: "{directory}" is not a directory'
 
-        # Get the list of items in the directory and format
-        items = os.listdir(full_path)
+        if recursive:
+            with tracer.span("list_tree", category="fs", path=directory):
+                return _list_tree(abs_working_dir, abs_full_path, max_depth, cursor)
+
+        # Get the items in the directory and format, reusing each entry's cached stat data
         output_lines = []
+        # Compact form: one column of names, directories ending in "/", and one of sizes
+        columns = {"name": [], "size": []}
 
-        for item in items:
-            item_path = os.path.join(full_path, item)
-            file_size = os.path.getsize(item_path)
-            is_dir = os.path.isdir(item_path)
-            output_lines.append(f"- {item}: file_size={file_size} bytes, is_dir={is_dir}")
+        with tracer.span("scandir", category="fs", path=directory) as span:
+            with os.scandir(full_path) as entries:
+                for entry in sorted(entries, key=lambda entry: entry.name):
+                    file_size = entry.stat().st_size
+                    is_dir = entry.is_dir()
+                    output_lines.append(f"- {entry.name}: file_size={file_size} bytes, is_dir={is_dir}")
+                    columns["name"].append(entry.name + "/" if is_dir else entry.name)
+                    columns["size"].append(file_size)
+            span["entries"] = len(output_lines)
 
-        return "\n".join(output_lines)
+        return ToolResult("\n".join(output_lines), columns)
 
     except Exception as e:
         return f"Error: {e}"
-    
-schema_get_files_info = types.FunctionDeclaration(
-    name="get_files_info",
-    description="Lists files in the specified directory along with their sizes, constrained to the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "directory": types.Schema(
-                type=types.Type.STRING,
-                description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
-            ),
-        },
-    ),
-)
\ No newline at end of file
+
+
+def _list_tree(abs_working_dir, abs_full_path, max_depth, cursor):
+    """
+    Formats one page of a recursive listing as an indented tree.
+
+    Directories end in "/", files show their size in bytes. Ancestors of the
+    first entry on a resumed page are repeated so the indentation stays readable.
+    """
+    rel_dir = os.path.relpath(abs_full_path, abs_working_dir).replace(os.sep, "/")
+    if rel_dir == ".":
+        rel_dir = ""
+    max_depth = LISTING_MAX_DEPTH if max_depth is None else int(max_depth)
+    after = tuple(cursor.strip("/").split("/")) if cursor else None
+
+    tree = iter_tree(abs_working_dir, rel_dir, max_depth, IgnoreRules(abs_working_dir), after)
+    base_depth = len(rel_dir.split("/")) if rel_dir else 0
+
+    output_lines = []
+    last_path = None
+    has_more = False
+    for rel_path, entry, depth in tree:
+        if len(output_lines) >= LISTING_PAGE_SIZE:
+            has_more = True
+            break
+
+        if last_path is None and after is not None:
+            # Repeat the ancestors of the first entry on a resumed page
+            ancestors = rel_path.split("/")[base_depth:-1]
+            for level, name in enumerate(ancestors):
+                output_lines.append(f"{'  ' * level}{name}/")
+
+        indent = "  " * depth
+        if entry.is_dir(follow_symlinks=False):
+            below_limit = depth >= max_depth
+            output_lines.append(f"{indent}{entry.name}/{' ...' if below_limit else ''}")
+        else:
+            output_lines.append(f"{indent}{entry.name} {entry.stat(follow_symlinks=False).st_size}")
+        last_path = rel_path
+
+    if not output_lines:
+        return ToolResult("No entries found.", {"tree": ""})
+
+    fields = {"tree": "\n".join(output_lines)}
+    if has_more:
+        fields["cursor"] = last_path
+        output_lines.append(f'[More entries available. Call again with cursor="{last_path}"]')
+
+    return ToolResult("\n".join(output_lines), fields)
+
+
+def _build_schema():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="get_files_info",
+        description="Lists files in the specified directory along with their sizes, constrained to the working directory. Set recursive to map a whole directory tree in one call.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "directory": types.Schema(
+                    type=types.Type.STRING,
+                    description="The directory to list files from, relative to the working directory. If not provided, lists files in the working directory itself.",
+                ),
+                "recursive": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="If true, lists every file below the directory as a compact indented tree (directories end in '/', files show their size in bytes), skipping .gitignore'd files, __pycache__ and virtual environments.",
+                ),
+                "max_depth": types.Schema(
+                    type=types.Type.INTEGER,
+                    description=f"For recursive listings, how many directory levels to descend. Defaults to {LISTING_MAX_DEPTH}. Directories cut off by the limit end in '/ ...'.",
+                ),
+                "cursor": types.Schema(
+                    type=types.Type.STRING,
+                    description="For recursive listings, the cursor returned by a previous call, to fetch the next page of entries.",
+                ),
+            },
+        ),
+    )
+
+
+__getattr__ = lazy_schema("schema_get_files_info", _build_schema)
@@ -0,0 +1,76 @@
+from functions.compact_results import ToolResult
+from functions.schema import lazy_schema
+from functions.workspace_snapshot import get_workspace_snapshots
+from tracing import tracer
+
+# At most this many paths are listed for each kind of change
+MAX_LISTED_CHANGES = 100
+
+
+def get_workspace_changes(working_directory: str, since_snapshot: str = None) -> str:
+    """
+    Lists the files added, removed or modified in the working directory since a snapshot.
+
+    Every call takes a new snapshot of the working directory and returns its
+    id, so the next call can list only what changed after this one.
+
+    Args:
+        working_directory: The base directory where operations are permitted.
+        since_snapshot: The id of an earlier snapshot returned by this function.
+            If omitted, only the current snapshot id is returned.
+
+    Returns:
+        The current snapshot id and the changed paths, or an error message.
+    """
+    try:
+        snapshots = get_workspace_snapshots(working_directory)
+        with snapshots.lock:
+            with tracer.span("refresh_snapshot", category="fs") as span:
+                snapshot_id = snapshots.refresh()
+                span["files"] = snapshots.root.file_count
+
+            header = f"Snapshot {snapshot_id} ({snapshots.root.file_count} files)."
+            fields = {"snapshot": snapshot_id, "files": snapshots.root.file_count}
+            if not since_snapshot:
+                return ToolResult(f"{header} Pass it as since_snapshot to list the changes made after this point.", fields)
+            if since_snapshot not in snapshots.snapshots:
+                return f'Error: Unknown snapshot "{since_snapshot}". Call without since_snapshot to take a new one.'
+            changes = snapshots.diff(since_snapshot, snapshot_id)
+
+        if not any(changes.values()):
+            return ToolResult(f"{header} No changes since {since_snapshot}.", fields)
+
+        lines = [f"{header} Changes since {since_snapshot}: " + ", ".join(f"{len(paths)} {kind}" for kind, paths in changes.items() if paths)]
+        for kind, paths in changes.items():
+            if paths:
+                listed = ", ".join(paths[:MAX_LISTED_CHANGES])
+                more = f" and {len(paths) - MAX_LISTED_CHANGES} more" if len(paths) > MAX_LISTED_CHANGES else ""
+                lines.append(f"{kind}: {listed}{more}")
+                fields[kind] = paths[:MAX_LISTED_CHANGES]
+                if len(paths) > MAX_LISTED_CHANGES:
+                    fields[f"{kind}_more"] = len(paths) - MAX_LISTED_CHANGES
+        return ToolResult("\n".join(lines), fields)
+
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _build_schema():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="get_workspace_changes",
+        description="Lists only the files added, removed or modified in the working directory since an earlier snapshot, e.g. to see what a script run generated without listing and re-reading everything. Each call returns a new snapshot id.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "since_snapshot": types.Schema(
+                    type=types.Type.STRING,
+                    description="The snapshot id returned by an earlier call. Omit it to just take a snapshot.",
+                ),
+            },
+        ),
+    )
+
+
+__getattr__ = lazy_schema("schema_get_workspace_changes", _build_schema)
@@ -0,0 +1,248 @@
+import ast
+import contextlib
+import fnmatch
+import hashlib
+import os
+import pickle
+import threading
+from config import CACHE_DIRECTORY, TEST_FILE_PATTERNS
+from functions.workspace import IgnoreRules, iter_tree
+
+
+def is_test_file(rel_path: str) -> bool:
+    name = os.path.basename(rel_path)
+    return any(fnmatch.fnmatch(name, pattern) for pattern in TEST_FILE_PATTERNS)
+
+
+def _referenced_names(nodes) -> set[str]:
+    """Returns the root names referenced by a list of statements, e.g. "os" for os.path.join."""
+    return {
+        node.id
+        for statement in nodes
+        for node in ast.walk(statement)
+        if isinstance(node, ast.Name)
+    }
+
+
+def _parse_module(source: str):
+    """
+    Extracts the imports, and for test files the test cases, from a module's source.
+
+    Returns:
+        A tuple of (imports, cases, names). `imports` is a list of (module,
+        imported names, relative import level, bound name) tuples, one per
+        imported name. `cases` maps test case ids ("Class" or "test_function")
+        to their test method names, or None for a function. `names` maps each
+        case id to the names it references, and "" to the names referenced by
+        module-level code outside any case.
+    """
+    tree = ast.parse(source)
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                # `import a.b` binds "a", `import a.b as c` binds "c" to a.b
+                bound = alias.asname or alias.name.split(".")[0]
+                imports.append((alias.name, (), 0, bound))
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                imports.append((node.module or "", (alias.name,), node.level, alias.asname or alias.name))
+
+    cases = {}
+    names = {"": set()}
+    for statement in tree.body:
+        if isinstance(statement, ast.ClassDef):
+            methods = [
+                item.name for item in statement.body
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith("test")
+            ]
+            if methods:
+                cases[statement.name] = methods
+                names[statement.name] = _referenced_names([statement])
+                continue
+        elif isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)) and statement.name.startswith("test"):
+            cases[statement.name] = None
+            names[statement.name] = _referenced_names([statement])
+            continue
+        if not isinstance(statement, (ast.Import, ast.ImportFrom)):
+            names[""] |= _referenced_names([statement])
+
+    return imports, cases, names
+
+
+class ImportGraph:
+    """
+    A persistent graph of which Python files in a working directory import which.
+
+    Imports are found statically with `ast`, and resolved both relative to the
+    importing file's directory (as when it is run as a script) and to the
+    working directory. Like the search index, each refresh re-parses only the
+    files whose (mtime_ns, size) changed, and reports which files those were.
+    """
+
+    def __init__(self, working_directory: str):
+        self.working_directory = os.path.abspath(working_directory)
+        key = hashlib.sha256(self.working_directory.encode()).hexdigest()[:16]
+        self.graph_path = os.path.join(CACHE_DIRECTORY, "import_graph", f"{key}.pickle")
+        self.files = {}  # rel_path -> (mtime_ns, size, imports, cases, names)
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.graph_path, "rb") as f:
+                self.files = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, ValueError):
+            self.files = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.graph_path), exist_ok=True)
+        temp_path = f"{self.graph_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(self.files, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.graph_path)
+
+    def refresh(self) -> set[str]:
+        """
+        Brings the graph up to date with the files on disk.
+
+        Returns:
+            The Python files added, changed or removed since the last refresh.
+        """
+        seen = set()
+        changed = set()
+        rules = IgnoreRules(self.working_directory)
+        for rel_path, entry, _ in iter_tree(self.working_directory, rules=rules):
+            if not rel_path.endswith(".py") or not entry.is_file(follow_symlinks=False):
+                continue
+            seen.add(rel_path)
+            stat_result = entry.stat(follow_symlinks=False)
+            known = self.files.get(rel_path)
+            if known is not None and known[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+                continue
+
+            try:
+                with open(os.path.join(self.working_directory, rel_path), encoding="utf-8") as f:
+                    parsed = _parse_module(f.read())
+            except (OSError, UnicodeDecodeError, SyntaxError, ValueError):
+                # Unparseable files still count as changed, with no known imports
+                parsed = ([], {}, {"": set()})
+            self.files[rel_path] = (stat_result.st_mtime_ns, stat_result.st_size, *parsed)
+            changed.add(rel_path)
+
+        for rel_path in [path for path in self.files if path not in seen]:
+            del self.files[rel_path]
+            changed.add(rel_path)
+
+        if changed:
+            self._save()
+        return changed
+
+    def _resolve_module(self, rel_path: str, module: str, level: int) -> list[str]:
+        """Returns the workspace files that importing `module` from `rel_path` loads, packages first."""
+        importer_dir = os.path.dirname(rel_path)
+        if level:
+            base_dir = importer_dir
+            for _ in range(level - 1):
+                base_dir = os.path.dirname(base_dir)
+            base_dirs = [base_dir]
+        else:
+            # Scripts import relative to their own directory, packages relative to the root
+            base_dirs = [importer_dir, ""] if importer_dir else [""]
+
+        parts = module.split(".") if module else []
+        for base_dir in base_dirs:
+            found = []
+            directory = base_dir
+            for i, part in enumerate(parts):
+                directory = f"{directory}/{part}" if directory else part
+                if f"{directory}/__init__.py" in self.files:
+                    found.append(f"{directory}/__init__.py")
+                elif i == len(parts) - 1 and f"{directory}.py" in self.files:
+                    found.append(f"{directory}.py")
+                elif not os.path.isdir(os.path.join(self.working_directory, directory)):
+                    break
+            else:
+                if not parts and f"{base_dir}/__init__.py".lstrip("/") in self.files:
+                    found.append(f"{base_dir}/__init__.py".lstrip("/"))
+                if found:
+                    return found
+        return []
+
+    def _bindings(self, rel_path: str) -> dict[str, set[str]]:
+        """Maps each name a file's imports bind to the workspace files it came from."""
+        bindings = {}
+        for module, imported_names, level, bound in self.files[rel_path][2]:
+            paths = set(self._resolve_module(rel_path, module, level))
+            for name in imported_names:
+                # `from package import submodule` loads the submodule's file too
+                submodule = f"{module}.{name}" if module else name
+                paths.update(self._resolve_module(rel_path, submodule, level))
+            if paths:
+                bindings.setdefault(bound, set()).update(paths)
+        return bindings
+
+    def dependents(self, rel_paths: set[str]) -> set[str]:
+        """Returns the given files and every file that imports them, directly or indirectly."""
+        importers = {}
+        for rel_path in self.files:
+            for paths in self._bindings(rel_path).values():
+                for path in paths:
+                    importers.setdefault(path, set()).add(rel_path)
+
+        affected = set(rel_paths)
+        pending = list(rel_paths)
+        while pending:
+            for importer in importers.get(pending.pop(), ()):
+                if importer not in affected:
+                    affected.add(importer)
+                    pending.append(importer)
+        return affected
+
+    def test_files(self) -> list[str]:
+        return sorted(path for path in self.files if is_test_file(path) and self.files[path][3])
+
+    def affected_cases(self, test_file: str, changed: set[str], affected: set[str]):
+        """
+        Picks the test cases in a test file that can observe a change.
+
+        A case is affected if it references a name imported from an affected
+        file, i.e. a changed file or one of its dependents. If the test file
+        itself changed, or module-level code uses such a name, or no case can
+        be singled out, every case is affected.
+
+        Returns:
+            A dict of case id to test method names (None for test functions).
+        """
+        _, _, _, cases, names = self.files[test_file]
+        if test_file in changed:
+            return dict(cases)
+
+        tainted = {name for name, paths in self._bindings(test_file).items() if paths & affected}
+        if not tainted:
+            return {}
+        if names[""] & tainted:
+            return dict(cases)
+
+        selected = {case: methods for case, methods in cases.items() if names[case] & tainted}
+        return selected or dict(cases)
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_import_graph(working_directory: str) -> ImportGraph:
+    key = os.path.abspath(working_directory)
+    with _graphs_lock:
+        if key not in _graphs:
+            _graphs[key] = ImportGraph(key)
+        return _graphs[key]
+
+def discard_import_graph(working_directory: str):
+    """Drops the import graph kept for a working directory, along with its pickle."""
+    with _graphs_lock:
+        graph = _graphs.pop(os.path.abspath(working_directory), None)
+    if graph is not None:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(graph.graph_path)
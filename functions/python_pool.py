@@ -0,0 +1,190 @@
+import atexit
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from config import IGNORED_NAMES, RUN_OUTPUT_HEAD_BYTES, RUN_OUTPUT_MAX_BYTES, RUN_OUTPUT_TAIL_BYTES
+from functions.bounded_output import BoundedOutput
+
+# Runs as a standalone script, so it must only import the standard library
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warm_python_server.py")
+
+# How often a run's output files are checked against RUN_OUTPUT_MAX_BYTES
+OUTPUT_CHECK_INTERVAL = 0.05
+
+
+def max_rss_bytes(ru_maxrss: int) -> int:
+    """Converts rusage's peak resident set size, in KiB on Linux and bytes on macOS, to bytes."""
+    return ru_maxrss if sys.platform == "darwin" else ru_maxrss * 1024
+
+
+def _read_bounded(path: str) -> BoundedOutput:
+    captured = BoundedOutput(RUN_OUTPUT_HEAD_BYTES, RUN_OUTPUT_TAIL_BYTES)
+    with open(path, "rb") as f:
+        while chunk := f.read(65536):
+            captured.write(chunk)
+    return captured
+
+
+class WarmPythonPool:
+    """
+    Runs Python files by forking from a pre-warmed server process.
+
+    The server starts once per working directory and imports the standard
+    library and installed packages the project's files import, so each run
+    only pays for a fork and the project's own imports instead of a new
+    interpreter and fresh imports. Every run still happens in its own child
+    process. Project modules are never preloaded; should one be loaded
+    anyway, the server is restarted when it changes on disk.
+    """
+
+    def __init__(self, working_directory: str):
+        self.working_directory = os.path.abspath(working_directory)
+        self._process = None
+        self._preloaded_files = {}
+        self._buffer = b""
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._process = subprocess.Popen(
+            [sys.executable, SERVER_SCRIPT, self.working_directory, json.dumps(sorted(IGNORED_NAMES))],
+            cwd=self.working_directory,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        self._buffer = b""
+        ready = self._read_reply(timeout=30)
+        self._preloaded_files = ready["preloaded"]
+
+    def _is_stale(self) -> bool:
+        if self._process is None or self._process.poll() is not None:
+            return True
+        for path, mtime_ns in self._preloaded_files.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _read_reply(self, timeout: float) -> dict:
+        fd = self._process.stdout.fileno()
+        while b"\n" not in self._buffer:
+            readable, _, _ = select.select([fd], [], [], timeout)
+            if not readable:
+                raise subprocess.TimeoutExpired(self._process.args, timeout)
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise RuntimeError("Warm Python server exited unexpectedly")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def run(self, full_path: str, args: list, timeout: float):
+        """
+        Runs a Python file in a fresh child forked from the warm server.
+
+        The child writes its output to temporary files, which are checked while
+        it runs so it can be killed once they exceed RUN_OUTPUT_MAX_BYTES, and
+        are read back into bounded head/tail captures.
+
+        Args:
+            full_path: The absolute path of the Python file to execute.
+            args: A list of string arguments to pass to the Python script.
+            timeout: Seconds to wait before killing the run.
+
+        Returns:
+            A tuple of (stdout, stderr, returncode, usage), where stdout and
+            stderr are BoundedOutput captures and usage is a dict with
+            "cpu_seconds", "max_rss_bytes" and "output_limit_hit".
+
+        Raises:
+            subprocess.TimeoutExpired: If the run takes longer than `timeout`.
+        """
+        with self._lock:
+            if self._is_stale():
+                self.close()
+                self._start()
+
+            stdout_fd, stdout_path = tempfile.mkstemp(prefix="warm-stdout-")
+            stderr_fd, stderr_path = tempfile.mkstemp(prefix="warm-stderr-")
+
+            try:
+                request = {"path": full_path, "args": args, "stdout": stdout_path, "stderr": stderr_path}
+                self._process.stdin.write(json.dumps(request).encode() + b"\n")
+
+                pid = self._read_reply(timeout=timeout)["pid"]
+                deadline = time.monotonic() + timeout
+                output_limit_hit = False
+                while True:
+                    try:
+                        reply = self._read_reply(timeout=OUTPUT_CHECK_INTERVAL)
+                        break
+                    except subprocess.TimeoutExpired:
+                        pass
+                    output_bytes = os.fstat(stdout_fd).st_size + os.fstat(stderr_fd).st_size
+                    if not output_limit_hit and output_bytes > RUN_OUTPUT_MAX_BYTES:
+                        output_limit_hit = True
+                        os.killpg(pid, signal.SIGKILL)
+                    elif time.monotonic() >= deadline:
+                        os.killpg(pid, signal.SIGKILL)
+                        self._read_reply(timeout=timeout)
+                        raise subprocess.TimeoutExpired(full_path, timeout)
+
+                usage = {
+                    "cpu_seconds": reply["cpu_seconds"],
+                    "max_rss_bytes": max_rss_bytes(reply["max_rss"]),
+                    "output_limit_hit": output_limit_hit,
+                }
+                return _read_bounded(stdout_path), _read_bounded(stderr_path), reply["returncode"], usage
+            finally:
+                os.close(stdout_fd)
+                os.close(stderr_fd)
+                os.unlink(stdout_path)
+                os.unlink(stderr_path)
+
+    def close(self):
+        """Stops the warm server, if it is running."""
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process.stdin.close()
+            self._process.stdout.close()
+            self._process = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(working_directory: str) -> WarmPythonPool:
+    """
+    Returns the shared warm pool for a working directory, creating it if needed.
+    """
+    key = os.path.abspath(working_directory)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = WarmPythonPool(key)
+        return _pools[key]
+
+
+
+def close_pool(working_directory: str):
+    """Stops and forgets the warm pool for a working directory, if it has one."""
+    with _pools_lock:
+        pool = _pools.pop(os.path.abspath(working_directory), None)
+    if pool is not None:
+        pool.close()
+
+
+@atexit.register
+def _close_pools():
+    for pool in _pools.values():
+        pool.close()
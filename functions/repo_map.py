@@ -0,0 +1,201 @@
+import ast
+import contextlib
+import hashlib
+import os
+import pickle
+import threading
+from config import CACHE_DIRECTORY, CHARS_PER_TOKEN, REPO_MAP_TOKEN_BUDGET
+from functions.workspace import IgnoreRules, iter_tree
+
+
+def _signature(node) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = ", ".join(ast.unparse(base) for base in node.bases)
+        return f"class {node.name}({bases})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _outline_module(source: str):
+    """
+    Extracts a module's outline and imports.
+
+    Returns:
+        A tuple of (outline, imports). `outline` is a list of "line: signature"
+        strings for the top-level classes and functions and the methods of
+        each class, indented by nesting. `imports` is the set of dotted module
+        names the module imports, including `package.name` for each
+        `from package import name`.
+    """
+    tree = ast.parse(source)
+    outline = []
+    for node in tree.body:
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            outline.append(f"  {node.lineno}: {_signature(node)}")
+        if isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    outline.append(f"    {item.lineno}: {_signature(item)}")
+
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            imports.add(node.module)
+            imports.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return outline, imports
+
+
+def _module_names(rel_path: str) -> list[str]:
+    """The dotted names a file can be imported as: relative to the root, or to any parent directory."""
+    parts = rel_path[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return [".".join(parts[i:]) for i in range(len(parts)) if parts[i:]]
+
+
+class RepoMap:
+    """
+    A compact outline of a working directory: its files, classes and function signatures.
+
+    Outlines are extracted with `ast` and kept in an on-disk cache, and like
+    the import graph each refresh re-parses only the files whose (mtime_ns,
+    size) changed. Files are ranked by how many other files import them, so
+    the shared modules come first when the map is trimmed to a token budget.
+    """
+
+    def __init__(self, working_directory: str):
+        self.working_directory = os.path.abspath(working_directory)
+        key = hashlib.sha256(self.working_directory.encode()).hexdigest()[:16]
+        self.map_path = os.path.join(CACHE_DIRECTORY, "repo_map", f"{key}.pickle")
+        self.files = {}  # rel_path -> (mtime_ns, size, outline, imports), outline None for non-Python files
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.map_path, "rb") as f:
+                self.files = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, ValueError):
+            self.files = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.map_path), exist_ok=True)
+        temp_path = f"{self.map_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(self.files, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.map_path)
+
+    def refresh(self):
+        """Brings the outlines up to date with the files on disk."""
+        seen = set()
+        changed = False
+        rules = IgnoreRules(self.working_directory)
+        for rel_path, entry, _ in iter_tree(self.working_directory, rules=rules):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            seen.add(rel_path)
+            stat_result = entry.stat(follow_symlinks=False)
+            known = self.files.get(rel_path)
+            if known is not None and known[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+                continue
+
+            outline, imports = None, set()
+            if rel_path.endswith(".py"):
+                try:
+                    with open(os.path.join(self.working_directory, rel_path), encoding="utf-8") as f:
+                        outline, imports = _outline_module(f.read())
+                except (OSError, UnicodeDecodeError, SyntaxError, ValueError):
+                    outline = []
+            self.files[rel_path] = (stat_result.st_mtime_ns, stat_result.st_size, outline, imports)
+            changed = True
+
+        for rel_path in [path for path in self.files if path not in seen]:
+            del self.files[rel_path]
+            changed = True
+
+        if changed:
+            self._save()
+
+    def ranked_files(self) -> list[str]:
+        """Orders the files by how many other files import them, then by depth and path."""
+        owners = {}
+        for rel_path, (_, _, outline, _) in self.files.items():
+            if outline is not None:
+                for name in _module_names(rel_path):
+                    owners.setdefault(name, set()).add(rel_path)
+
+        importers = {}
+        for rel_path, (_, _, _, imports) in self.files.items():
+            for name in imports:
+                for owner in owners.get(name, ()):
+                    if owner != rel_path:
+                        importers.setdefault(owner, set()).add(rel_path)
+
+        return sorted(
+            self.files,
+            key=lambda path: (self.files[path][2] is None, -len(importers.get(path, ())), path.count("/"), path),
+        )
+
+    def render(self, token_budget: int) -> str:
+        """
+        Renders the map, adding whole files in rank order until the budget is spent.
+
+        Returns:
+            One line per file followed by its outline, or "" for an empty directory.
+        """
+        budget_chars = token_budget * CHARS_PER_TOKEN
+        lines = []
+        used_chars = 0
+        ranked = self.ranked_files()
+        for shown, rel_path in enumerate(ranked):
+            _, size, outline, _ = self.files[rel_path]
+            block = [rel_path] + (outline or []) if outline is not None else [f"{rel_path} ({size} bytes)"]
+            block_chars = sum(len(line) + 1 for line in block)
+            if used_chars + block_chars > budget_chars:
+                # Fall back to the bare path of a file whose outline does not fit
+                block = [rel_path]
+                block_chars = len(rel_path) + 1
+                if used_chars + block_chars > budget_chars:
+                    lines.append(f"... and {len(ranked) - shown} more files")
+                    break
+            lines.extend(block)
+            used_chars += block_chars
+        return "\n".join(lines)
+
+
+_maps = {}
+_maps_lock = threading.Lock()
+
+
+def build_repo_map(working_directory: str, token_budget: int = REPO_MAP_TOKEN_BUDGET) -> str:
+    """
+    Returns the repository map of a working directory, trimmed to a token budget.
+
+    Args:
+        working_directory: The directory to map.
+        token_budget: The approximate number of tokens the map may use.
+
+    Returns:
+        The rendered map, or "" if the budget is 0 or the directory is empty.
+    """
+    if token_budget <= 0:
+        return ""
+    key = os.path.abspath(working_directory)
+    with _maps_lock:
+        if key not in _maps:
+            _maps[key] = RepoMap(key)
+        repo_map = _maps[key]
+    with repo_map.lock:
+        repo_map.refresh()
+        return repo_map.render(token_budget)
+
+def discard_repo_map(working_directory: str):
+    """Forgets the outlines cached for a working directory, in memory and on disk."""
+    with _maps_lock:
+        repo_map = _maps.pop(os.path.abspath(working_directory), None)
+    if repo_map is not None:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(repo_map.map_path)
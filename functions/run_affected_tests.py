@@ -0,0 +1,190 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from functions.compact_results import ToolResult
+from functions.import_graph import get_import_graph
+from functions.schema import lazy_schema
+from functions.workspace import IgnoreRules, iter_tree
+from tracing import tracer
+
+RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "affected_test_runner.py")
+
+# At most this many failing tests are listed in the summary
+MAX_LISTED_FAILURES = 20
+
+# Per working directory, the (mtime_ns, size) of each Python file as of the
+# last test run in this session, which default calls report changes against.
+# Kept apart from the import graph, whose refreshes only maintain the cache.
+_baselines = {}
+_baselines_lock = threading.Lock()
+
+
+def _python_file_stats(abs_working_dir: str) -> dict:
+    stats = {}
+    for rel_path, entry, _ in iter_tree(abs_working_dir, rules=IgnoreRules(abs_working_dir)):
+        if rel_path.endswith(".py") and entry.is_file(follow_symlinks=False):
+            stat_result = entry.stat(follow_symlinks=False)
+            stats[rel_path] = (stat_result.st_mtime_ns, stat_result.st_size)
+    return stats
+
+
+def record_test_baseline(working_directory: str):
+    """Records the state that the next default run_affected_tests call reports changes against, e.g. when a session starts."""
+    abs_working_dir = os.path.abspath(working_directory)
+    stats = _python_file_stats(abs_working_dir)
+    with _baselines_lock:
+        _baselines[abs_working_dir] = stats
+
+
+def _run_test_file(abs_working_dir: str, test_file: str, cases: list[str]) -> list[dict]:
+    """Runs the given cases of one test file in a fresh interpreter and returns their outcomes."""
+    directory, file_name = os.path.split(os.path.join(abs_working_dir, test_file))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [abs_working_dir, env.get("PYTHONPATH")]))
+
+    fd, results_path = tempfile.mkstemp(prefix="affected-tests-", suffix=".json")
+    os.close(fd)
+    try:
+        with tracer.span("run_tests", category="subprocess", path=test_file, cases=len(cases)):
+            subprocess.run(
+                [sys.executable, RUNNER_SCRIPT, results_path, file_name[:-3], *cases],
+                cwd=directory,
+                env=env,
+                timeout=30,
+                capture_output=True,
+            )
+        with open(results_path, encoding="utf-8") as f:
+            content = f.read()
+        if not content:
+            return [{"id": file_name, "outcome": "error", "message": "test process exited without results"}]
+        return json.loads(content)
+    except subprocess.TimeoutExpired:
+        return [{"id": file_name, "outcome": "error", "message": "timed out after 30 seconds"}]
+    finally:
+        os.unlink(results_path)
+
+
+def run_affected_tests(working_directory: str, changed_files: list = None, run_all: bool = False) -> str:
+    """
+    Runs only the tests that can be affected by changes to the working directory.
+
+    An import graph of the working directory, built with `ast` and updated
+    incrementally from file stat data, maps changed files to every file that
+    imports them, directly or indirectly. Within each affected test file, only
+    the test classes and functions that use a name imported from an affected
+    file are run.
+
+    Args:
+        working_directory: The base directory where operations are permitted.
+        changed_files: Relative paths of the changed files. Defaults to the
+            Python files changed since the last test run in this session, or
+            since the session started.
+        run_all: If True, runs every test instead.
+
+    Returns:
+        A compact pass/fail summary listing the failing tests, or an error message.
+    """
+    try:
+        abs_working_dir = os.path.abspath(working_directory)
+        changes = set()
+        for file_path in changed_files or []:
+            full_path = os.path.abspath(os.path.join(working_directory, file_path))
+            if not full_path.startswith(abs_working_dir):
+                return f'Error: "{file_path}" is outside the permitted working directory'
+            changes.add(os.path.relpath(full_path, abs_working_dir).replace(os.sep, "/"))
+
+        current = _python_file_stats(abs_working_dir)
+        with _baselines_lock:
+            baseline = _baselines.get(abs_working_dir)
+            if run_all or baseline is None:
+                _baselines[abs_working_dir] = current
+            elif changed_files:
+                # Only the files named were tested; other edits are still reported next time
+                for rel_path in changes:
+                    if rel_path in current:
+                        baseline[rel_path] = current[rel_path]
+                    else:
+                        baseline.pop(rel_path, None)
+            else:
+                changes = {rel_path for rel_path in current.keys() | baseline.keys() if current.get(rel_path) != baseline.get(rel_path)}
+                _baselines[abs_working_dir] = current
+        if not changed_files and not run_all and baseline is None:
+            return "Error: No earlier test run or session start to compare against. Pass changed_files, or run_all=true."
+
+        graph = get_import_graph(abs_working_dir)
+        with graph.lock:
+            with tracer.span("refresh_import_graph", category="fs"):
+                graph.refresh()
+
+            if run_all:
+                selection = {test_file: graph.files[test_file][3] for test_file in graph.test_files()}
+            else:
+                if not changes:
+                    return ToolResult("No Python files changed since the last test run. Pass run_all=true to run every test.", {"changed": []})
+                affected = graph.dependents(changes)
+                selection = {test_file: graph.affected_cases(test_file, changes, affected) for test_file in graph.test_files()}
+            selection = {test_file: cases for test_file, cases in selection.items() if cases}
+
+        described_changes = ", ".join(sorted(changes)[:10]) + (f" and {len(changes) - 10} more" if len(changes) > 10 else "")
+        header = "All tests" if run_all else f"Tests affected by {described_changes}"
+        if not selection:
+            return ToolResult(f"{header}: none found.", {"tests": 0})
+
+        outcomes = []
+        for test_file, cases in selection.items():
+            for outcome in _run_test_file(abs_working_dir, test_file, sorted(cases)):
+                outcomes.append({**outcome, "file": test_file})
+
+        counts = {}
+        for outcome in outcomes:
+            counts[outcome["outcome"]] = counts.get(outcome["outcome"], 0) + 1
+        status = "FAILED" if counts.get("failed") or counts.get("error") else "OK"
+        count_text = ", ".join(f"{count} {outcome}" for outcome, count in sorted(counts.items()))
+
+        file_count = f"{len(selection)} file" if len(selection) == 1 else f"{len(selection)} files"
+        test_count = "1 test" if len(outcomes) == 1 else f"{len(outcomes)} tests"
+        lines = [f"{header}: ran {test_count} from {file_count}. {status} ({count_text})"]
+        # Compact form: the counts, and the listed failures grouped under each test file
+        fields = {"status": status, "counts": counts}
+        problems = [outcome for outcome in outcomes if outcome["outcome"] in ("failed", "error")]
+        for outcome in problems[:MAX_LISTED_FAILURES]:
+            lines.append(f"- {outcome['outcome']} {outcome['file']}::{outcome['id']}: {outcome['message']}")
+            fields.setdefault("failures", {}).setdefault(outcome["file"], []).append(
+                f"{outcome['outcome']} {outcome['id']}: {outcome['message']}"
+            )
+        if len(problems) > MAX_LISTED_FAILURES:
+            lines.append(f"- ... and {len(problems) - MAX_LISTED_FAILURES} more")
+            fields["more_failures"] = len(problems) - MAX_LISTED_FAILURES
+        return ToolResult("\n".join(lines), fields)
+
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _build_schema():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="run_affected_tests",
+        description="Runs only the tests that depend on the changed Python files, found through a static import graph of the working directory, and returns a compact pass/fail summary. Faster than running whole test scripts with run_python_file.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "changed_files": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING),
+                    description="Optional relative paths of the changed files. Defaults to the Python files changed since the last test run in this session.",
+                ),
+                "run_all": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Set to true to run every test instead of only the affected ones.",
+                ),
+            },
+        ),
+    )
+
+
+__getattr__ = lazy_schema("schema_run_affected_tests", _build_schema)
@@ -0,0 +1,103 @@
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from config import RUN_CACHE_EXCLUDE_PATTERNS, RUN_CACHE_MAX_ENTRIES, RUN_CACHE_SKIP_GITIGNORED
+from functions.workspace import IgnoreRules, file_digest, iter_tree, stat_validator
+
+
+def is_cacheable(rel_path: str) -> bool:
+    """Checks a script, relative to the working directory, against RUN_CACHE_EXCLUDE_PATTERNS."""
+    return not any(fnmatch.fnmatch(rel_path, pattern) for pattern in RUN_CACHE_EXCLUDE_PATTERNS)
+
+
+class RunResultCache:
+    """
+    Recorded run_python_file results for one working directory.
+
+    Results are keyed on the script, its arguments and a content hash of the
+    working directory. Scripts read data files as well as import modules, so
+    the hash covers every file, not only Python files. Gitignored files are
+    included too, since inputs such as data/ or .env are often ignored; only
+    IGNORED_NAMES are skipped, unless RUN_CACHE_SKIP_GITIGNORED is set.
+    File digests are kept with each file's (st_mtime_ns, st_size, st_ino,
+    st_ctime_ns), so computing the hash only re-reads files that changed.
+    """
+
+    def __init__(self, working_directory: str, max_entries: int = RUN_CACHE_MAX_ENTRIES):
+        self.working_directory = os.path.abspath(working_directory)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._digests = {}  # rel_path -> (validator, digest)
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def workspace_hash(self) -> str:
+        """Hashes the contents of every file in the working directory, re-reading only changed files."""
+        combined = hashlib.sha256()
+        seen = set()
+        rules = IgnoreRules(self.working_directory, gitignore=RUN_CACHE_SKIP_GITIGNORED)
+        for rel_path, entry, _ in iter_tree(self.working_directory, rules=rules):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat_result = entry.stat(follow_symlinks=False)
+            validator = stat_validator(stat_result)
+            known = self._digests.get(rel_path)
+            if known is None or known[0] != validator:
+                try:
+                    known = (validator, file_digest(os.path.join(self.working_directory, rel_path)))
+                except OSError:
+                    continue
+                self._digests[rel_path] = known
+            seen.add(rel_path)
+            combined.update(rel_path.encode("utf-8", "surrogateescape") + b"\0" + known[1])
+
+        for rel_path in [path for path in self._digests if path not in seen]:
+            del self._digests[rel_path]
+        return combined.hexdigest()
+
+    def key(self, rel_path: str, args: list) -> str:
+        """Builds the cache key for running a script with arguments against the current workspace."""
+        with self._lock:
+            workspace_hash = self.workspace_hash()
+        return json.dumps([sys.executable, rel_path, args, workspace_hash])
+
+    def get(self, key: str):
+        """Returns the recorded result for a key, or None on a miss."""
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: str):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_run_cache(working_directory: str) -> RunResultCache:
+    key = os.path.abspath(working_directory)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = RunResultCache(key)
+        return _caches[key]
+
+
+def discard_run_cache(working_directory: str):
+    """Drops the results recorded for a working directory."""
+    with _caches_lock:
+        _caches.pop(os.path.abspath(working_directory), None)
@@ -1,16 +1,150 @@
 import os
+import selectors
+import signal
 import subprocess
 import sys
-from google.genai import types
+import time
+from config import PYTHON_EXECUTION_BACKEND, RUN_OUTPUT_HEAD_BYTES, RUN_OUTPUT_MAX_BYTES, RUN_OUTPUT_TAIL_BYTES
+from functions.bounded_output import BoundedOutput
+from functions.compact_results import ToolResult
+from functions.python_pool import get_pool, max_rss_bytes
+from functions.run_cache import get_run_cache, is_cacheable
+from functions.schema import lazy_schema
+from tracing import tracer
 
-def run_python_file(working_directory: str, file_path: str, args: list = None) -> str:
+# Appended to a result served from the run result cache
+CACHED_RESULT_NOTE = "(cached: no file in the working directory has changed since this exact run)"
+
+
+def format_process_output(stdout: str, stderr: str, returncode: int) -> str:
+    """
+    Formats the result of a finished Python process for the model.
+
+    Args:
+        stdout: The captured standard output.
+        stderr: The captured standard error.
+        returncode: The process exit code.
+
+    Returns:
+        A string containing the STDOUT and STDERR sections and any non-zero exit code.
+    """
+    output = []
+    stdout = stdout.strip()
+    stderr = stderr.strip()
+
+    if stdout:
+        output.append(f"STDOUT:\n{stdout}")
+
+    if stderr:
+        output.append(f"STDERR:\n{stderr}")
+
+    if returncode != 0:
+        output.append(f"Process exited with code {returncode}")
+
+    if not output:
+        return "No output produced."
+
+    return "\n".join(output)
+
+
+def format_resource_usage(wall_seconds: float, cpu_seconds: float, peak_rss_bytes: int) -> str:
+    return f"Resources: wall {wall_seconds:.2f}s, CPU {cpu_seconds:.2f}s, peak RSS {peak_rss_bytes / (1024 * 1024):.1f} MiB"
+
+
+def _run_subprocess(command: list, cwd: str, timeout: float):
+    """
+    Runs a command, streaming its output into bounded captures as it arrives.
+
+    The process runs in its own process group, which is killed as soon as the
+    timeout passes or the combined output exceeds RUN_OUTPUT_MAX_BYTES, so a
+    runaway script can neither hang the agent nor fill its memory.
+
+    Returns:
+        A tuple of (stdout, stderr, returncode, usage), where stdout and stderr
+        are BoundedOutput captures and usage is a dict with "cpu_seconds",
+        "max_rss_bytes" and "output_limit_hit".
+
+    Raises:
+        subprocess.TimeoutExpired: If the run takes longer than `timeout`.
+    """
+    stdout = BoundedOutput(RUN_OUTPUT_HEAD_BYTES, RUN_OUTPUT_TAIL_BYTES)
+    stderr = BoundedOutput(RUN_OUTPUT_HEAD_BYTES, RUN_OUTPUT_TAIL_BYTES)
+    deadline = time.monotonic() + timeout
+    timed_out = output_limit_hit = False
+
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ, stdout)
+            selector.register(process.stderr, selectors.EVENT_READ, stderr)
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                for key, _ in selector.select(remaining):
+                    chunk = os.read(key.fd, 65536)
+                    if chunk:
+                        key.data.write(chunk)
+                    else:
+                        selector.unregister(key.fileobj)
+                if stdout.total_bytes + stderr.total_bytes > RUN_OUTPUT_MAX_BYTES:
+                    output_limit_hit = True
+                    break
+        if timed_out or output_limit_hit:
+            os.killpg(process.pid, signal.SIGKILL)
+
+        # Reap the process ourselves: wait4 also reports its resource usage.
+        # Its output is closed, so it has almost always exited by now.
+        delay = 0.001
+        while True:
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            if time.monotonic() >= deadline:
+                os.killpg(process.pid, signal.SIGKILL)
+                timed_out = True
+                deadline = float("inf")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    finally:
+        if process.returncode is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+    if timed_out:
+        raise subprocess.TimeoutExpired(command, timeout)
+    usage = {
+        "cpu_seconds": rusage.ru_utime + rusage.ru_stime,
+        "max_rss_bytes": max_rss_bytes(rusage.ru_maxrss),
+        "output_limit_hit": output_limit_hit,
+    }
+    return stdout, stderr, process.returncode, usage
+
+
+def run_python_file(working_directory: str, file_path: str, args: list = None, use_cache: bool = True) -> str:
     """
     Executes a specified Python file within a working directory using a subprocess.
 
+    Only the start and end of each output stream are kept, with a count of the
+    lines cut from the middle, and a run that produces more than
+    RUN_OUTPUT_MAX_BYTES of output is killed early. The result ends with the
+    run's wall time, CPU time and peak memory use.
+
+    A rerun with the same arguments while no file in the working directory has
+    changed returns the recorded result, marked as cached, without running the
+    script again. Resource usage is not part of the recorded result, so a
+    cached result has none.
+
     Args:
         working_directory: The base directory where operations are permitted.
         file_path: The relative path of the Python file to execute.
         args: A list of string arguments to pass to the Python script.
+        use_cache: If False, always runs the script. Scripts matching
+            RUN_CACHE_EXCLUDE_PATTERNS always run too.
 
     Returns:
         A string containing the STDOUT and STDERR, or an error message.
@@ -30,58 +164,86 @@ def run_python_file(working_directory: str, file_path: str, args: list = None) -
         if not file_path.endswith(".py"):
             return f'Error: "{file_path}" is not a Python file.'
 
+        rel_path = os.path.relpath(full_path, abs_working_dir).replace(os.sep, "/")
+        cache = cache_key = None
+        if use_cache and is_cacheable(rel_path):
+            cache = get_run_cache(abs_working_dir)
+            with tracer.span("hash_workspace", category="fs"):
+                cache_key = cache.key(rel_path, args)
+            cached_result = cache.get(cache_key)
+            if cached_result is not None:
+                return ToolResult(f"{cached_result}\n{CACHED_RESULT_NOTE}", {**cached_result.fields, "cached": True})
+
         # Execute file
-        command = [sys.executable, full_path] + args
-        
-        completed_process = subprocess.run(
-            command,
-            cwd=abs_working_dir,  
-            timeout=30,           
-            capture_output=True,  
-            text=True             
-        )
-
-        # Format output
-        output = []
-        stdout = completed_process.stdout.strip()
-        stderr = completed_process.stderr.strip()
-
-        if stdout:
-            output.append(f"STDOUT:\n{stdout}")
-        
-        if stderr:
-            output.append(f"STDERR:\n{stderr}")
-
-        if completed_process.returncode != 0:
-            output.append(f"Process exited with code {completed_process.returncode}")
-
-        if not output:
-            return "No output produced."
-
-        return "\n".join(output)
+        use_pool = PYTHON_EXECUTION_BACKEND == "warm_pool" and hasattr(os, "fork")
+        with tracer.span("run_python", category="subprocess", path=file_path, backend="warm_pool" if use_pool else "subprocess") as span:
+            start = time.perf_counter()
+            if use_pool:
+                stdout, stderr, returncode, usage = get_pool(abs_working_dir).run(full_path, args, timeout=30)
+            else:
+                command = [sys.executable, full_path] + args
+                stdout, stderr, returncode, usage = _run_subprocess(command, abs_working_dir, timeout=30)
+            wall_seconds = time.perf_counter() - start
+            span.update(
+                wall_seconds=wall_seconds,
+                returncode=returncode,
+                stdout_chars=stdout.total_bytes,
+                stderr_chars=stderr.total_bytes,
+                cpu_seconds=usage["cpu_seconds"],
+                max_rss_bytes=usage["max_rss_bytes"],
+            )
+
+        stdout_text, stderr_text = stdout.text(), stderr.text()
+        result = format_process_output(stdout_text, stderr_text, returncode)
+        # Defaults are left out of the compact form: no exit_code for 0, no empty streams
+        fields = {"exit_code": returncode} if returncode else {}
+        if stdout_text.strip():
+            fields["stdout"] = stdout_text.strip()
+        if stderr_text.strip():
+            fields["stderr"] = stderr_text.strip()
+        if usage["output_limit_hit"]:
+            result += f"\nProcess killed after producing more than {RUN_OUTPUT_MAX_BYTES} bytes of output"
+            fields["killed_after_bytes"] = RUN_OUTPUT_MAX_BYTES
+        result = ToolResult(result, fields)
+        if cache is not None:
+            cache.put(cache_key, result)
+
+        # Usage differs on every run, so it is added after the result is cached
+        resources = format_resource_usage(wall_seconds, usage["cpu_seconds"], usage["max_rss_bytes"])
+        return ToolResult(f"{result}\n{resources}", {**fields, "resources": resources.removeprefix("Resources: ")})
 
     except subprocess.TimeoutExpired:
         return "Error: Process timed out after 30 seconds."
     except Exception as e:
         return f"Error executing Python file: {e}"
-    
-
-schema_run_python_file = types.FunctionDeclaration(
-    name="run_python_file",
-    description="Executes a Python file within the working directory with optional arguments.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The relative path to the Python file to be executed.",
-            ),
-            "args": types.Schema(
-                type=types.Type.ARRAY,
-                items=types.Schema(type=types.Type.STRING),
-                description="A list of string arguments to pass to the Python script.",
-            ),
-        },
-        required=["file_path"],
-    ),
-)
\ No newline at end of file
+
+
+def _build_schema():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="run_python_file",
+        description="Executes a Python file within the working directory with optional arguments. Long output is trimmed to its start and end, and the result reports the run's wall time, CPU time and peak memory.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The relative path to the Python file to be executed.",
+                ),
+                "args": types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING),
+                    description="A list of string arguments to pass to the Python script.",
+                ),
+                "use_cache": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Defaults to true: rerunning a script with the same arguments while no file has changed returns the recorded result. Set to false for scripts whose output varies between runs, e.g. with randomness or timing.",
+                ),
+            },
+            required=["file_path"],
+        ),
+    )
+
+
+__getattr__ = lazy_schema("schema_run_python_file", _build_schema)
@@ -0,0 +1,26 @@
+import functools
+
+
+def lazy_schema(schema_name: str, build):
+    """
+    Makes a module-level __getattr__ that builds a tool's schema on first access.
+
+    Building a types.FunctionDeclaration needs the google-genai SDK, which
+    takes most of a second to import. Deferring it keeps the tool functions
+    themselves, and anything that only calls them, free of that cost.
+
+    Args:
+        schema_name: The module attribute the schema is exposed as, e.g. "schema_write_file".
+        build: A function returning the schema. It is called at most once.
+
+    Returns:
+        A function to assign to the module's __getattr__.
+    """
+    cached_build = functools.cache(build)
+
+    def __getattr__(name):
+        if name == schema_name:
+            return cached_build()
+        raise AttributeError(f"module {build.__module__!r} has no attribute {name!r}")
+
+    return __getattr__
@@ -0,0 +1,345 @@
+import contextlib
+import fnmatch
+import hashlib
+import os
+import pickle
+import re
+import threading
+from config import CACHE_DIRECTORY, SEARCH_MAX_FILE_BYTES, SEARCH_MAX_RESULTS
+from functions.compact_results import ToolResult
+from functions.workspace import IgnoreRules, iter_tree
+from functions.schema import lazy_schema
+from tracing import tracer
+
+# Characters with special meaning in a regex, outside of escapes
+REGEX_METACHARACTERS = set(".^$*+?{}[]()|\\")
+
+
+def _trigrams(text: str) -> set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    A persistent trigram index of the text files in a working directory.
+
+    Each search first refreshes the index from file stat data: only files whose
+    (mtime_ns, size) changed are re-read. Candidate files are the ones holding
+    every trigram of the query's literal text, and only those are scanned with
+    the real pattern.
+    """
+
+    def __init__(self, working_directory: str):
+        self.working_directory = os.path.abspath(working_directory)
+        key = hashlib.sha256(self.working_directory.encode()).hexdigest()[:16]
+        self.index_path = os.path.join(CACHE_DIRECTORY, "search", f"{key}.pickle")
+        self.files = {}      # rel_path -> (mtime_ns, size, trigrams)
+        self.postings = {}   # trigram -> set of rel_paths
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                self.files, self.postings = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, ValueError):
+            self.files, self.postings = {}, {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump((self.files, self.postings), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.index_path)
+
+    def _remove(self, rel_path: str):
+        _, _, trigrams = self.files.pop(rel_path)
+        for trigram in trigrams:
+            paths = self.postings.get(trigram)
+            if paths is not None:
+                paths.discard(rel_path)
+                if not paths:
+                    del self.postings[trigram]
+
+    def _add(self, rel_path: str, stat_result: os.stat_result):
+        trigrams = set()
+        if stat_result.st_size <= SEARCH_MAX_FILE_BYTES:
+            try:
+                with open(os.path.join(self.working_directory, rel_path), encoding="utf-8") as f:
+                    trigrams = _trigrams(f.read())
+            except (OSError, UnicodeDecodeError):
+                pass
+
+        self.files[rel_path] = (stat_result.st_mtime_ns, stat_result.st_size, trigrams)
+        for trigram in trigrams:
+            self.postings.setdefault(trigram, set()).add(rel_path)
+
+    def refresh(self):
+        """Brings the index up to date with the files on disk."""
+        seen = set()
+        changed = False
+        rules = IgnoreRules(self.working_directory)
+        for rel_path, entry, _ in iter_tree(self.working_directory, rules=rules):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            seen.add(rel_path)
+            stat_result = entry.stat(follow_symlinks=False)
+            known = self.files.get(rel_path)
+            if known is not None and known[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+                continue
+            if known is not None:
+                self._remove(rel_path)
+            self._add(rel_path, stat_result)
+            changed = True
+
+        for rel_path in [path for path in self.files if path not in seen]:
+            self._remove(rel_path)
+            changed = True
+
+        if changed:
+            self._save()
+
+    def candidates(self, literals: list[str]) -> list[str]:
+        """
+        Returns the indexed files that could contain all of the given literal strings.
+
+        Literals shorter than three characters cannot narrow the search, so if
+        none are usable every indexed text file is a candidate.
+        """
+        trigrams = set()
+        for literal in literals:
+            trigrams |= _trigrams(literal)
+
+        if not trigrams:
+            return sorted(path for path, (_, _, file_trigrams) in self.files.items() if file_trigrams)
+
+        # Intersect the rarest posting lists first
+        posting_lists = sorted((self.postings.get(trigram, set()) for trigram in trigrams), key=len)
+        result = set(posting_lists[0])
+        for paths in posting_lists[1:]:
+            result &= paths
+            if not result:
+                break
+        return sorted(result)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index(working_directory: str) -> TrigramIndex:
+    key = os.path.abspath(working_directory)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = TrigramIndex(key)
+        return _indexes[key]
+
+
+def _required_literals(pattern: str) -> list[str]:
+    """
+    Extracts literal runs that every match of a regex must contain.
+
+    This is deliberately conservative: patterns with top-level alternation
+    yield nothing, text inside groups is ignored, and classes and escapes
+    simply end the current run.
+    """
+    if "|" in pattern:
+        return []
+
+    literals = []
+    current = ""
+    group_depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if escaped.isalnum():
+                # Character classes like \w or \d, and anchors like \b
+                literals.append(current)
+                current = ""
+            elif group_depth == 0:
+                current += escaped
+            continue
+        if char in "?*{":
+            # The previous character is optional or repeated zero times
+            current = current[:-1]
+            literals.append(current)
+            current = ""
+            if char == "{":
+                i = pattern.find("}", i)
+                if i == -1:
+                    break
+        elif char == "[":
+            # Skip the character class, allowing "]" as its first member
+            literals.append(current)
+            current = ""
+            i = pattern.find("]", i + 2 if pattern[i + 1:i + 2] in ("]", "^") else i + 1)
+            if i == -1:
+                break
+        elif char in "()":
+            # Groups may be optional or repeated, so their contents are not required
+            if group_depth == 0:
+                literals.append(current)
+            current = ""
+            group_depth += 1 if char == "(" else -1
+        elif char in REGEX_METACHARACTERS:
+            literals.append(current)
+            current = ""
+        elif group_depth == 0:
+            current += char
+        i += 1
+    literals.append(current)
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+def search_code(
+    working_directory: str,
+    query: str,
+    regex: bool = False,
+    identifier: bool = False,
+    case_sensitive: bool = True,
+    file_pattern: str = None,
+    context_lines: int = 1,
+) -> str:
+    """
+    Searches the text files in a working directory for a string, regex or identifier.
+
+    Args:
+        working_directory: The base directory where operations are permitted.
+        query: The text, regular expression or identifier to search for.
+        regex: If True, `query` is a Python regular expression.
+        identifier: If True, only matches `query` as a whole word.
+        case_sensitive: If False, matches regardless of case.
+        file_pattern: An optional glob, like "*.py" or "pkg/*", limiting which files are searched.
+        context_lines: The number of lines to show before and after each match.
+
+    Returns:
+        The matching lines in grep format ("path:line:text", with context lines
+        as "path-line-text"), or an error message.
+    """
+    try:
+        if not query:
+            return "Error: Search query must not be empty."
+
+        if regex:
+            pattern_text = query
+            literals = _required_literals(query)
+        else:
+            pattern_text = re.escape(query)
+            literals = [query]
+        if identifier:
+            pattern_text = rf"\b{pattern_text}\b"
+
+        try:
+            pattern = re.compile(pattern_text, 0 if case_sensitive else re.IGNORECASE)
+        except re.error as e:
+            return f'Error: Invalid regular expression "{query}": {e}'
+
+        context_lines = max(0, int(context_lines))
+        index = _get_index(working_directory)
+        with index.lock:
+            with tracer.span("refresh_index", category="fs"):
+                index.refresh()
+            candidates = index.candidates(literals)
+
+        output_lines = []
+        # Compact form: each path once, with its lines as "N:text" for matches and "N-text" for context
+        matches = {}
+        fields = {"matches": matches}
+        match_count = 0
+        for rel_path in candidates:
+            if file_pattern and not (
+                fnmatch.fnmatch(rel_path, file_pattern) or fnmatch.fnmatch(os.path.basename(rel_path), file_pattern)
+            ):
+                continue
+
+            try:
+                with open(os.path.join(index.working_directory, rel_path), encoding="utf-8") as f:
+                    lines = f.read().splitlines()
+            except (OSError, UnicodeDecodeError):
+                continue
+
+            last_printed = -1
+            for line_number, line in enumerate(lines):
+                if not pattern.search(line):
+                    continue
+
+                match_count += 1
+                if match_count > SEARCH_MAX_RESULTS:
+                    break
+
+                start = max(0, line_number - context_lines, last_printed + 1)
+                end = min(len(lines), line_number + context_lines + 1)
+                if output_lines and start > last_printed + 1:
+                    output_lines.append("--")
+                for context_number in range(start, end):
+                    separator = ":" if pattern.search(lines[context_number]) else "-"
+                    output_lines.append(f"{rel_path}{separator}{context_number + 1}{separator}{lines[context_number]}")
+                    matches.setdefault(rel_path, []).append(f"{context_number + 1}{separator}{lines[context_number]}")
+                last_printed = end - 1
+
+            if match_count > SEARCH_MAX_RESULTS:
+                output_lines.append(f"[...More than {SEARCH_MAX_RESULTS} matches. Narrow the query or use file_pattern]")
+                fields["more"] = True
+                break
+
+        if not output_lines:
+            return ToolResult(f'No matches found for "{query}".', fields)
+
+        return ToolResult("\n".join(output_lines), fields)
+
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _build_schema():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="search_code",
+        description="Searches every text file in the working directory for a string, regular expression or identifier, and returns matching lines with line numbers and surrounding context. Much faster than listing and reading files one by one.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "query": types.Schema(
+                    type=types.Type.STRING,
+                    description="The text, regular expression or identifier to search for.",
+                ),
+                "regex": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="If true, the query is a Python regular expression. Defaults to a plain text search.",
+                ),
+                "identifier": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="If true, only matches the query as a whole word, e.g. a function or variable name.",
+                ),
+                "case_sensitive": types.Schema(
+                    type=types.Type.BOOLEAN,
+                    description="Set to false to ignore case. Defaults to true.",
+                ),
+                "file_pattern": types.Schema(
+                    type=types.Type.STRING,
+                    description="Optional glob limiting which files are searched, e.g. '*.py' or 'pkg/*'.",
+                ),
+                "context_lines": types.Schema(
+                    type=types.Type.INTEGER,
+                    description="Number of lines of context to show around each match. Defaults to 1.",
+                ),
+            },
+            required=["query"],
+        ),
+    )
+
+
+__getattr__ = lazy_schema("schema_search_code", _build_schema)
+
+def discard_index(working_directory: str):
+    """Drops a working directory's trigram index and deletes its file under CACHE_DIRECTORY."""
+    with _indexes_lock:
+        index = _indexes.pop(os.path.abspath(working_directory), None)
+    if index is not None:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(index.index_path)
@@ -0,0 +1,152 @@
+# Warm Python server used by functions/python_pool.py.
+#
+# Preloads the standard library and installed packages a working directory
+# imports, never its own modules, then reads one JSON request per line on stdin
+# and forks a child to run each script. Replies on stdout with the child's pid,
+# then its exit code and resource usage.
+import ast
+import importlib.util
+import json
+import os
+import sys
+
+
+def _imported_modules(working_directory: str, ignored_names: set[str]) -> set[str]:
+    """Collects the absolute imports used by the Python files in a directory tree."""
+    modules = set()
+    for root, dirs, files in os.walk(working_directory):
+        dirs[:] = [d for d in dirs if d not in ignored_names and not d.startswith(".")]
+        for name in files:
+            if not name.endswith(".py"):
+                continue
+            try:
+                with open(os.path.join(root, name), "rb") as f:
+                    tree = ast.parse(f.read())
+            except (OSError, SyntaxError, ValueError):
+                continue
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    modules.update(alias.name for alias in node.names)
+                elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                    modules.add(node.module)
+    return modules
+
+
+def _is_third_party(module: str, working_directory: str) -> bool:
+    """Checks that a module comes from the standard library or an installed package, not from the working directory."""
+    top_level = module.partition(".")[0]
+    if top_level in sys.stdlib_module_names:
+        return True
+    try:
+        spec = importlib.util.find_spec(top_level)
+    except (ImportError, ValueError):
+        return False
+    if spec is None:
+        return False
+    locations = [spec.origin, *(spec.submodule_search_locations or [])]
+    locations = [os.path.abspath(location) for location in locations if location and os.path.isabs(location)]
+    # Editable installs of the project itself resolve into the working directory
+    return bool(locations) and not any(
+        location == working_directory or location.startswith(working_directory + os.sep) for location in locations
+    )
+
+
+def _serve(working_directory: str, ignored_names: set[str]):
+    """
+    Runs the warm server: preloads third-party imports, then forks one child per request.
+
+    Project modules are left to each run, so importing them never runs
+    workspace code in the server and runs always see the current files.
+    """
+    protocol_in = os.fdopen(os.dup(0), "rb")
+    protocol_out = os.fdopen(os.dup(1), "wb", buffering=0)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    # Resolve imports without this script's directory or the project on the path
+    sys.path.pop(0)
+    for module in sorted(_imported_modules(working_directory, ignored_names)):
+        if not _is_third_party(module, working_directory):
+            continue
+        try:
+            __import__(module)
+        except BaseException:
+            pass
+    sys.path.insert(0, working_directory)
+
+    preloaded = {}
+    for module in list(sys.modules.values()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and os.path.abspath(module_file).startswith(working_directory + os.sep):
+            preloaded[module_file] = os.stat(module_file).st_mtime_ns
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    protocol_out.write(json.dumps({"preloaded": preloaded}).encode() + b"\n")
+
+    for line in protocol_in:
+        request = json.loads(line)
+        pid = os.fork()
+        if pid == 0:
+            _run_child(request, protocol_in, protocol_out)
+
+        protocol_out.write(json.dumps({"pid": pid}).encode() + b"\n")
+        _, status, rusage = os.wait4(pid, 0)
+        reply = {
+            "returncode": os.waitstatus_to_exitcode(status),
+            "cpu_seconds": rusage.ru_utime + rusage.ru_stime,
+            "max_rss": rusage.ru_maxrss,
+        }
+        protocol_out.write(json.dumps(reply).encode() + b"\n")
+
+
+def _run_child(request: dict, protocol_in, protocol_out):
+    """Runs a single script in a forked child, mirroring `python <path> <args>`."""
+    import atexit
+    import runpy
+    import threading
+    import traceback
+
+    exit_code = 0
+    try:
+        os.setpgid(0, 0)
+        protocol_in.close()
+        protocol_out.close()
+
+        stdout_fd = os.open(request["stdout"], os.O_WRONLY)
+        stderr_fd = os.open(request["stderr"], os.O_WRONLY)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+
+        sys.argv = [request["path"]] + request["args"]
+        sys.path[0] = os.path.dirname(request["path"])
+        runpy.run_path(request["path"], run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        try:
+            try:
+                # Shut down as the interpreter would: join non-daemon threads, then run atexit handlers
+                threading._shutdown()
+                atexit._run_exitfuncs()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+if __name__ == "__main__":
+    _serve(os.path.abspath(sys.argv[1]), set(json.loads(sys.argv[2])))
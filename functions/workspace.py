@@ -0,0 +1,301 @@
+import difflib
+import filecmp
+import fnmatch
+import hashlib
+import os
+import shutil
+import tempfile
+from config import IGNORED_NAMES
+
+
+class IgnoreRules:
+    """
+    A small .gitignore matcher for walking the working directory.
+
+    Supports the common subset of gitignore syntax: per-directory .gitignore
+    files, `#` comments, `!` negation, trailing `/` for directory-only rules,
+    and patterns anchored by a `/`. Names in IGNORED_NAMES are always skipped.
+    With `gitignore=False`, only IGNORED_NAMES are.
+    """
+
+    def __init__(self, root: str, gitignore: bool = True):
+        self.root = os.path.abspath(root)
+        self.gitignore = gitignore
+        self._rules = {}
+
+    def _load(self, rel_dir: str) -> list:
+        if not self.gitignore:
+            return []
+        if rel_dir in self._rules:
+            return self._rules[rel_dir]
+
+        rules = []
+        try:
+            with open(os.path.join(self.root, rel_dir, ".gitignore"), encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            lines = []
+
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            rules.append((line.lstrip("/"), negated, dir_only, anchored))
+
+        self._rules[rel_dir] = rules
+        return rules
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """
+        Checks a path, relative to the root, against the ignore rules.
+
+        Rules from deeper .gitignore files take precedence, and within a file
+        the last matching rule wins, as in git.
+        """
+        name = os.path.basename(rel_path)
+        if name in IGNORED_NAMES:
+            return True
+
+        ignored = False
+        parts = rel_path.split("/")
+        for depth in range(len(parts)):
+            rel_dir = "/".join(parts[:depth])
+            path_in_dir = "/".join(parts[depth:])
+            for pattern, negated, dir_only, anchored in self._load(rel_dir):
+                if dir_only and not is_dir:
+                    continue
+                target = path_in_dir if anchored else name
+                if fnmatch.fnmatchcase(target, pattern):
+                    ignored = not negated
+        return ignored
+
+
+def iter_tree(
+    root: str,
+    rel_dir: str = "",
+    max_depth: int = None,
+    rules: IgnoreRules = None,
+    after: tuple = None,
+    depth: int = 0,
+):
+    """
+    Walks a directory tree with os.scandir, in sorted depth-first order.
+
+    Entry types come from the cached DirEntry data, and symlinked directories
+    are listed but not followed.
+
+    Args:
+        root: The absolute directory the walk is relative to.
+        rel_dir: The directory to walk, relative to `root` ("" for root itself).
+        max_depth: How many directory levels below `rel_dir` to descend into, or None for no limit.
+        rules: Ignore rules to apply, or None to list everything.
+        after: Path components of an entry to resume after. Whole subtrees that
+            sort before it are skipped without being scanned.
+        depth: The depth of `rel_dir`, used when recursing.
+
+    Yields:
+        Tuples of (relative path, os.DirEntry, depth).
+    """
+    with os.scandir(os.path.join(root, rel_dir)) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+
+    for entry in entries:
+        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+        is_dir = entry.is_dir(follow_symlinks=False)
+        if rules is not None and rules.is_ignored(rel_path, is_dir):
+            continue
+
+        # Entries at or before the cursor are not yielded again, but the cursor
+        # entry and its ancestors are still descended into
+        components = tuple(rel_path.split("/"))
+        descend_after = None
+        if after is not None and components <= after[: len(components)]:
+            if components < after[: len(components)]:
+                continue
+            if len(after) > len(components):
+                descend_after = after
+        else:
+            yield rel_path, entry, depth
+
+        if is_dir and (max_depth is None or depth < max_depth):
+            yield from iter_tree(root, rel_path, max_depth, rules, descend_after, depth + 1)
+
+
+def stat_validator(stat_result: os.stat_result) -> tuple:
+    """Stat data that changes whenever a file is modified in place, rewritten or replaced."""
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino, stat_result.st_ctime_ns)
+
+
+def file_digest(path: str) -> bytes:
+    """Returns the SHA-256 digest of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.digest()
+
+
+# Read once: os.umask can only be read by setting it, which is not thread-safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# ioctl request that makes a file share another's blocks (Linux btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+
+def _reflink(source: str, destination: str):
+    import fcntl
+
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, destination)
+
+
+# File copy methods tried in order, from cheapest to most portable
+CLONE_METHODS = [
+    ("reflink", _reflink),
+    ("copy", shutil.copy2),
+]
+
+
+def _walk_files(root: str):
+    """Yields (relative path, is symlink) for every file under root, skipping IGNORED_NAMES."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        dirnames[:] = sorted(name for name in dirnames if name not in IGNORED_NAMES)
+        for name in dirnames + sorted(filenames):
+            full_path = os.path.join(dirpath, name)
+            rel_path = name if rel_dir == "." else os.path.join(rel_dir, name)
+            if os.path.islink(full_path):
+                yield rel_path, True
+            elif name in filenames and name not in IGNORED_NAMES:
+                yield rel_path, False
+
+
+def clone_workspace(source: str, destination: str) -> str:
+    """
+    Makes a cheap private copy of a workspace.
+
+    Files are reflinked where the filesystem supports copy-on-write clones,
+    so only the files that change take up new space, and copied otherwise.
+    Files are never hardlinked: scripts run in the copy may write to files
+    in place, which would change the source and every other copy.
+    Directories are always created fresh, and symlinks are recreated as-is.
+
+    Args:
+        source: The workspace to copy.
+        destination: The directory to create the copy in. It must not exist yet.
+
+    Returns:
+        The name of the cheapest copy method that worked for every file.
+    """
+    methods = list(CLONE_METHODS)
+    os.makedirs(destination)
+    for dirpath, dirnames, _ in os.walk(source):
+        dirnames[:] = [name for name in dirnames if name not in IGNORED_NAMES and not os.path.islink(os.path.join(dirpath, name))]
+        for name in dirnames:
+            os.makedirs(os.path.join(destination, os.path.relpath(os.path.join(dirpath, name), source)))
+
+    for rel_path, is_link in _walk_files(source):
+        source_path = os.path.join(source, rel_path)
+        destination_path = os.path.join(destination, rel_path)
+        if is_link:
+            os.symlink(os.readlink(source_path), destination_path)
+            continue
+
+        while True:
+            try:
+                methods[0][1](source_path, destination_path)
+                break
+            except OSError:
+                if len(methods) == 1:
+                    raise
+                # Not supported here: drop this method for the rest of the copy
+                if os.path.lexists(destination_path):
+                    os.unlink(destination_path)
+                methods.pop(0)
+    return methods[0][0]
+
+
+def write_atomically(full_path: str, content: str):
+    """
+    Writes a file through a temporary file and os.replace, keeping its permissions.
+    """
+    directory = os.path.dirname(full_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".write-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        if os.path.exists(full_path):
+            os.chmod(temp_path, os.stat(full_path).st_mode & 0o7777)
+        else:
+            os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _read_for_diff(path: str):
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return data.decode("utf-8").splitlines(keepends=True)
+    except UnicodeDecodeError:
+        return None
+
+
+def diff_workspace(original: str, modified: str) -> tuple[list[str], str]:
+    """
+    Compares a workspace copy with the workspace it was cloned from.
+
+    Files whose sizes match are compared byte for byte, and only changed
+    files are diffed.
+
+    Args:
+        original: The source workspace.
+        modified: The copy to compare against it.
+
+    Returns:
+        A tuple of (sorted relative paths that were added, removed or changed,
+        a unified diff of those changes).
+    """
+    original_files = {rel_path for rel_path, is_link in _walk_files(original) if not is_link}
+    modified_files = {rel_path for rel_path, is_link in _walk_files(modified) if not is_link}
+
+    changed = []
+    diff_parts = []
+    for rel_path in sorted(original_files | modified_files):
+        original_path = os.path.join(original, rel_path)
+        modified_path = os.path.join(modified, rel_path)
+        in_original = rel_path in original_files
+        in_modified = rel_path in modified_files
+        if in_original and in_modified:
+            original_stat = os.stat(original_path)
+            modified_stat = os.stat(modified_path)
+            if original_stat.st_size == modified_stat.st_size and filecmp.cmp(original_path, modified_path, shallow=False):
+                continue
+
+        changed.append(rel_path)
+        name = rel_path.replace(os.sep, "/")
+        before = _read_for_diff(original_path) if in_original else []
+        after = _read_for_diff(modified_path) if in_modified else []
+        if before is None or after is None:
+            diff_parts.append(f"Binary files a/{name} and b/{name} differ\n")
+            continue
+        for line in difflib.unified_diff(
+            before,
+            after,
+            fromfile=f"a/{name}" if in_original else "/dev/null",
+            tofile=f"b/{name}" if in_modified else "/dev/null",
+        ):
+            diff_parts.append(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n")
+
+    return changed, "".join(diff_parts)
@@ -0,0 +1,341 @@
+import atexit
+import contextlib
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+from config import CACHE_DIRECTORY, SNAPSHOT_HISTORY_SIZE
+from functions.workspace import IgnoreRules, file_digest, stat_validator
+
+
+class FileNode(NamedTuple):
+    validator: tuple
+    digest: bytes
+
+
+class DirNode(NamedTuple):
+    mtime_ns: int
+    children: dict  # name -> FileNode or DirNode
+    digest: bytes
+    file_count: int
+
+
+def _dir_node(mtime_ns: int, children: dict) -> DirNode:
+    """Builds a directory node whose digest covers its children's names, kinds and digests."""
+    digest = hashlib.sha256()
+    file_count = 0
+    for name in sorted(children):
+        child = children[name]
+        kind = b"d" if isinstance(child, DirNode) else b"f"
+        digest.update(name.encode("utf-8", "surrogateescape") + b"\0" + kind + child.digest)
+        file_count += child.file_count if kind == b"d" else 1
+    return DirNode(mtime_ns, children, digest.digest(), file_count)
+
+
+class WorkspaceSnapshots:
+    """
+    Merkle-tree snapshots of a working directory, for listing what changed between tool calls.
+
+    Each directory's hash covers its entries' names and hashes, so two
+    snapshots are compared by descending only into subtrees whose hashes
+    differ. Nodes are never modified, so snapshots share every unchanged
+    subtree.
+
+    Refreshing is incremental. File contents are hashed only when a file's
+    stat data changed, and a directory is re-listed only when its mtime
+    changed. When the only changes since the last refresh are files written
+    by the tools, which report them through mark_changed(), only those files
+    and the directories above them are looked at. Snapshots are kept under
+    their root hash, so their ids stay valid in later sessions.
+
+    Snapshots are saved to an append-only journal under CACHE_DIRECTORY.
+    Directory nodes are written once, keyed by their hash, so a save only
+    appends the directories that changed since the last one and the new
+    snapshot ids. The journal is rewritten with just the kept snapshots when
+    it is loaded and found to be mostly nodes no snapshot uses anymore.
+    """
+
+    def __init__(self, working_directory: str):
+        self.working_directory = os.path.abspath(working_directory)
+        key = hashlib.sha256(self.working_directory.encode()).hexdigest()[:16]
+        self.snapshots_path = os.path.join(CACHE_DIRECTORY, "snapshots", f"{key}.journal")
+        self.snapshots = OrderedDict()  # snapshot id -> root DirNode, oldest first
+        self.root = None
+        self.lock = threading.Lock()
+        # Paths changed since the last refresh, or None if anything may have changed
+        self._pending = None
+        self._loaded = False
+        self._written = set()  # digests of the directory nodes already in the journal
+        self._unsaved_ids = []  # snapshots that became current since the last save, in order
+        self._rewrite = False
+
+    def _load(self):
+        self._loaded = True
+        nodes = {}
+        snapshots = OrderedDict()
+        records = 0
+        intact_bytes = size = 0
+        try:
+            with open(self.snapshots_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                while intact_bytes < size:
+                    record = pickle.load(f)
+                    intact_bytes = f.tell()
+                    records += 1
+                    if record[0] == "dir":
+                        _, mtime_ns, entries = record
+                        children = {
+                            name: nodes[payload] if kind == "d" else FileNode(*payload)
+                            for name, kind, payload in entries
+                        }
+                        node = _dir_node(mtime_ns, children)
+                        nodes[node.digest] = node
+                    elif record[0] == "snapshot":
+                        _, snapshot_id, root_digest = record
+                        snapshots.pop(snapshot_id, None)
+                        snapshots[snapshot_id] = nodes[root_digest]
+        except (OSError, EOFError, pickle.PickleError, ValueError, KeyError, IndexError, TypeError):
+            pass
+        # A save cut short by a crash leaves a partial record; rewrite without it
+        if intact_bytes < size:
+            self._rewrite = True
+
+        while len(snapshots) > SNAPSHOT_HISTORY_SIZE:
+            snapshots.popitem(last=False)
+        self.snapshots = snapshots
+        self.root = next(reversed(snapshots.values()), None)
+        self._written = set()
+        for root in snapshots.values():
+            self._collect_records(root, [])
+        if records > 2 * (len(self._written) + len(snapshots)):
+            self._rewrite = True
+
+    def _collect_records(self, node: DirNode, records: list):
+        """Adds the records for a directory's nodes not yet in the journal, children before parents."""
+        if node.digest in self._written:
+            return
+        self._written.add(node.digest)
+        entries = []
+        for name, child in node.children.items():
+            if isinstance(child, DirNode):
+                self._collect_records(child, records)
+                entries.append((name, "d", child.digest))
+            else:
+                entries.append((name, "f", tuple(child)))
+        records.append(("dir", node.mtime_ns, tuple(entries)))
+
+    def save(self):
+        """Appends the snapshots that became current since the last save, and any nodes they add, to the journal."""
+        if self._rewrite:
+            self._written = set()
+            snapshot_ids = list(self.snapshots)
+            mode, path = "wb", f"{self.snapshots_path}.{os.getpid()}.tmp"
+        else:
+            snapshot_ids = [snapshot_id for snapshot_id in self._unsaved_ids if snapshot_id in self.snapshots]
+            mode, path = "ab", self.snapshots_path
+        self._rewrite = False
+        self._unsaved_ids = []
+        if not snapshot_ids:
+            return
+
+        records = []
+        for snapshot_id in snapshot_ids:
+            root = self.snapshots[snapshot_id]
+            self._collect_records(root, records)
+            records.append(("snapshot", snapshot_id, root.digest))
+
+        os.makedirs(os.path.dirname(self.snapshots_path), exist_ok=True)
+        # One write per save, so a crash can only cut off the last record
+        with open(path, mode) as f:
+            f.write(b"".join(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL) for record in records))
+        if mode == "wb":
+            os.replace(path, self.snapshots_path)
+
+    def mark_changed(self, rel_path: str = None):
+        """Records that a tool changed a file, or with no path, that anything may have changed."""
+        with self.lock:
+            if rel_path is None or self._pending is None:
+                self._pending = None
+            else:
+                self._pending.add(os.path.normpath(rel_path).replace(os.sep, "/"))
+
+    def _scan_dir(self, rel_dir: str, old: DirNode, rules: IgnoreRules):
+        """Rebuilds a directory's node, reusing every unchanged child node. Returns `old` if nothing changed."""
+        full_dir = os.path.join(self.working_directory, rel_dir)
+        try:
+            mtime_ns = os.stat(full_dir).st_mtime_ns
+        except OSError:
+            return None
+
+        if old is not None and old.mtime_ns == mtime_ns:
+            # No entries were added, removed or renamed, so only their contents can have changed
+            names = [(name, isinstance(child, DirNode)) for name, child in old.children.items()]
+        else:
+            names = []
+            with os.scandir(full_dir) as entries:
+                for entry in entries:
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if entry.is_symlink():
+                        continue
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if not rules.is_ignored(rel_path, is_dir):
+                        names.append((entry.name, is_dir))
+
+        children = {}
+        for name, is_dir in names:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            previous = old.children.get(name) if old is not None else None
+            if is_dir:
+                child = self._scan_dir(rel_path, previous if isinstance(previous, DirNode) else None, rules)
+            else:
+                child = self._scan_file(rel_path, previous if isinstance(previous, FileNode) else None)
+            if child is not None:
+                children[name] = child
+
+        if old is not None and old.mtime_ns == mtime_ns and len(children) == len(old.children) and all(
+            children.get(name) is child for name, child in old.children.items()
+        ):
+            return old
+        return _dir_node(mtime_ns, children)
+
+    def _scan_file(self, rel_path: str, old: FileNode):
+        full_path = os.path.join(self.working_directory, rel_path)
+        try:
+            validator = stat_validator(os.stat(full_path, follow_symlinks=False))
+            if old is not None and old.validator == validator:
+                return old
+            return FileNode(validator, file_digest(full_path))
+        except OSError:
+            return None
+
+    def _update_path(self, node: DirNode, rel_dir: str, parts: list[str], rules: IgnoreRules):
+        """Rebuilds only the nodes along one changed path below `node`."""
+        name, rest = parts[0], parts[1:]
+        rel_path = f"{rel_dir}/{name}" if rel_dir else name
+        full_path = os.path.join(self.working_directory, rel_path)
+        previous = node.children.get(name)
+
+        if not os.path.lexists(full_path) or os.path.islink(full_path):
+            child = None
+        elif os.path.isdir(full_path):
+            if rules.is_ignored(rel_path, True):
+                child = None
+            elif rest and isinstance(previous, DirNode):
+                child = self._update_path(previous, rel_path, rest, rules)
+            else:
+                child = self._scan_dir(rel_path, previous if isinstance(previous, DirNode) else None, rules)
+        else:
+            child = None if rules.is_ignored(rel_path, False) else self._scan_file(rel_path, previous if isinstance(previous, FileNode) else None)
+
+        if child is previous:
+            return node
+        children = dict(node.children)
+        if child is None:
+            children.pop(name, None)
+        else:
+            children[name] = child
+        try:
+            mtime_ns = os.stat(os.path.join(self.working_directory, rel_dir)).st_mtime_ns
+        except OSError:
+            mtime_ns = node.mtime_ns
+        return _dir_node(mtime_ns, children)
+
+    def refresh(self) -> str:
+        """
+        Brings the current snapshot up to date with the working directory.
+
+        Returns:
+            The id of the current snapshot.
+        """
+        if not self._loaded:
+            self._load()
+        rules = IgnoreRules(self.working_directory)
+        if self.root is None or self._pending is None:
+            root = self._scan_dir("", self.root, rules)
+        else:
+            root = self.root
+            for rel_path in sorted(self._pending):
+                parts = [part for part in rel_path.split("/") if part not in ("", ".")]
+                if parts and ".." not in parts:
+                    root = self._update_path(root, "", parts, rules)
+        self._pending = set()
+
+        snapshot_id = root.digest.hex()[:12]
+        if snapshot_id != next(reversed(self.snapshots), None):
+            # Saved in order, so the journal's last snapshot is the current one
+            if snapshot_id in self._unsaved_ids:
+                self._unsaved_ids.remove(snapshot_id)
+            self._unsaved_ids.append(snapshot_id)
+        if snapshot_id not in self.snapshots:
+            self.snapshots[snapshot_id] = root
+            while len(self.snapshots) > SNAPSHOT_HISTORY_SIZE:
+                self.snapshots.popitem(last=False)
+        self.snapshots.move_to_end(snapshot_id)
+        self.root = root
+        return snapshot_id
+
+    def diff(self, old_id: str, new_id: str) -> dict:
+        """
+        Compares two snapshots, descending only into subtrees whose hashes differ.
+
+        Returns:
+            A dict of "added", "removed" and "modified" lists of paths. A whole
+            added or removed directory is listed once, as "path/ (N files)".
+        """
+        changes = {"added": [], "removed": [], "modified": []}
+        self._diff(self.snapshots[old_id], self.snapshots[new_id], "", changes)
+        return changes
+
+    def _diff(self, old: DirNode, new: DirNode, prefix: str, changes: dict):
+        if old.digest == new.digest:
+            return
+        for name in sorted(old.children.keys() | new.children.keys()):
+            before, after = old.children.get(name), new.children.get(name)
+            path = f"{prefix}{name}"
+            if isinstance(before, DirNode) and isinstance(after, DirNode):
+                self._diff(before, after, f"{path}/", changes)
+                continue
+            if before is not None and after is not None and type(before) is type(after):
+                if before.digest != after.digest:
+                    changes["modified"].append(path)
+                continue
+            if before is not None:
+                changes["removed"].append(_describe(path, before))
+            if after is not None:
+                changes["added"].append(_describe(path, after))
+
+
+def _describe(path: str, node) -> str:
+    if isinstance(node, DirNode):
+        return f"{path}/ ({node.file_count} file{'' if node.file_count == 1 else 's'})"
+    return path
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_workspace_snapshots(working_directory: str) -> WorkspaceSnapshots:
+    key = os.path.abspath(working_directory)
+    with _snapshots_lock:
+        if key not in _snapshots:
+            _snapshots[key] = WorkspaceSnapshots(key)
+        return _snapshots[key]
+
+
+def discard_workspace_snapshots(working_directory: str):
+    """Forgets a working directory's snapshots without saving them, e.g. once a temporary workspace is deleted."""
+    with _snapshots_lock:
+        snapshots = _snapshots.pop(os.path.abspath(working_directory), None)
+    if snapshots is not None:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(snapshots.snapshots_path)
+
+
+@atexit.register
+def _save_snapshots():
+    for snapshots in _snapshots.values():
+        with snapshots.lock:
+            snapshots.save()
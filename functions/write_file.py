@@ -1,5 +1,10 @@
 import os
-from google.genai import types
+from config import FILE_CACHE_MAX_ENTRY_BYTES
+from functions.compact_results import ToolResult
+from functions.file_cache import as_read, file_cache
+from functions.workspace import write_atomically
+from functions.schema import lazy_schema
+from tracing import tracer
 
 def write_file(working_directory: str, file_path: str, content: str) -> str:
     """
@@ -21,36 +26,48 @@ def write_file(working_directory: str, file_path: str, content: str) -> str:
         if not full_path.startswith(abs_working_dir):
             return f'Error: Cannot write to "{file_path}" as it is outside the permitted working directory'
 
-        # Ensure parent directories exist
-        directory = os.path.dirname(full_path)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
+        # Write the file through a new inode, creating parent directories as needed
+        with tracer.span("write_file", category="fs", path=file_path, chars=len(content)):
+            write_atomically(full_path, content)
 
-        # Write the file
-        with open(full_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        # Keep the shared cache current so the next read skips the disk, and
+        # returns what reading the file from disk would
+        stat_result = os.stat(full_path)
+        if stat_result.st_size <= FILE_CACHE_MAX_ENTRY_BYTES:
+            file_cache.put(full_path, stat_result, as_read(content))
+        else:
+            file_cache.invalidate(full_path)
 
-        return f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
+        return ToolResult(
+            f'Successfully wrote to "{file_path}" ({len(content)} characters written)',
+            {"chars_written": len(content)},
+        )
 
     except Exception as e:
         return f"Error: {e}"
 
 
-schema_write_file = types.FunctionDeclaration(
-    name="write_file",
-    description="Writes or overwrites the contents of a specified file in the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="The relative path to the file to be written.",
-            ),
-            "content": types.Schema(
-                type=types.Type.STRING,
-                description="The content to write into the file.",
-            ),
-        },
-        required=["file_path", "content"],
-    ),
-)
\ No newline at end of file
+def _build_schema():
+    from google.genai import types
+
+    return types.FunctionDeclaration(
+        name="write_file",
+        description="Writes or overwrites the contents of a specified file in the working directory.",
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "file_path": types.Schema(
+                    type=types.Type.STRING,
+                    description="The relative path to the file to be written.",
+                ),
+                "content": types.Schema(
+                    type=types.Type.STRING,
+                    description="The content to write into the file.",
+                ),
+            },
+            required=["file_path", "content"],
+        ),
+    )
+
+
+__getattr__ = lazy_schema("schema_write_file", _build_schema)
@@ -0,0 +1,209 @@
+import json
+import os
+from google.genai import types
+from config import CHARS_PER_TOKEN, HISTORY_TOKEN_BUDGET, HISTORY_KEEP_RECENT_MESSAGES, TOOL_OUTPUT_STUB_CHARS
+
+
+def estimate_tokens(contents: list[types.Content]) -> int:
+    """
+    Estimates the prompt size of a conversation history.
+
+    Args:
+        contents: The conversation history to measure.
+
+    Returns:
+        The approximate number of tokens the history will cost.
+    """
+    total_chars = 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                total_chars += len(part.text)
+            if part.function_call:
+                total_chars += len(part.function_call.name or "")
+                total_chars += len(json.dumps(part.function_call.args or {}, default=str))
+            if part.function_response:
+                total_chars += len(part.function_response.name or "")
+                total_chars += len(json.dumps(part.function_response.response or {}, default=str))
+    return total_chars // CHARS_PER_TOKEN
+
+
+def _paired_calls(messages: list[types.Content]) -> dict:
+    """
+    Pairs each function response with the function call that produced it.
+
+    Returns:
+        A dict mapping (message_index, part_index) of a response to its FunctionCall.
+    """
+    pairs = {}
+    for i, content in enumerate(messages):
+        if content.role != "tool" or i == 0:
+            continue
+        calls = [part.function_call for part in messages[i - 1].parts or [] if part.function_call]
+        for j, part in enumerate(content.parts or []):
+            if part.function_response and j < len(calls):
+                pairs[(i, j)] = calls[j]
+    return pairs
+
+
+def _replace_response(part: types.Part, response: dict) -> types.Part:
+    return types.Part.from_function_response(name=part.function_response.name, response=response)
+
+
+def _normalize_path(file_path) -> str:
+    return os.path.normpath(str(file_path)).replace(os.sep, "/")
+
+
+def _changed_file(call: types.FunctionCall, response: dict) -> bool:
+    """Checks whether a write_file or apply_patch call actually changed its file."""
+    result = response.get("result")
+    if "error" in response or (isinstance(result, str) and result.startswith("Error")):
+        return False
+    if call.name == "apply_patch":
+        # Compact results list the applied edits; text results count them
+        return bool(response.get("applied")) if result is None else not str(result).startswith("Applied 0 ")
+    return True
+
+
+def _drop_superseded_reads(messages: list[types.Content]) -> list[types.Content]:
+    """Replaces file contents that a later successful write_file or apply_patch call has changed."""
+    pairs = _paired_calls(messages)
+
+    # Index of the last change to each path, and the tool that made it
+    last_change = {}
+    for (i, j), call in sorted(pairs.items()):
+        if call.name in ("write_file", "apply_patch") and call.args and call.args.get("file_path"):
+            if _changed_file(call, messages[i].parts[j].function_response.response or {}):
+                last_change[_normalize_path(call.args["file_path"])] = (i, call.name)
+
+    compacted = []
+    for i, content in enumerate(messages):
+        new_parts = []
+        for j, part in enumerate(content.parts or []):
+            call = pairs.get((i, j))
+            if call is not None and call.name == "get_file_content" and call.args and call.args.get("file_path"):
+                changed_at, changed_by = last_change.get(_normalize_path(call.args["file_path"]), (-1, None))
+                if changed_at > i:
+                    file_path = call.args["file_path"]
+                    verb = "overwritten by write_file" if changed_by == "write_file" else "edited by apply_patch"
+                    part = _replace_response(
+                        part,
+                        {"result": f'[Content of "{file_path}" omitted: the file was later {verb}]'},
+                    )
+            new_parts.append(part)
+        compacted.append(types.Content(role=content.role, parts=new_parts))
+    return compacted
+
+
+def _stub_old_tool_outputs(messages: list[types.Content], keep_recent: int) -> list[types.Content]:
+    """
+    Collapses long tool outputs outside the most recent messages into short stubs.
+
+    The content argument of old write_file calls is stubbed the same way, since
+    the file itself is the source of truth once the write has happened.
+    """
+    cutoff = len(messages) - keep_recent
+    compacted = []
+    for i, content in enumerate(messages):
+        if i >= cutoff or content.role not in ("tool", "model"):
+            compacted.append(content)
+            continue
+
+        new_parts = []
+        for part in content.parts or []:
+            call = part.function_call
+            if call and call.name == "write_file" and len(str((call.args or {}).get("content", ""))) > TOOL_OUTPUT_STUB_CHARS:
+                written = str(call.args["content"])
+                args = dict(call.args)
+                args["content"] = written[:TOOL_OUTPUT_STUB_CHARS] + f"[...{len(written) - TOOL_OUTPUT_STUB_CHARS} older characters elided]"
+                part = types.Part(function_call=call.model_copy(update={"args": args}))
+
+            response = (part.function_response.response or {}) if part.function_response else {}
+            result = response.get("result")
+            if result is None and response and "error" not in response:
+                # A compact result: stub its fields as one JSON string
+                result = json.dumps(response, default=str)
+            if isinstance(result, str) and len(result) > TOOL_OUTPUT_STUB_CHARS:
+                elided = len(result) - TOOL_OUTPUT_STUB_CHARS
+                part = _replace_response(
+                    part,
+                    {"result": result[:TOOL_OUTPUT_STUB_CHARS] + f"[...{elided} older characters elided]"},
+                )
+            new_parts.append(part)
+        compacted.append(types.Content(role=content.role, parts=new_parts))
+    return compacted
+
+
+def _summarize_turns(messages: list[types.Content]) -> str:
+    """Builds a one-line-per-call summary of the given turns."""
+    lines = ["Summary of earlier steps in this session:"]
+    pairs = _paired_calls(messages)
+    for (i, j), call in sorted(pairs.items()):
+        response = messages[i].parts[j].function_response.response or {}
+        args = ", ".join(f"{key}={value!r}" for key, value in (call.args or {}).items() if key != "content")
+        if "error" in response:
+            outcome = "error"
+        else:
+            outcome = f"{len(str(response.get('result', response)))} characters returned"
+        lines.append(f"- {call.name}({args}): {outcome}")
+    for content in messages:
+        if content.role == "model":
+            text = "".join(part.text for part in content.parts or [] if part.text).strip()
+            if text:
+                lines.append(f"- You said: {text[:TOOL_OUTPUT_STUB_CHARS]}")
+    return "\n".join(lines)
+
+
+def _summarize_older_turns(messages: list[types.Content], token_budget: int, keep_recent: int) -> list[types.Content]:
+    """
+    Folds the oldest turns into a text summary until the history fits the budget.
+
+    The original prompt is kept, and the summary is added to it as an extra part
+    so roles still alternate and every function call keeps its response.
+    """
+    candidate = messages
+    last_cut = len(messages) - keep_recent
+    for cut in range(2, last_cut + 1):
+        # Only cut right before a model turn so call/response pairs stay together
+        if messages[cut].role != "model":
+            continue
+
+        first = messages[0]
+        summary = types.Part(text=_summarize_turns(messages[:cut]))
+        candidate = [types.Content(role=first.role, parts=list(first.parts or []) + [summary])] + messages[cut:]
+        if estimate_tokens(candidate) <= token_budget:
+            break
+
+    # If nothing fits, the most aggressive cut is still the smallest prompt
+    return candidate
+
+
+def compact_history(
+    messages: list[types.Content],
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+    keep_recent: int = HISTORY_KEEP_RECENT_MESSAGES,
+) -> tuple[list[types.Content], int, int]:
+    """
+    Builds a compacted copy of the conversation history to send to the model.
+
+    File contents that a later write_file replaced are dropped, and tool outputs
+    older than the most recent messages are collapsed into short stubs. If the
+    history is still over the token budget, the oldest turns are summarized.
+    The full history in `messages` is left untouched.
+
+    Args:
+        messages: The full conversation history.
+        token_budget: The approximate prompt size to stay under, in tokens.
+        keep_recent: The number of most recent messages kept verbatim.
+
+    Returns:
+        A tuple of (compacted history, estimated tokens before, estimated tokens after).
+    """
+    tokens_before = estimate_tokens(messages)
+
+    compacted = _drop_superseded_reads(messages)
+    compacted = _stub_old_tool_outputs(compacted, keep_recent)
+    if estimate_tokens(compacted) > token_budget:
+        compacted = _summarize_older_turns(compacted, token_budget, keep_recent)
+
+    return compacted, tokens_before, estimate_tokens(compacted)
@@ -1,39 +1,15 @@
+import asyncio
+import functools
 import os
 import sys
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 
-from functions.get_files_info import schema_get_files_info
-from functions.get_file_content import schema_get_file_content
-from functions.write_file import schema_write_file
-from functions.run_python_file import schema_run_python_file
-from functions.function_caller import call_function
+from config import MODEL_CALL_MODES
+from tracing import tracer
 
-# Setup
-load_dotenv()
-api_key = os.environ.get("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
+# The google-genai SDK, the tools and the model client are imported only once
+# a prompt is actually run, so usage errors return without paying for them
 
-
-def main():
-    response = None  # Initialize response to store the last one
-    
-    # Handle command-line arguments
-    args = sys.argv[1:]
-    is_verbose = "--verbose" in args
-
-    if is_verbose:
-        args.remove("--verbose")
-
-    # Validate input and get prompt
-    if len(args) != 1:
-        print(f"Usage: {sys.argv[0]} \"<your prompt here>\" [--verbose]")
-        sys.exit(1)
-
-    prompt = args[0]
-    
-    system_prompt = """
+SYSTEM_PROMPT = """
     You are an autonomous AI coding agent. You are currently working inside a project directory for a Python calculator.
 
     Your goal is to *fully complete* the user's coding tasks.
@@ -43,106 +19,356 @@ def main():
 
     **Do not provide intermediate text responses, plans, or explanations. Ever.**
 
-    For example, **DO NOT** respond with "The precedence of operators is incorrect." Your next step *must* be to call `write_file` with the corrected code.
+    For example, **DO NOT** respond with "The precedence of operators is incorrect." Your next step *must* be to call `apply_patch` (or `write_file`) with the corrected code.
 
-    A request like "fix the bug" is not complete until you have (1) identified the bug, (2) written the corrected code to the file using `write_file`, and (3) verified the fix by running the relevant tests or code using `run_python_file`.
+    A request like "fix the bug" is not complete until you have (1) identified the bug, (2) written the corrected code to the file using `apply_patch` or `write_file`, and (3) verified the fix by running the affected tests with `run_affected_tests`, or the relevant code using `run_python_file`.
 
     Only provide a final text answer *after* you have successfully verified the fix.
 
     You can perform the following operations by calling the provided functions:
     - List files and directories
     - Read file contents
+    - Search all files for text, regular expressions or identifiers
     - Execute Python files with optional arguments
+    - Run only the tests affected by your changes
+    - List only the files that changed since an earlier workspace snapshot
     - Write or overwrite files
+    - Edit part of a file by applying a unified diff or SEARCH/REPLACE blocks
 
     All paths you provide should be relative to the working directory.
     """
 
-    available_functions = types.Tool(
+REPO_MAP_PROMPT = """
+    The working directory contains the files below, with the line numbers of their classes and functions. Use this map to go straight to the right files instead of listing directories:
+"""
+
+
+def build_system_prompt(working_directory):
+    """Returns the system prompt with a map of the working directory appended, if there is one."""
+    from functions.repo_map import build_repo_map
+
+    with tracer.span("repo_map", category="fs") as span:
+        repo_map = build_repo_map(working_directory)
+        span.update(map_chars=len(repo_map))
+    if not repo_map:
+        return SYSTEM_PROMPT
+    return f"{SYSTEM_PROMPT}{REPO_MAP_PROMPT}{repo_map}\n"
+
+
+def load_api_key():
+    """Loads .env into the environment and returns the Gemini API key, if any."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return os.environ.get("GEMINI_API_KEY")
+
+
+@functools.cache
+def build_available_functions():
+    """Returns the types.Tool declaring every function the agent can call, built once per process."""
+    from google.genai import types
+    from functions.get_files_info import schema_get_files_info
+    from functions.get_file_content import schema_get_file_content
+    from functions.write_file import schema_write_file
+    from functions.run_python_file import schema_run_python_file
+    from functions.search_code import schema_search_code
+    from functions.apply_patch import schema_apply_patch
+    from functions.run_affected_tests import schema_run_affected_tests
+    from functions.get_workspace_changes import schema_get_workspace_changes
+
+    return types.Tool(
         function_declarations=[
             schema_get_files_info,
             schema_get_file_content,
             schema_write_file,
             schema_run_python_file,
+            schema_search_code,
+            schema_apply_patch,
+            schema_run_affected_tests,
+            schema_get_workspace_changes,
         ]
     )
 
-    # Conversation history
-    messages = [types.Content(role="user", parts=[types.Part(text=prompt)]),]
+
+def main():
+    # Handle command-line arguments
+    args = sys.argv[1:]
+    is_verbose = "--verbose" in args
+
+    if is_verbose:
+        args.remove("--verbose")
+
+    # Tool results can be sent as compact typed fields instead of text
+    compact_results = "--compact-results" in args
+    if compact_results:
+        args.remove("--compact-results")
+
+    # Model calls can be recorded to disk and replayed offline
+    model_call_mode = _pop_option(args, "--model-calls", "live")
+
+    # Spans for the model calls and tools can be written to a trace file
+    trace_path = _pop_option(args, "--trace")
+
+    # A checkpointed session can be continued, optionally with a new prompt
+    resume_id = _pop_option(args, "--resume")
+
+    # Validate input and get prompt
+    valid_arguments = len(args) == 1 or (resume_id is not None and not args)
+    if not valid_arguments or model_call_mode not in MODEL_CALL_MODES or "" in (trace_path, resume_id):
+        print(
+            f"Usage: {sys.argv[0]} \"<your prompt here>\" [--verbose] [--compact-results] [--model-calls {'|'.join(MODEL_CALL_MODES)}] [--trace FILE.json|FILE.jsonl]\n"
+            f"       {sys.argv[0]} --resume SESSION [\"<your prompt here>\"] [options]"
+        )
+        sys.exit(1)
+
+    prompt = args[0] if args else None
+
+    from google.genai import types
+    from functions.function_caller import WORKING_DIRECTORY
+    from model_client import create_model_client
+    from model_scheduler import find_scheduler, format_metrics
+    from session_checkpoint import SessionCheckpoint, is_finished
+
+    # Conversation history, checkpointed to disk after every iteration
+    if resume_id is None:
+        checkpoint = SessionCheckpoint.create(WORKING_DIRECTORY)
+        messages = [types.Content(role="user", parts=[types.Part(text=prompt)]),]
+    else:
+        try:
+            checkpoint, messages = SessionCheckpoint.load(resume_id)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if prompt is None and is_finished(messages):
+            print(f'Error: Session "{resume_id}" already has a final answer. Pass a prompt to continue it.')
+            sys.exit(1)
+        resume_text = _resume_note(checkpoint)
+        if prompt is not None or resume_text:
+            messages.append(types.Content(role="user", parts=[types.Part(text="\n\n".join(filter(None, [resume_text, prompt])))]))
+        print(f"Resuming session {checkpoint.session_id} after {checkpoint.iteration} iterations ({len(messages)} messages)")
 
     if is_verbose:
         print(f"User prompt: {prompt}")
 
+    model_client = create_model_client(model_call_mode, api_key=load_api_key())
+
+    if trace_path:
+        tracer.enable()
+
+    system_prompt = build_system_prompt(checkpoint.working_directory)
+    token_totals = asyncio.run(run_agent(
+        model_client, messages, system_prompt, build_available_functions(), is_verbose,
+        working_directory=checkpoint.working_directory, compact_results=compact_results, checkpoint=checkpoint,
+    ))
+
+    if checkpoint.iteration and not is_finished(messages):
+        print(f"\nSession checkpointed. Continue it with: {sys.argv[0]} --resume {checkpoint.session_id}")
+
+    scheduler = find_scheduler(model_client)
+    if is_verbose and scheduler is not None:
+        print(format_metrics(scheduler.metrics()))
+
+    if trace_path:
+        tracer.export(trace_path)
+        print(f"\nTrace written to {trace_path}")
+        print(tracer.summary())
+        print(
+            f"Session tokens: {token_totals['prompt']} prompt, {token_totals['candidates']} response, "
+            f"{token_totals['cached']} cached, over {token_totals['calls']} model calls"
+        )
+
+
+def _resume_note(checkpoint):
+    """Describes the files changed since a session's last checkpoint, or returns "" if none did."""
+    from functions.get_workspace_changes import get_workspace_changes
+    from functions.workspace_snapshot import get_workspace_snapshots
+
+    if not checkpoint.snapshot_id:
+        return ""
+    # Anything may have been edited by hand while the session was stopped
+    get_workspace_snapshots(checkpoint.working_directory).mark_changed()
+    changes = get_workspace_changes(checkpoint.working_directory, since_snapshot=checkpoint.snapshot_id)
+    if changes.startswith("Error:"):
+        return "This session was resumed, but the working directory's state when it stopped is no longer known. Files may have changed since then."
+    if "\n" not in changes:
+        return ""
+    return "This session was resumed. Files changed in the working directory since it stopped:\n" + changes.split("\n", 1)[1]
+
+
+def _pop_option(args, name, default=None):
+    """Removes `name VALUE` from args and returns VALUE, or "" if the value is missing."""
+    if name not in args:
+        return default
+    index = args.index(name)
+    value = args[index + 1] if index + 1 < len(args) else ""
+    del args[index:index + 2]
+    return value
+
+
+def _append_part(parts, part):
+    """Appends a streamed part, merging consecutive text chunks into one part."""
+    from google.genai import types
+
+    if part.text and parts and parts[-1].text and not parts[-1].function_call:
+        parts[-1] = types.Part(text=parts[-1].text + part.text)
+    else:
+        parts.append(part)
+
+
+async def run_agent(model_client, messages, system_prompt, available_functions, is_verbose=False, working_directory=None, compact_results=None, checkpoint=None):
+    """
+    Runs the agent loop, streaming model output and starting tools as calls arrive.
+
+    Args:
+        model_client: The ModelClient that model requests are sent through.
+        messages: The conversation history, updated in place.
+        system_prompt: The system instruction sent with every request.
+        available_functions: The types.Tool holding the function declarations.
+        is_verbose: If True, prints per-iteration details and token usage.
+        working_directory: The directory the tools work in. Defaults to function_caller.WORKING_DIRECTORY.
+        compact_results: If True, tool results are sent as compact typed fields. Defaults to COMPACT_TOOL_RESULTS.
+        checkpoint: A SessionCheckpoint that the history is saved to after every completed iteration.
+
+    Returns:
+        The session's token totals, summed over every model call.
+    """
+    from google.genai import types
+    from functions.function_caller import FunctionCallScheduler, WORKING_DIRECTORY
+    from functions.file_cache import file_cache
+    from functions.run_affected_tests import record_test_baseline
+    from history import compact_history
+
+    # run_affected_tests reports the files changed since here until tests first run
+    await asyncio.to_thread(record_test_baseline, working_directory or WORKING_DIRECTORY)
+
+    response = None  # Initialize response to store the last chunk
+    token_totals = {"calls": 0, "prompt": 0, "candidates": 0, "cached": 0}
+
     # Agent Loop
     max_iterations = 20
     for i in range(max_iterations):
         if is_verbose:
             print(f"\n--- Iteration {i+1} ---")
 
-        try:
-            # Send conversation history to model
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=messages, 
-                config=types.GenerateContentConfig(
-                    tools=[available_functions],
-                    system_instruction=system_prompt
-                ),
-            )
-
-            if not response.candidates:
-                print("Error: No response from model.")
-                break
-            
-            # Add the model's response to history
-            model_response_content = response.candidates[0].content
-            messages.append(model_response_content)
-
-            part = model_response_content.parts[0]
-
-            # Stop condition: Model returns a final text answer
-            if part.text:
-                print("\nFinal response:")
-                print(part.text)
-                break  # We are done
-
-            # Handle function call
-            if part.function_call:
-                function_call_part = part.function_call
-                
-                # Execute the function call
-                function_call_result = call_function(function_call_part, verbose=is_verbose)
-
-                if (
-                    not function_call_result.parts
-                    or not function_call_result.parts[0].function_response
-                ):
-                    raise ValueError("Error: Invalid function response received from call_function.")
+        with tracer.span("iteration", category="session", iteration=i + 1):
+            scheduler = FunctionCallScheduler(verbose=is_verbose, working_directory=working_directory, compact=compact_results)
+            try:
+                model_parts = []
+                received_candidate = False
+                printed_text = False
+
+                # Trim the history sent to the model to the token budget
+                contents, tokens_before, tokens_after = compact_history(messages)
+                if is_verbose:
+                    print(f"Prompt size: ~{tokens_before} tokens, ~{tokens_after} after compaction")
+
+                # Stream the model's response, starting tools as soon as each call is complete
+                with tracer.span("model_call", category="model", request_messages=len(contents), request_tokens_estimate=tokens_after) as model_span:
+                    last_chunk = None
+                    stream = model_client.generate_content_stream(
+                        model="gemini-2.0-flash",
+                        contents=contents,
+                        config=types.GenerateContentConfig(
+                            tools=[available_functions],
+                            system_instruction=system_prompt
+                        ),
+                    )
+                    async for chunk in stream:
+                        response = last_chunk = chunk
+                        if not chunk.candidates:
+                            continue
+                        received_candidate = True
+
+                        content = chunk.candidates[0].content
+                        for part in (content.parts if content and content.parts else []):
+                            if part.function_call:
+                                scheduler.submit(part.function_call)
+                            elif part.text:
+                                # Text streams as it arrives; a turn may still go on to call tools
+                                if not printed_text:
+                                    print("\nResponse:")
+                                    printed_text = True
+                                print(part.text, end="", flush=True)
+                            _append_part(model_parts, part)
+
+                    # The last streamed chunk carries the usage for the whole call
+                    usage = _token_usage(last_chunk)
+                    model_span.update({f"{key}_tokens": count for key, count in usage.items()})
+                    model_span.update(response_parts=len(model_parts), function_calls=len(scheduler))
+                    token_totals["calls"] += 1
+                    for key, count in usage.items():
+                        token_totals[key] += count
+
+                if printed_text:
+                    print()
+
+                if not received_candidate:
+                    print("Error: No response from model.")
+                    break
+
+                # Add the model's response to history
+                messages.append(types.Content(role="model", parts=model_parts))
+
+                # Stop condition: Model returns a final text answer
+                if not len(scheduler):
+                    if printed_text:
+                        if checkpoint:
+                            checkpoint.save(messages, token_totals)
+                        break  # We are done
+
+                    # Fallback in case the model returns neither text nor function call
+                    print("Error: Model response was not text or a function call.")
+                    break
+
+                # Wait for every function call from this turn
+                function_call_result = await scheduler.gather()
+
+                if not all(part.function_response for part in function_call_result.parts):
+                    raise ValueError("Error: Invalid function response received from FunctionCallScheduler.")
 
                 if is_verbose:
-                    response_data = function_call_result.parts[0].function_response.response
-                    print(f"-> {response_data}")
+                    for part in function_call_result.parts:
+                        print(f"-> {part.function_response.response}")
 
                 messages.append(function_call_result)
-            
-            else:
-                # Fallback in case the model returns neither text nor function call
-                print("Error: Model response was not text or a function call.")
+                if checkpoint:
+                    checkpoint.save(messages, token_totals)
+
+            except Exception as e:
+                print(f"Error during agent loop: {e}")
+                # Don't leave calls from this turn running behind the next steps
+                await scheduler.cancel()
                 break
-        
-        except Exception as e:
-            print(f"Error during agent loop: {e}")
-            break
 
         # Check for max iterations
         if i == max_iterations - 1:
             print("\nError: Max iterations reached. Stopping.")
 
 
-    if is_verbose and response:  # Check if response exists
+    if is_verbose and response and response.usage_metadata:  # Check if response exists
         print(f"\nPrompt tokens (last call): {response.usage_metadata.prompt_token_count}")
         print(f"Response tokens (last call): {response.usage_metadata.candidates_token_count}")
 
+    if is_verbose:
+        print(
+            f"Total tokens ({token_totals['calls']} calls): {token_totals['prompt']} prompt, "
+            f"{token_totals['candidates']} response, {token_totals['cached']} cached"
+        )
+        cache_stats = file_cache.stats()
+        print(f"File cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['bytes']} bytes cached")
+
+    return token_totals
+
+
+def _token_usage(chunk) -> dict:
+    """Reads the prompt, response and cached token counts from a response chunk, treating missing counts as 0."""
+    usage = chunk.usage_metadata if chunk else None
+    return {
+        "prompt": (usage.prompt_token_count or 0) if usage else 0,
+        "candidates": (usage.candidates_token_count or 0) if usage else 0,
+        "cached": (usage.cached_content_token_count or 0) if usage else 0,
+    }
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,232 @@
+import abc
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from google.genai import types
+from config import MODEL_CALL_MODES, MODEL_CALL_STORE_DIRECTORY, MODEL_HTTP_MAX_CONNECTIONS
+
+
+class ModelClient(abc.ABC):
+    """
+    The interface the agent loop uses to talk to a model.
+
+    Implementations stream a response as GenerateContentResponse chunks.
+    """
+
+    @abc.abstractmethod
+    async def generate_content_stream(self, model: str, contents: list[types.Content], config: types.GenerateContentConfig):
+        """Returns an async iterator over the response's GenerateContentResponse chunks."""
+
+
+_genai_clients = {}
+_genai_clients_lock = threading.Lock()
+
+
+def _shared_genai_client(api_key: str, base_url: str):
+    """Returns the process-wide genai.Client for an API key and endpoint, so every session shares its connection pool."""
+    import httpx
+    from google import genai
+
+    key = (api_key, base_url)
+    with _genai_clients_lock:
+        if key not in _genai_clients:
+            limits = httpx.Limits(max_connections=MODEL_HTTP_MAX_CONNECTIONS, max_keepalive_connections=MODEL_HTTP_MAX_CONNECTIONS)
+            http_options = types.HttpOptions(base_url=base_url, async_client_args={"limits": limits})
+            _genai_clients[key] = genai.Client(api_key=api_key, http_options=http_options)
+        return _genai_clients[key]
+
+
+class GeminiModelClient(ModelClient):
+    """
+    Streams responses from the Gemini API.
+
+    The underlying genai.Client is built on the first request, so sessions
+    served entirely from recordings never set up an HTTP client. It is shared
+    by every GeminiModelClient in the process with the same key and endpoint.
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _shared_genai_client(self.api_key, self.base_url)
+        return self._client
+
+    async def generate_content_stream(self, model, contents, config):
+        stream = await self.client.aio.models.generate_content_stream(
+            model=model,
+            contents=contents,
+            config=config,
+        )
+        async for chunk in stream:
+            yield chunk
+
+
+# The resource usage run_python_file reports changes from run to run. It is
+# masked when hashing a request, so recorded sessions still replay.
+_RUN_RESOURCES = re.compile(r'wall [\d.]+s, CPU [\d.]+s, peak RSS [\d.]+ MiB')
+
+
+def request_key(model: str, contents: list[types.Content], config: types.GenerateContentConfig) -> str:
+    """
+    Returns a stable hash identifying a model request.
+
+    Args:
+        model: The model name.
+        contents: The conversation history sent with the request.
+        config: The request's generation config.
+
+    Returns:
+        A hex SHA-256 digest of the canonical JSON form of the request, with
+        run_python_file's resource usage masked.
+    """
+    request = json.dumps(_request_json(model, contents, config), sort_keys=True)
+    return hashlib.sha256(_RUN_RESOURCES.sub("<resources>", request).encode()).hexdigest()
+
+
+def _request_json(model, contents, config) -> dict:
+    return {
+        "model": model,
+        "contents": [content.model_dump(mode="json", exclude_none=True) for content in contents],
+        "config": config.model_dump(mode="json", exclude_none=True) if config else None,
+    }
+
+
+class ModelCallStore:
+    """
+    An on-disk store of model responses, one JSON file per request hash.
+    """
+
+    def __init__(self, directory: str = MODEL_CALL_STORE_DIRECTORY):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def load(self, key: str):
+        """Returns the recorded response chunks for a request, or None if it was never recorded."""
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        return [types.GenerateContentResponse.model_validate(chunk) for chunk in record["chunks"]]
+
+    def save(self, key: str, request: dict, chunks: list[types.GenerateContentResponse]):
+        """Records the response chunks for a request, replacing any earlier recording."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            "request": request,
+            "chunks": [chunk.model_dump(mode="json", exclude_none=True) for chunk in chunks],
+        }
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(temp_path, path)
+
+
+class RecordingModelClient(ModelClient):
+    """
+    Wraps another client and records every response to a ModelCallStore.
+
+    With `use_recorded` set, requests that were recorded before are served from
+    the store instead of the wrapped client, caching identical requests.
+    """
+
+    def __init__(self, inner: ModelClient, store: ModelCallStore, use_recorded: bool = False):
+        self.inner = inner
+        self.store = store
+        self.use_recorded = use_recorded
+
+    async def generate_content_stream(self, model, contents, config):
+        key = request_key(model, contents, config)
+        if self.use_recorded:
+            recorded = self.store.load(key)
+            if recorded is not None:
+                for chunk in recorded:
+                    yield chunk
+                return
+
+        chunks = []
+        async for chunk in self.inner.generate_content_stream(model, contents, config):
+            chunks.append(chunk)
+            yield chunk
+        self.store.save(key, _request_json(model, contents, config), chunks)
+
+
+class ReplayModelClient(ModelClient):
+    """Serves recorded responses from a ModelCallStore, never touching the network."""
+
+    def __init__(self, store: ModelCallStore):
+        self.store = store
+
+    async def generate_content_stream(self, model, contents, config):
+        key = request_key(model, contents, config)
+        recorded = self.store.load(key)
+        if recorded is None:
+            raise LookupError(f"No recorded model response for request {key[:12]} in {self.store.directory}")
+        for chunk in recorded:
+            yield chunk
+
+
+class ScriptedModelClient(ModelClient):
+    """
+    Plays back a fixed sequence of model turns, for benchmarks and tests.
+
+    Each turn is a list of parts streamed as one chunk per part. Every request
+    is logged with its start time and contents so callers can measure the loop.
+    """
+
+    def __init__(self, turns: list[list[types.Part]]):
+        self.turns = list(turns)
+        self.requests = []
+
+    async def generate_content_stream(self, model, contents, config):
+        self.requests.append((time.perf_counter(), list(contents)))
+        if not self.turns:
+            raise LookupError("Scripted model has no turns left")
+
+        for part in self.turns.pop(0):
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))],
+            )
+
+
+def create_model_client(mode: str = "live", api_key: str = None, store_directory: str = MODEL_CALL_STORE_DIRECTORY, base_url: str = None) -> ModelClient:
+    """
+    Builds the model client for a run.
+
+    Requests that reach the API go through a ScheduledModelClient, which
+    rate-limits and retries them; recorded responses are served without it.
+
+    Args:
+        mode: "live" calls the Gemini API, "record" also saves every response,
+            "replay" serves only saved responses, and "cache" serves saved
+            responses when available and records the rest.
+        api_key: The Gemini API key, unused in replay mode.
+        store_directory: Where recorded responses are kept.
+        base_url: Overrides the Gemini API endpoint, e.g. for a local test server.
+
+    Returns:
+        A ModelClient for the requested mode.
+    """
+    from model_scheduler import ScheduledModelClient
+
+    if mode not in MODEL_CALL_MODES:
+        raise ValueError(f"Unknown model call mode: {mode}")
+
+    if mode == "replay":
+        return ReplayModelClient(ModelCallStore(store_directory))
+
+    client = ScheduledModelClient(GeminiModelClient(api_key=api_key, base_url=base_url))
+    if mode == "live":
+        return client
+    return RecordingModelClient(client, ModelCallStore(store_directory), use_recorded=(mode == "cache"))
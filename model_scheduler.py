@@ -0,0 +1,216 @@
+import asyncio
+import random
+import time
+from config import (
+    CHARS_PER_TOKEN,
+    MODEL_MAX_RETRIES,
+    MODEL_RATE_BURST_SECONDS,
+    MODEL_REQUESTS_PER_MINUTE,
+    MODEL_RETRY_BASE_SECONDS,
+    MODEL_RETRY_MAX_SECONDS,
+    MODEL_TOKENS_PER_MINUTE,
+)
+from history import estimate_tokens
+from model_client import ModelClient
+from tracing import tracer
+
+# HTTP statuses worth retrying: throttling, timeouts and server-side failures
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    A token bucket that refills continuously at `per_minute` tokens per minute.
+
+    The bucket holds at most `burst_seconds` worth of tokens, so a burst after
+    a quiet period cannot use up a whole minute's quota at once. Taking more
+    than are available leaves it in debt, which later requests wait out.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = MODEL_RATE_BURST_SECONDS):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Returns how many seconds to wait until `amount` tokens are available (0 if they are now)."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+
+def _status_code(error: Exception):
+    """The HTTP status of a failed request: APIError carries it as `code`, httpx errors on `response`."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Checks whether a failed model request may succeed if sent again."""
+    code = _status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+def _retry_after(error: Exception):
+    """Seconds the server asked us to wait before retrying, from a Retry-After header, or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers["retry-after"]) if headers and "retry-after" in headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ScheduledModelClient(ModelClient):
+    """
+    Wraps another client with rate limiting and retries.
+
+    Requests wait in FIFO order for both a request and a token budget, kept
+    as token buckets refilled at `requests_per_minute` and
+    `tokens_per_minute` that hold at most `burst_seconds` of quota. A
+    request's token cost is estimated from its contents up front and
+    corrected from the reported usage once it finishes. Requests that fail with a retryable error before streaming
+    any output are retried with exponential backoff and full jitter,
+    honouring Retry-After. A failure part-way through a stream is raised,
+    since its chunks have already been passed on.
+
+    Share one instance between concurrent sessions so they draw from the
+    same quota.
+    """
+
+    def __init__(
+        self,
+        inner: ModelClient,
+        requests_per_minute: float = MODEL_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = MODEL_TOKENS_PER_MINUTE,
+        burst_seconds: float = MODEL_RATE_BURST_SECONDS,
+        max_retries: int = MODEL_MAX_RETRIES,
+        retry_base_seconds: float = MODEL_RETRY_BASE_SECONDS,
+        retry_max_seconds: float = MODEL_RETRY_MAX_SECONDS,
+    ):
+        self.inner = inner
+        self.request_bucket = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._lock = None
+        self._metrics = {
+            "requests": 0,
+            "failed": 0,
+            "retries": 0,
+            "retries_by_status": {},
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "throttled_seconds": 0.0,
+            "backoff_seconds": 0.0,
+        }
+
+    def metrics(self) -> dict:
+        """Returns a snapshot of the request, retry, queue depth and wait counters."""
+        metrics = dict(self._metrics)
+        metrics["retries_by_status"] = dict(metrics["retries_by_status"])
+        return metrics
+
+    async def _acquire(self, token_estimate: int):
+        """Waits, in arrival order, until both buckets can cover one more request."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        metrics = self._metrics
+        metrics["queue_depth"] += 1
+        metrics["max_queue_depth"] = max(metrics["max_queue_depth"], metrics["queue_depth"])
+        try:
+            async with self._lock:
+                while True:
+                    delay = max(
+                        self.request_bucket.delay_for(1) if self.request_bucket else 0.0,
+                        self.token_bucket.delay_for(token_estimate) if self.token_bucket else 0.0,
+                    )
+                    if delay <= 0:
+                        break
+                    metrics["throttled_seconds"] += delay
+                    await asyncio.sleep(delay)
+                if self.request_bucket:
+                    self.request_bucket.take(1)
+                if self.token_bucket:
+                    self.token_bucket.take(token_estimate)
+        finally:
+            metrics["queue_depth"] -= 1
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+        retry_after = _retry_after(error)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    async def generate_content_stream(self, model, contents, config):
+        token_estimate = estimate_tokens(contents)
+        if config is not None and isinstance(config.system_instruction, str):
+            token_estimate += len(config.system_instruction) // CHARS_PER_TOKEN
+
+        self._metrics["requests"] += 1
+        for attempt in range(self.max_retries + 1):
+            with tracer.span("model_queue", category="model", attempt=attempt + 1, tokens_estimate=token_estimate):
+                await self._acquire(token_estimate)
+
+            streamed = False
+            last_chunk = None
+            try:
+                async for chunk in self.inner.generate_content_stream(model, contents, config):
+                    streamed = True
+                    last_chunk = chunk
+                    yield chunk
+            except Exception as e:
+                if streamed or attempt == self.max_retries or not is_retryable(e):
+                    self._metrics["failed"] += 1
+                    raise
+                status = str(_status_code(e) or type(e).__name__)
+                delay = self._backoff(attempt, e)
+                self._metrics["retries"] += 1
+                self._metrics["retries_by_status"][status] = self._metrics["retries_by_status"].get(status, 0) + 1
+                self._metrics["backoff_seconds"] += delay
+                with tracer.span("model_backoff", category="model", attempt=attempt + 1, status=status):
+                    await asyncio.sleep(delay)
+                continue
+
+            # Charge the tokens the request really used instead of the estimate
+            usage = getattr(last_chunk, "usage_metadata", None)
+            if self.token_bucket and usage and usage.total_token_count:
+                self.token_bucket.take(usage.total_token_count - token_estimate)
+            return
+
+
+def find_scheduler(model_client: ModelClient):
+    """Returns the ScheduledModelClient in a chain of wrapping clients, or None if requests are not scheduled."""
+    while model_client is not None and not isinstance(model_client, ScheduledModelClient):
+        model_client = getattr(model_client, "inner", None)
+    return model_client
+
+
+def format_metrics(metrics: dict) -> str:
+    retries = ", ".join(f"{count}x {status}" for status, count in sorted(metrics["retries_by_status"].items()))
+    return (
+        f"Model requests: {metrics['requests']} sent, {metrics['failed']} failed, "
+        f"{metrics['retries']} retries{f' ({retries})' if retries else ''}, "
+        f"peak queue depth {metrics['max_queue_depth']}, "
+        f"{metrics['throttled_seconds']:.1f}s throttled, {metrics['backoff_seconds']:.1f}s backing off"
+    )
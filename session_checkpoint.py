@@ -0,0 +1,142 @@
+import json
+import os
+import secrets
+import time
+from google.genai import types
+from config import SESSION_DIRECTORY
+from functions.workspace_snapshot import get_workspace_snapshots
+
+
+class SessionCheckpoint:
+    """
+    An append-only log of one agent session, for resuming it after a crash or the iteration limit.
+
+    The log is a JSON Lines file. A "session" record opens it, each message
+    is appended once as a "message" record carrying its index in the
+    history, and a "checkpoint" record after each iteration commits the
+    messages up to it, with the workspace snapshot id and token totals at
+    that point. The snapshot's new directory nodes are appended to the
+    snapshot journal with each checkpoint, so its id still resolves after the
+    process is killed. Only the records for new messages and nodes are
+    written, so a checkpoint costs the same however long the session has run. Messages after the last checkpoint belong to an
+    unfinished iteration and are dropped when the session is loaded.
+    """
+
+    def __init__(self, session_id: str, working_directory: str, directory: str = SESSION_DIRECTORY):
+        self.session_id = session_id
+        self.working_directory = os.path.abspath(working_directory)
+        self.path = os.path.join(directory, f"{session_id}.jsonl")
+        self.iteration = 0
+        self.snapshot_id = None
+        # Token totals of the runs before a resume, which the new run's totals are added to
+        self.resumed_tokens = {}
+        self._saved_messages = 0
+
+    @classmethod
+    def create(cls, working_directory: str, directory: str = SESSION_DIRECTORY):
+        """Starts the log for a new session, under an id made from the current time."""
+        session_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        checkpoint = cls(session_id, working_directory, directory)
+        os.makedirs(directory, exist_ok=True)
+        checkpoint._append([{
+            "type": "session",
+            "id": session_id,
+            "working_directory": checkpoint.working_directory,
+            "created": time.time(),
+        }])
+        return checkpoint
+
+    @classmethod
+    def load(cls, session_id: str, directory: str = SESSION_DIRECTORY):
+        """
+        Reads a session's log back.
+
+        Args:
+            session_id: The id printed when the session was checkpointed.
+            directory: The directory the logs are kept in.
+
+        Returns:
+            (checkpoint, messages): the checkpoint, ready to append to, and the
+            history as of its last checkpoint.
+
+        Raises:
+            ValueError: If there is no log for the session, or it was never checkpointed.
+        """
+        path = os.path.join(directory, f"{os.path.basename(session_id)}.jsonl")
+        try:
+            with open(path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            raise ValueError(f'No checkpointed session "{session_id}" in {directory}')
+
+        checkpoint = None
+        messages = []
+        committed = None
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # A write cut short by a crash; nothing after it was committed
+            kind = record.get("type")
+            if kind == "session":
+                checkpoint = cls(record["id"], record["working_directory"], directory)
+            elif kind == "message":
+                # A message re-sent after a resume replaces the uncommitted one at its index
+                del messages[record["index"]:]
+                messages.append(types.Content.model_validate(record["content"]))
+            elif kind == "checkpoint" and checkpoint is not None:
+                committed = record
+        if checkpoint is None or committed is None:
+            raise ValueError(f'Session "{session_id}" has no checkpoint to resume from')
+
+        messages = messages[:committed["messages"]]
+        checkpoint.iteration = committed["iteration"]
+        checkpoint.snapshot_id = committed.get("snapshot")
+        checkpoint.resumed_tokens = committed.get("tokens") or {}
+        checkpoint._saved_messages = len(messages)
+        return checkpoint, messages
+
+    def _append(self, records: list[dict]):
+        # One write per checkpoint, so a crash can only cut off its last line
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records))
+
+    def save(self, messages: list[types.Content], token_totals: dict = None):
+        """
+        Appends the messages added since the last checkpoint, then a checkpoint committing them.
+
+        Args:
+            messages: The full conversation history.
+            token_totals: The token counts of this run so far. They are recorded
+                with the checkpoint, added to those of the runs before a resume.
+        """
+        self.iteration += 1
+        snapshots = get_workspace_snapshots(self.working_directory)
+        with snapshots.lock:
+            self.snapshot_id = snapshots.refresh()
+            snapshots.save()
+        tokens = dict(self.resumed_tokens)
+        for key, count in (token_totals or {}).items():
+            tokens[key] = tokens.get(key, 0) + count
+        records = [
+            {"type": "message", "index": index, "content": content.model_dump(mode="json", exclude_none=True)}
+            for index, content in enumerate(messages[self._saved_messages:], start=self._saved_messages)
+        ]
+        records.append({
+            "type": "checkpoint",
+            "iteration": self.iteration,
+            "messages": len(messages),
+            "snapshot": self.snapshot_id,
+            "tokens": tokens,
+            "time": time.time(),
+        })
+        self._append(records)
+        self._saved_messages = len(messages)
+
+
+def is_finished(messages: list[types.Content]) -> bool:
+    """Checks whether a history ends with the model's final text answer."""
+    if not messages or messages[-1].role != "model":
+        return False
+    parts = messages[-1].parts or []
+    return any(part.text for part in parts) and not any(part.function_call for part in parts)
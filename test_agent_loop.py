@@ -0,0 +1,95 @@
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from google.genai import types
+
+import main
+from batch import discard_workspace_state
+from functions.function_caller import FunctionCallScheduler
+from model_client import ModelClient
+
+
+class StreamingModelClient(ModelClient):
+    """Streams one text chunk at a time, noting what had been printed before each next chunk."""
+
+    def __init__(self, chunks: list[str], output: io.StringIO):
+        self.chunks = chunks
+        self.output = output
+        self.printed_before_chunk = []
+
+    async def generate_content_stream(self, model, contents, config):
+        for text in self.chunks:
+            self.printed_before_chunk.append(self.output.getvalue())
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))],
+            )
+
+
+class AgentLoopTests(unittest.TestCase):
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp(prefix="agent-loop-test-")
+
+    def tearDown(self):
+        discard_workspace_state(self.workspace)
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def test_final_answer_streams_as_it_arrives(self):
+        output = io.StringIO()
+        client = StreamingModelClient(["The answer ", "is ", "42."], output)
+        messages = [types.Content(role="user", parts=[types.Part(text="What is the answer?")])]
+        with contextlib.redirect_stdout(output):
+            asyncio.run(main.run_agent(client, messages, "test", types.Tool(function_declarations=[]), working_directory=self.workspace))
+
+        # Each chunk was printed before the next one was requested
+        self.assertIn("The answer ", client.printed_before_chunk[1])
+        self.assertIn("The answer is ", client.printed_before_chunk[2])
+        self.assertEqual(output.getvalue().count("Response:"), 1)
+        self.assertEqual(messages[-1].parts[0].text, "The answer is 42.")
+
+    def test_scheduler_results_match_sequential_order(self):
+        with open(os.path.join(self.workspace, "a.txt"), "w") as f:
+            f.write("before")
+
+        async def run_turn():
+            scheduler = FunctionCallScheduler(working_directory=self.workspace)
+            for name, args in [
+                ("get_file_content", {"file_path": "a.txt"}),
+                ("write_file", {"file_path": "a.txt", "content": "after"}),
+                ("get_file_content", {"file_path": "a.txt"}),
+            ]:
+                scheduler.submit(types.FunctionCall(name=name, args=args))
+            return await scheduler.gather()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            content = asyncio.run(run_turn())
+        results = [part.function_response.response["result"] for part in content.parts]
+        # The write waits for the first read, and the second read waits for the write
+        self.assertEqual(results[0], "before")
+        self.assertTrue(results[1].startswith("Successfully wrote"))
+        self.assertEqual(results[2], "after")
+
+    def test_cancel_waits_for_running_calls(self):
+        with open(os.path.join(self.workspace, "slow.py"), "w") as f:
+            f.write("import time\ntime.sleep(0.5)\nopen('done.txt', 'w').close()\n")
+
+        async def submit_and_cancel():
+            scheduler = FunctionCallScheduler(working_directory=self.workspace)
+            scheduler.submit(types.FunctionCall(name="run_python_file", args={"file_path": "slow.py", "use_cache": False}))
+            scheduler.submit(types.FunctionCall(name="write_file", args={"file_path": "never.txt", "content": "x"}))
+            await asyncio.sleep(0.1)
+            await scheduler.cancel()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(submit_and_cancel())
+        # The running script finished before cancel() returned; the queued write never started
+        self.assertTrue(os.path.exists(os.path.join(self.workspace, "done.txt")))
+        self.assertFalse(os.path.exists(os.path.join(self.workspace, "never.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from functions.apply_patch import apply_patch
+
+
+class ApplyPatchTests(unittest.TestCase):
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp(prefix="apply-patch-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def write(self, name: str, data: bytes):
+        with open(os.path.join(self.workspace, name), "wb") as f:
+            f.write(data)
+
+    def read(self, name: str) -> bytes:
+        with open(os.path.join(self.workspace, name), "rb") as f:
+            return f.read()
+
+    def test_empty_replace_deletes_lines(self):
+        self.write("a.py", b"a\nfoo\nb\n")
+        result = apply_patch(self.workspace, "a.py", "<<<<<<< SEARCH\nfoo\n=======\n>>>>>>> REPLACE\n")
+        self.assertEqual(result.fields, {"applied": ["edit 1 at line 2"]})
+        self.assertEqual(self.read("a.py"), b"a\nb\n")
+
+    def test_crlf_file_keeps_its_line_endings(self):
+        self.write("a.py", b"x = 1\r\ny = 2\r\nz = 3\r\n")
+        apply_patch(self.workspace, "a.py", "@@ -1,3 +1,4 @@\n x = 1\n-y = 2\n+y = 5\n+w = 0\n z = 3\n")
+        self.assertEqual(self.read("a.py"), b"x = 1\r\ny = 5\r\nw = 0\r\nz = 3\r\n")
+
+        apply_patch(self.workspace, "a.py", "<<<<<<< SEARCH\nw = 0\n=======\nw = 9\n>>>>>>> REPLACE\n")
+        self.assertEqual(self.read("a.py"), b"x = 1\r\ny = 5\r\nw = 9\r\nz = 3\r\n")
+
+    def test_multi_file_diff_is_rejected(self):
+        self.write("a.py", b"x = 1\n")
+        patch = (
+            "--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-x = 1\n+x = 2\n"
+            "--- a/b.py\n+++ b/b.py\n@@ -1 +1 @@\n-q\n+r\n"
+        )
+        result = apply_patch(self.workspace, "a.py", patch)
+        self.assertTrue(result.startswith("Error: Patch changes more than one file"))
+        self.assertEqual(self.read("a.py"), b"x = 1\n")
+
+    def test_removed_line_starting_with_dashes_is_not_a_header(self):
+        self.write("a.py", b"a\n-- b\nc\n")
+        apply_patch(self.workspace, "a.py", "--- a/a.py\n+++ b/a.py\n@@ -1,3 +1,2 @@\n a\n--- b\n c\n")
+        self.assertEqual(self.read("a.py"), b"a\nc\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from config import FILE_CACHE_MAX_ENTRY_BYTES
+from functions.apply_patch import apply_patch
+from functions.file_cache import file_cache
+from functions.get_file_content import get_file_content
+from functions.write_file import write_file
+
+
+class FileCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp(prefix="file-cache-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def cold_read(self, file_path: str) -> str:
+        file_cache.invalidate(os.path.join(self.workspace, file_path))
+        return get_file_content(self.workspace, file_path)
+
+    def test_read_after_write_matches_cold_read(self):
+        write_file(self.workspace, "a.txt", "one\r\ntwo\rthree\n")
+        cached = get_file_content(self.workspace, "a.txt")
+        self.assertEqual(cached, "one\ntwo\nthree\n")
+        self.assertEqual(cached, self.cold_read("a.txt"))
+
+    def test_read_after_patch_matches_cold_read(self):
+        with open(os.path.join(self.workspace, "a.py"), "wb") as f:
+            f.write(b"x = 1\r\ny = 2\r\n")
+        apply_patch(self.workspace, "a.py", "@@ -1,2 +1,2 @@\n x = 1\n-y = 2\n+y = 3\n")
+        cached = get_file_content(self.workspace, "a.py")
+        self.assertEqual(cached, "x = 1\ny = 3\n")
+        self.assertEqual(cached, self.cold_read("a.py"))
+
+    def test_if_changed_on_file_too_large_to_cache(self):
+        path = os.path.join(self.workspace, "big.txt")
+        with open(path, "w") as f:
+            f.write("line\n" * (FILE_CACHE_MAX_ENTRY_BYTES // 5 + 1))
+
+        first = get_file_content(self.workspace, "big.txt", if_changed=True)
+        self.assertIn("content", first.fields)
+        self.assertEqual(get_file_content(self.workspace, "big.txt", if_changed=True).fields, {"unchanged": True})
+
+        with open(path, "a") as f:
+            f.write("more\n")
+        self.assertIn("content", get_file_content(self.workspace, "big.txt", if_changed=True).fields)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import asyncio
+import unittest
+
+from google.genai import types
+
+from model_client import ModelCallStore, ModelClient, ReplayModelClient, ScriptedModelClient
+
+
+class ModelClientTests(unittest.TestCase):
+    def test_interface_cannot_be_instantiated(self):
+        with self.assertRaises(TypeError):
+            ModelClient()
+
+    def test_client_must_implement_generate_content_stream(self):
+        class Incomplete(ModelClient):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_clients_implement_the_interface(self):
+        client = ScriptedModelClient([[types.Part(text="hello")]])
+        self.assertIsInstance(client, ModelClient)
+        self.assertIsInstance(ReplayModelClient(ModelCallStore()), ModelClient)
+
+        async def stream():
+            return [chunk async for chunk in client.generate_content_stream("model", [], None)]
+
+        chunks = asyncio.run(stream())
+        self.assertEqual(chunks[0].candidates[0].content.parts[0].text, "hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from functions import run_cache
+from functions.run_cache import RunResultCache
+
+
+class RunCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp(prefix="run-cache-test-")
+        self.write(".gitignore", "data/\n.env\n")
+        self.write("main.py", "print(open('data/input.txt').read())\n")
+        self.write("data/input.txt", "1\n")
+        self.write(".env", "TOKEN=a\n")
+        self.write("__pycache__/main.cpython.pyc", "x")
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def write(self, rel_path: str, text: str):
+        path = os.path.join(self.workspace, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_gitignored_inputs_change_the_key(self):
+        cache = RunResultCache(self.workspace)
+        key = cache.key("main.py", [])
+        self.write("data/input.txt", "2\n")
+        self.assertNotEqual(cache.key("main.py", []), key)
+
+        key = cache.key("main.py", [])
+        self.write(".env", "TOKEN=b\n")
+        self.assertNotEqual(cache.key("main.py", []), key)
+
+    def test_ignored_names_do_not_change_the_key(self):
+        cache = RunResultCache(self.workspace)
+        key = cache.key("main.py", [])
+        self.write("__pycache__/main.cpython.pyc", "y")
+        self.assertEqual(cache.key("main.py", []), key)
+
+    def test_skipping_gitignored_files_is_opt_in(self):
+        with mock.patch.object(run_cache, "RUN_CACHE_SKIP_GITIGNORED", True):
+            cache = RunResultCache(self.workspace)
+            key = cache.key("main.py", [])
+            self.write("data/input.txt", "2\n")
+            self.assertEqual(cache.key("main.py", []), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
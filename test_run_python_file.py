@@ -0,0 +1,75 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from google.genai import types
+
+from functions.compact_results import compact_result
+from functions.run_cache import discard_run_cache
+from functions.run_python_file import CACHED_RESULT_NOTE, run_python_file
+from model_client import request_key
+
+
+def _tool_request(response: dict) -> list[types.Content]:
+    return [types.Content(role="tool", parts=[types.Part.from_function_response(name="run_python_file", response=response)])]
+
+
+class RunPythonFileTests(unittest.TestCase):
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp(prefix="run-python-test-")
+        with open(os.path.join(self.workspace, "hello.py"), "w") as f:
+            f.write("print('hello')\n")
+
+    def tearDown(self):
+        discard_run_cache(self.workspace)
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def test_result_reports_resource_usage(self):
+        result = run_python_file(self.workspace, "hello.py")
+        output, resources = result.rsplit("\n", 1)
+        self.assertEqual(output, "STDOUT:\nhello")
+        self.assertRegex(resources, r"^Resources: wall [\d.]+s, CPU [\d.]+s, peak RSS [\d.]+ MiB$")
+        self.assertEqual(result.fields, {"stdout": "hello", "resources": resources.removeprefix("Resources: ")})
+
+    def test_compact_fields_leave_out_defaults(self):
+        with open(os.path.join(self.workspace, "fails.py"), "w") as f:
+            f.write("import sys\nsys.exit('bad input')\n")
+        fields = run_python_file(self.workspace, "fails.py").fields
+        self.assertEqual((fields["exit_code"], fields["stderr"]), (1, "bad input"))
+        self.assertNotIn("stdout", fields)
+
+        with open(os.path.join(self.workspace, "quiet.py"), "w") as f:
+            f.write("x = 1\n")
+        self.assertEqual(list(run_python_file(self.workspace, "quiet.py").fields), ["resources"])
+
+    def test_cached_result_leaves_out_resource_usage(self):
+        run_python_file(self.workspace, "hello.py")
+        cached = run_python_file(self.workspace, "hello.py")
+        self.assertEqual(cached, f"STDOUT:\nhello\n{CACHED_RESULT_NOTE}")
+        self.assertEqual(cached.fields, {"stdout": "hello", "cached": True})
+
+    def test_request_key_ignores_resource_usage(self):
+        result = run_python_file(self.workspace, "hello.py", use_cache=False)
+        other = re.sub(r"Resources: .*", "Resources: wall 99.00s, CPU 98.00s, peak RSS 1.5 MiB", str(result))
+        self.assertNotEqual(str(result), other)
+        self.assertEqual(
+            request_key("model", _tool_request({"result": str(result)}), None),
+            request_key("model", _tool_request({"result": other}), None),
+        )
+
+        fields = compact_result(result)
+        other_fields = {**fields, "resources": "wall 99.00s, CPU 98.00s, peak RSS 1.5 MiB"}
+        self.assertEqual(
+            request_key("model", _tool_request(fields), None),
+            request_key("model", _tool_request(other_fields), None),
+        )
+        self.assertNotEqual(
+            request_key("model", _tool_request(fields), None),
+            request_key("model", _tool_request({**fields, "exit_code": 1}), None),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
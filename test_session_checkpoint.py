@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from google.genai import types
+
+from functions.workspace_snapshot import WorkspaceSnapshots, discard_workspace_snapshots
+from session_checkpoint import SessionCheckpoint
+
+
+class SnapshotJournalTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="snapshot-test-")
+        self.workspace = os.path.join(self.root, "workspace")
+        for index in range(20):
+            directory = os.path.join(self.workspace, f"pkg{index}", "sub")
+            os.makedirs(directory)
+            with open(os.path.join(directory, "module.py"), "w") as f:
+                f.write(f"VALUE = {index}\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def snapshots(self) -> WorkspaceSnapshots:
+        snapshots = WorkspaceSnapshots(self.workspace)
+        snapshots.snapshots_path = os.path.join(self.root, "snapshots.journal")
+        return snapshots
+
+    def test_save_appends_only_changed_directories(self):
+        snapshots = self.snapshots()
+        first_id = snapshots.refresh()
+        snapshots.save()
+        full_size = os.path.getsize(snapshots.snapshots_path)
+
+        with open(os.path.join(self.workspace, "pkg3", "sub", "module.py"), "a") as f:
+            f.write("CHANGED = True\n")
+        snapshots.mark_changed("pkg3/sub/module.py")
+        second_id = snapshots.refresh()
+        snapshots.save()
+        appended = os.path.getsize(snapshots.snapshots_path) - full_size
+        # The root, pkg3 and pkg3/sub, not the other 19 packages
+        self.assertLess(appended, full_size / 4)
+
+        reloaded = self.snapshots()
+        self.assertEqual(reloaded.refresh(), second_id)
+        self.assertEqual(reloaded.diff(first_id, second_id)["modified"], ["pkg3/sub/module.py"])
+
+    def test_partial_record_is_dropped_on_load(self):
+        snapshots = self.snapshots()
+        first_id = snapshots.refresh()
+        snapshots.save()
+        intact_size = os.path.getsize(snapshots.snapshots_path)
+
+        os.makedirs(os.path.join(self.workspace, "new"))
+        snapshots.mark_changed()
+        snapshots.refresh()
+        snapshots.save()
+        # A crash during the second save left only part of it
+        with open(snapshots.snapshots_path, "r+b") as f:
+            f.truncate(intact_size + 5)
+
+        reloaded = self.snapshots()
+        third_id = reloaded.refresh()
+        reloaded.save()
+        self.assertIn(first_id, reloaded.snapshots)
+
+        again = self.snapshots()
+        self.assertEqual(again.refresh(), third_id)
+        self.assertEqual(again.diff(first_id, third_id)["added"], ["new/ (0 files)"])
+
+
+class SessionCheckpointTests(unittest.TestCase):
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp(prefix="checkpoint-workspace-")
+        self.sessions = tempfile.mkdtemp(prefix="checkpoint-sessions-")
+        with open(os.path.join(self.workspace, "main.py"), "w") as f:
+            f.write("print('hi')\n")
+
+    def tearDown(self):
+        discard_workspace_snapshots(self.workspace)
+        shutil.rmtree(self.workspace, ignore_errors=True)
+        shutil.rmtree(self.sessions, ignore_errors=True)
+
+    def test_resume_restores_history_snapshot_and_tokens(self):
+        checkpoint = SessionCheckpoint.create(self.workspace, self.sessions)
+        messages = [types.Content(role="user", parts=[types.Part(text="hello")])]
+        checkpoint.save(messages, {"calls": 1, "prompt": 100})
+        messages.append(types.Content(role="model", parts=[types.Part(text="hi")]))
+        checkpoint.save(messages, {"calls": 2, "prompt": 250})
+
+        resumed, history = SessionCheckpoint.load(checkpoint.session_id, self.sessions)
+        self.assertEqual([content.parts[0].text for content in history], ["hello", "hi"])
+        self.assertEqual(resumed.snapshot_id, checkpoint.snapshot_id)
+        self.assertEqual(resumed.resumed_tokens, {"calls": 2, "prompt": 250})
+
+        # Totals of the resumed run add to the earlier ones
+        resumed.save(history, {"calls": 1, "prompt": 50})
+        again, _ = SessionCheckpoint.load(checkpoint.session_id, self.sessions)
+        self.assertEqual(again.resumed_tokens, {"calls": 3, "prompt": 300})
+
+        # The checkpointed snapshot resolves from the journal in a new process
+        with open(os.path.join(self.workspace, "main.py"), "w") as f:
+            f.write("print('changed')\n")
+        fresh = WorkspaceSnapshots(self.workspace)
+        current_id = fresh.refresh()
+        self.assertEqual(fresh.diff(checkpoint.snapshot_id, current_id)["modified"], ["main.py"])
+
+
+if __name__ == "__main__":
+    unittest.main()
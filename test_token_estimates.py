@@ -0,0 +1,24 @@
+import subprocess
+import sys
+import unittest
+
+from google.genai import types
+
+import config
+import history
+
+
+class TokenEstimateTests(unittest.TestCase):
+    def test_estimates_use_the_configured_ratio(self):
+        contents = [types.Content(role="user", parts=[types.Part(text="x" * 400)])]
+        self.assertEqual(history.estimate_tokens(contents), 400 // config.CHARS_PER_TOKEN)
+
+    def test_repo_map_does_not_import_history(self):
+        # The repository map only needs the ratio, not the conversation code or the SDK behind it
+        code = "import sys, functions.repo_map; print('history' in sys.modules, 'google.genai' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.split(), ["False", "False"])
+
+
+if __name__ == "__main__":
+    unittest.main()
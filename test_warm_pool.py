@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from functions import run_python_file as run_module
+from functions.python_pool import close_pool
+from functions.run_python_file import run_python_file
+
+EXIT_SCRIPT = """\
+import atexit
+import threading
+import time
+
+def finish():
+    time.sleep(0.2)
+    print("thread done", flush=True)
+
+atexit.register(lambda: print("atexit ran", flush=True))
+threading.Thread(target=finish).start()
+print("main done", flush=True)
+"""
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "the warm pool needs fork()")
+class WarmPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp(prefix="warm-pool-test-")
+
+    def tearDown(self):
+        close_pool(self.workspace)
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def run_with(self, backend: str, file_path: str) -> str:
+        """Runs a script on one backend, returning its result without the resource usage line."""
+        with mock.patch.object(run_module, "PYTHON_EXECUTION_BACKEND", backend):
+            result = run_python_file(self.workspace, file_path, use_cache=False)
+        return result.rpartition("\nResources: ")[0]
+
+    def test_exit_matches_subprocess_backend(self):
+        with open(os.path.join(self.workspace, "exits.py"), "w") as f:
+            f.write(EXIT_SCRIPT)
+
+        expected = self.run_with("subprocess", "exits.py")
+        self.assertIn("main done\nthread done\natexit ran", expected)
+        self.assertEqual(self.run_with("warm_pool", "exits.py"), expected)
+
+    def test_project_modules_are_not_preloaded(self):
+        os.mkdir(os.path.join(self.workspace, "pkg"))
+        open(os.path.join(self.workspace, "pkg", "__init__.py"), "w").close()
+        with open(os.path.join(self.workspace, "pkg", "helper.py"), "w") as f:
+            f.write("open('imported.txt', 'w').close()\n")
+        with open(os.path.join(self.workspace, "uses_helper.py"), "w") as f:
+            f.write("import json\nimport pkg.helper\n")
+        with open(os.path.join(self.workspace, "noop.py"), "w") as f:
+            f.write("print('ok')\n")
+
+        # Starting the server and running another script never imports pkg.helper
+        self.assertIn("ok", self.run_with("warm_pool", "noop.py"))
+        self.assertFalse(os.path.exists(os.path.join(self.workspace, "imported.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+# The span that new spans are nested under, carried across asyncio tasks and to_thread calls
+_current_span_id = contextvars.ContextVar("current_span_id", default=None)
+
+
+class Tracer:
+    """
+    Records timed, nested spans for a session.
+
+    Tracing is off by default, and spans cost only a context manager call
+    until it is enabled. Spans opened inside another span (in the same task,
+    or in threads started from it with asyncio.to_thread) record it as their
+    parent.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+        self.spans = []
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "agent", **attributes):
+        """
+        Times the enclosed block as a span.
+
+        Args:
+            name: What the span covers, e.g. "model_call" or a tool name.
+            category: A coarse grouping such as "model", "tool", "fs" or "subprocess".
+            **attributes: Extra details to record with the span.
+
+        Yields:
+            The span's attribute dict, so the block can add results such as sizes.
+        """
+        if not self.enabled:
+            yield attributes
+            return
+
+        span_id = next(self._ids)
+        parent_id = _current_span_id.get()
+        token = _current_span_id.set(span_id)
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            end = time.perf_counter()
+            _current_span_id.reset(token)
+            with self._lock:
+                self.spans.append({
+                    "id": span_id,
+                    "parent_id": parent_id,
+                    "name": name,
+                    "category": category,
+                    "start_seconds": start - self._origin,
+                    "duration_seconds": end - start,
+                    "thread_id": threading.get_ident(),
+                    "attributes": attributes,
+                })
+
+    def export(self, path: str):
+        """
+        Writes the recorded spans to a file.
+
+        Files ending in ".jsonl" get one span per line. Anything else gets the
+        Chrome trace event format, viewable in chrome://tracing or Perfetto.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_seconds"])
+
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                for span in spans:
+                    f.write(json.dumps(span, default=str) + "\n")
+                return
+
+            events = [
+                {
+                    "name": span["name"],
+                    "cat": span["category"],
+                    "ph": "X",
+                    "ts": span["start_seconds"] * 1_000_000,
+                    "dur": span["duration_seconds"] * 1_000_000,
+                    "pid": os.getpid(),
+                    "tid": span["thread_id"],
+                    "args": span["attributes"],
+                }
+                for span in spans
+            ]
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+    def summary(self, top: int = 5) -> str:
+        """
+        Summarizes the session: the slowest steps and the total time per category.
+
+        Category totals add up every span, so tool calls that ran in parallel
+        can sum to more than the wall time.
+        """
+        with self._lock:
+            steps = [span for span in self.spans if span["category"] != "session"]
+        if not steps:
+            return "No spans recorded."
+
+        lines = [f"Slowest {min(top, len(steps))} steps:"]
+        for span in sorted(steps, key=lambda span: span["duration_seconds"], reverse=True)[:top]:
+            label = span["attributes"].get("function") or span["attributes"].get("path") or ""
+            lines.append(f"  {span['duration_seconds'] * 1000:9.1f} ms  {span['category']}/{span['name']} {label}".rstrip())
+
+        totals = {}
+        for span in steps:
+            totals[span["category"]] = totals.get(span["category"], 0) + span["duration_seconds"]
+        lines.append("Time by category:")
+        for category, seconds in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"  {seconds * 1000:9.1f} ms  {category}")
+        return "\n".join(lines)
+
+
+# Shared by the agent loop and every tool in this process
+tracer = Tracer()